@@ -0,0 +1,426 @@
+#%%
+from collections import Counter
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+# the project modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_PATH), "project_files"))
+
+from waterstones_drivers import DRIVER_BACKENDS
+from waterstones_fixture_server import FixtureServer
+from waterstones_http_scraper import WaterstonesHTTPScraper
+from waterstones_image_downloader import AsyncImageDownloader
+from waterstones_metrics import StageMetrics
+from waterstones_records import BookRecordAccumulator
+from waterstones_worker_pool import BookPageWorkerPool
+import pandas # imported by the scraper on first use, so loaded here to keep it out of the timings
+import psutil
+#%%
+BASELINE_PATH = os.path.join(BENCHMARKS_PATH, "baseline.json")
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    "pages_per_second" : True,
+    "images_per_second" : True,
+    "wall_seconds" : False,
+    "peak_rss_mb" : False,
+    "scrape_bytes" : False,
+}
+#%%
+class PeakRSSSampler:
+    """Samples the resident set size of this process and all its children,
+    which include chromedriver and Chrome, in a background thread.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between samples.
+
+    Attributes
+    ----------
+    self.peak_bytes : int
+                Largest total RSS seen.
+    """
+    def __init__(self, interval=0.05) -> None:
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self) -> int:
+        process = psutil.Process()
+        total = 0
+        for member in [process] + process.children(recursive=True):
+            try:
+                total += member.memory_info().rss
+            except psutil.Error: # child exited between listing and sampling
+                pass
+        self.peak_bytes = max(self.peak_bytes, total)
+
+        return total
+
+    def _run(self):
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                break
+#%%
+def scrape_traffic(server: FixtureServer) -> dict:
+    """Copies the requests and bytes served so far, before images are saved.
+    """
+    return {"requests" : Counter(server.requests), "bytes" : Counter(server.bytes_served)}
+
+def run_pipeline_flow(server: FixtureServer, output_path: str, metrics: StageMetrics,
+        backend="headless", detail_backend="selenium", n_workers=1, n_language_workers=1):
+    """Runs the QueryWaterstones flow of run_the_scraper against the fixture
+    server with the given driver backend.
+
+    Returns
+    -------
+    tuple
+        DataFrame of results, seconds spent scraping, seconds spent saving
+        images, and the requests and bytes served while scraping.
+    """
+    from waterstones_query import QueryWaterstones
+
+    driver = QueryWaterstones(backend=backend, detail_backend=detail_backend,
+        n_workers=n_workers, n_language_workers=n_language_workers, metrics=metrics)
+    driver.base_url = f"{server.base_url}/"
+    driver.raw_data_path = output_path
+    try:
+        start = time.perf_counter()
+        driver.load_and_accept_cookies()
+        driver.search(server.catalogue["query"])
+        driver.get_language_filter_page_links()
+        driver.get_DataFrame_of_language_filtered_query_results()
+        driver.save_df_as_csv()
+        scrape_seconds = time.perf_counter() - start
+        traffic = scrape_traffic(server)
+        start = time.perf_counter()
+        driver.save_imgs_as_jpg()
+        image_seconds = time.perf_counter() - start
+    finally:
+        driver.quit_browser()
+
+    return driver.language_filtered_DataFrame, scrape_seconds, image_seconds, traffic
+
+def run_http_flow(server: FixtureServer, output_path: str, metrics: StageMetrics, n_workers=4):
+    """Runs the browser-free stages against the fixture server: every product
+    page is scraped by WaterstonesHTTPScraper workers and every cover is saved
+    by an AsyncImageDownloader. Book links are taken from the catalogue, as
+    finding them needs a browser.
+
+    Returns
+    -------
+    tuple
+        DataFrame of results, seconds spent scraping, seconds spent saving
+        images, and the requests and bytes served while scraping.
+    """
+    books = server.catalogue["books"]
+
+    def scrape_book(scraper, book_link):
+        scraper.load_book_page(book_link)
+
+        return {
+            "ID" : scraper.get_ISBN(),
+            "Timestamp" : time.ctime(),
+            "Author" : scraper.get_author(),
+            "Title" : scraper.get_title(),
+            "Language" : None,
+            "Price (£)" : scraper.get_price(),
+            "Image_link" : scraper.get_image_link(),
+        }
+
+    start = time.perf_counter()
+    pool = BookPageWorkerPool(lambda: WaterstonesHTTPScraper(metrics=metrics), n_workers=n_workers)
+    try:
+        book_dicts = pool.map(scrape_book, [server.book_link(book) for book in books])
+    finally:
+        pool.close()
+    records = BookRecordAccumulator()
+    for book, book_dict in zip(books, book_dicts):
+        records.append(book_dict, language=book["language"])
+    df = records.to_DataFrame()
+    scrape_seconds = time.perf_counter() - start
+    traffic = scrape_traffic(server)
+    os.makedirs(os.path.join(output_path, "images"), exist_ok=True)
+    downloads = [(img_url, os.path.join(output_path, "images", f"{isbn}.jpg"))
+        for isbn, img_url in zip(df["ID"], df["Image_link"])]
+    start = time.perf_counter()
+    downloader = AsyncImageDownloader()
+    try:
+        with metrics.timed("save_imgs_as_jpg") as sample:
+            sample.bytes = downloader.run(downloads)["bytes"]
+    finally:
+        downloader.close()
+    image_seconds = time.perf_counter() - start
+
+    return df, scrape_seconds, image_seconds, traffic
+
+def check_results(df, server: FixtureServer) -> list:
+    """Compares scraped rows with the recorded catalogue.
+
+    Returns
+    -------
+    list
+        Description of every row which does not match its recorded book.
+    """
+    mismatches = []
+    for row in df.to_dict(orient="records"):
+        book = server.books_by_isbn.get(int(row["ID"]))
+        if book is None:
+            mismatches.append(f"{row['ID']}: not in the catalogue")
+            continue
+        expected = {"Author" : book["author"], "Title" : book["title"],
+            "Language" : book["language"], "Price (£)" : book["price"],
+            "Image_link" : server.image_link(book)}
+        for column, value in expected.items():
+            if row[column] != value:
+                mismatches.append(f"{row['ID']}: {column} is {row[column]!r}, expected {value!r}")
+
+    return mismatches
+
+def run_benchmark(profile="pipeline", detail_backend="selenium", n_workers=1,
+        latency=0.0, show_more_delay=0.05, backend="headless", n_language_workers=1) -> dict:
+    """Serves the fixtures, runs one flow against them, and reports its
+    throughput, memory, stage timings, and results.
+
+    Parameters
+    ----------
+    profile : str
+        "pipeline" for the QueryWaterstones flow, or "http" for the
+        browser-free product page and image stages.
+    detail_backend : str
+        Detail backend of the pipeline flow.
+    n_workers : int
+        Number of workers scraping book pages.
+    latency : float
+        Seconds every fixture response is delayed by.
+    show_more_delay : float
+        Seconds the show more button takes to load results.
+    backend : str
+        Driver backend of the pipeline flow, such as "headless", "lean", or "http".
+    n_language_workers : int
+        Number of language-filter pages the pipeline flow scrapes concurrently.
+
+    Returns
+    -------
+    dict
+        Benchmark report. Pages, images, and bytes served while scraping are
+        counted separately from the images downloaded afterwards.
+    """
+    metrics = StageMetrics()
+    with FixtureServer(latency=latency, show_more_delay=show_more_delay) as server, \
+            tempfile.TemporaryDirectory() as output_path, PeakRSSSampler() as sampler:
+        start = time.perf_counter()
+        if profile == "pipeline":
+            df, scrape_seconds, image_seconds, traffic = run_pipeline_flow(server, output_path,
+                metrics, backend=backend, detail_backend=detail_backend, n_workers=n_workers,
+                n_language_workers=n_language_workers)
+        elif profile == "http":
+            df, scrape_seconds, image_seconds, traffic = run_http_flow(server, output_path,
+                metrics, n_workers=n_workers)
+        else:
+            raise ValueError(f"Unknown benchmark profile {profile!r}.")
+        wall_seconds = time.perf_counter() - start
+        sampler.sample()
+        pages = traffic["requests"]["page"]
+        images = server.requests["image"] - traffic["requests"]["image"]
+        scrape_bytes = sum(traffic["bytes"].values())
+        mismatches = check_results(df, server)
+
+    return {
+        "profile" : profile,
+        "detail_backend" : detail_backend if profile == "pipeline" else "http",
+        "backend" : backend if profile == "pipeline" else None,
+        "n_workers" : n_workers,
+        "n_language_workers" : n_language_workers if profile == "pipeline" else 1,
+        "latency" : latency,
+        "rows" : len(df),
+        "mismatches" : mismatches,
+        "pages" : pages,
+        "images" : images,
+        "scrape_requests" : dict(traffic["requests"]),
+        "scrape_bytes" : scrape_bytes,
+        "bytes_per_page" : scrape_bytes / pages if pages else 0.0,
+        "wall_seconds" : wall_seconds,
+        "pages_per_second" : pages / scrape_seconds if scrape_seconds else 0.0,
+        "images_per_second" : images / image_seconds if image_seconds else 0.0,
+        "peak_rss_mb" : sampler.peak_bytes / 2 ** 20,
+        "stages" : {stage : stats["total_seconds"] for stage, stats in metrics.summary().items()},
+    }
+#%%
+def baseline_key(report: dict) -> str:
+    profile = report["profile"]
+    if report.get("backend") is not None:
+        profile = f"{profile}_{report['backend']}"
+    if report.get("n_language_workers", 1) > 1:
+        profile = f"{profile}_{report['n_language_workers']}_languages"
+
+    return (f"{profile}-{report['detail_backend']}-{report['n_workers']}_workers"
+        f"-{report['latency']}s_latency")
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance=0.25, slack_seconds=0.05) -> list:
+    """Compares a report with its baseline. Results must match exactly, while
+    each metric and stage may be up to tolerance worse than the baseline.
+
+    Parameters
+    ----------
+    report : dict
+        Report from run_benchmark.
+    baseline : dict
+        Stored report of the same benchmark.
+    tolerance : float
+        Allowed fractional slowdown or growth.
+    slack_seconds : float
+        Allowed absolute slowdown of timings, so stages taking milliseconds
+        do not fail on noise.
+
+    Returns
+    -------
+    list
+        Description of every regression.
+    """
+    regressions = [f"result mismatch: {mismatch}" for mismatch in report["mismatches"]]
+    if report["rows"] != baseline["rows"]:
+        regressions.append(f"rows: {report['rows']}, baseline {baseline['rows']}")
+    compared = [(metric, report[metric], baseline[metric], higher_is_better,
+        slack_seconds if metric.endswith("_seconds") else 0.0)
+        for metric, higher_is_better in COMPARED_METRICS.items() if metric in baseline]
+    compared += [(f"stage {stage}", seconds, baseline["stages"][stage], False, slack_seconds)
+        for stage, seconds in report["stages"].items() if stage in baseline["stages"]]
+    for name, value, baseline_value, higher_is_better, slack in compared:
+        if higher_is_better and value < baseline_value * (1 - tolerance):
+            regressions.append(f"{name}: {value:.3f}, baseline {baseline_value:.3f}")
+        elif not higher_is_better and value > baseline_value * (1 + tolerance) + slack:
+            regressions.append(f"{name}: {value:.3f}, baseline {baseline_value:.3f}")
+
+    return regressions
+
+def compare_reports(report: dict, other: dict) -> dict:
+    """Compares the bandwidth, timing, and memory of two reports of the same
+    flow, such as the pipeline with two driver backends.
+
+    Returns
+    -------
+    dict
+        Value of each metric in both reports, and the ratio of other to report.
+    """
+    metrics = ["scrape_bytes", "bytes_per_page", "pages_per_second", "wall_seconds", "peak_rss_mb"]
+    metrics += [f"stage {stage}" for stage in report["stages"] if stage in other["stages"]]
+    comparison = {}
+    for metric in metrics:
+        if metric.startswith("stage "):
+            value, other_value = report["stages"][metric[6:]], other["stages"][metric[6:]]
+        else:
+            value, other_value = report[metric], other[metric]
+        comparison[metric] = {"value" : value, "other" : other_value,
+            "ratio" : other_value / value if value else None}
+
+    return comparison
+
+def print_comparison(comparison: dict, names=("report", "other")):
+    print(f"  {'':<40} {names[0]:>12} {names[1]:>12} {'ratio':>7}")
+    for metric, values in comparison.items():
+        ratio = "" if values["ratio"] is None else f"{values['ratio']:.2f}"
+        print(f"  {metric:<40} {values['value']:12.3f} {values['other']:12.3f} {ratio:>7}")
+
+def print_report(report: dict, baseline=None):
+    print(f"{report['rows']} rows, {report['pages']} pages, {report['images']} images "
+        f"in {report['wall_seconds']:.2f}s: {report['pages_per_second']:.1f} pages/s, "
+        f"{report['images_per_second']:.1f} images/s, peak RSS {report['peak_rss_mb']:.0f} MB, "
+        f"{report['scrape_bytes'] / 1e6:.2f} MB served while scraping.")
+    for stage, seconds in report["stages"].items():
+        line = f"  {stage:<32} {seconds:8.3f}s"
+        if baseline is not None and stage in baseline["stages"]:
+            line += f"  (baseline {baseline['stages'][stage]:.3f}s)"
+        print(line)
+#%%
+def main(argv=None):
+    """Runs a benchmark against the recorded fixtures, prints the report, and
+    exits with status 1 if it regressed against the stored baseline or there
+    is no baseline for its profile.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against recorded fixtures.")
+    parser.add_argument("--profile", choices=["pipeline", "http"], default="pipeline",
+        help="QueryWaterstones flow, or browser-free product page and image stages")
+    parser.add_argument("--detail-backend", choices=["selenium", "http"], default="selenium",
+        help="backend used to scrape book pages in the pipeline flow")
+    parser.add_argument("--backend", choices=list(DRIVER_BACKENDS), default="headless",
+        help="driver backend of the pipeline flow")
+    parser.add_argument("--compare-backends", nargs="+", choices=list(DRIVER_BACKENDS),
+        default=None, metavar="BACKEND",
+        help="run the pipeline flow with each driver backend and compare them to the first")
+    parser.add_argument("--workers", type=int, default=1, help="number of book page workers")
+    parser.add_argument("--language-workers", type=int, default=1,
+        help="number of language-filter pages scraped concurrently in the pipeline flow")
+    parser.add_argument("--latency", type=float, default=0.0,
+        help="seconds every fixture response is delayed by")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+        help="allowed fractional regression against the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true",
+        help="store this run as the baseline instead of comparing against it")
+    parser.add_argument("--report", default=None, help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.compare_backends:
+        reports = {backend : run_benchmark(profile="pipeline", detail_backend=args.detail_backend,
+            n_workers=args.workers, latency=args.latency, backend=backend,
+            n_language_workers=args.language_workers)
+            for backend in args.compare_backends}
+        for backend, report in reports.items():
+            print(f"{backend}: ", end="")
+            print_report(report)
+        reference = args.compare_backends[0]
+        comparisons = {backend : compare_reports(reports[reference], report)
+            for backend, report in reports.items() if backend != reference}
+        for backend, comparison in comparisons.items():
+            print_comparison(comparison, names=(reference, backend))
+        if args.report is not None:
+            with open(args.report, "w", encoding="utf-8") as handler:
+                json.dump({"reports" : reports, "comparisons" : comparisons}, handler, indent=2)
+        return 0 if not any(report["mismatches"] for report in reports.values()) else 1
+    report = run_benchmark(profile=args.profile, detail_backend=args.detail_backend,
+        n_workers=args.workers, latency=args.latency, backend=args.backend,
+        n_language_workers=args.language_workers)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handler:
+            baselines = json.load(handler)
+    key = baseline_key(report)
+    print_report(report, baselines.get(key))
+    if args.report is not None:
+        with open(args.report, "w", encoding="utf-8") as handler:
+            json.dump(report, handler, indent=2)
+    if args.update_baseline:
+        baselines[key] = report
+        with open(args.baseline, "w", encoding="utf-8") as handler:
+            json.dump(baselines, handler, indent=2, sort_keys=True)
+        print(f"Baseline {key} saved to {args.baseline}.")
+        return 0
+    if key not in baselines:
+        print(f"FAILED no baseline for {key}; run with --update-baseline to store one.")
+        return 1
+    regressions = compare_to_baseline(report, baselines[key], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 0 if not regressions else 1
+#%%
+if __name__ == "__main__":
+    sys.exit(main())
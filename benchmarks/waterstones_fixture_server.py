@@ -0,0 +1,286 @@
+#%%
+from collections import Counter
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, quote_plus, unquote_plus, urlsplit
+import json
+import os
+import re
+import threading
+import time
+#%%
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+#%%
+def slugify(text: str) -> str:
+    """Converts a title or author to the lower case, hyphenated form used in
+    Waterstones URLs.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+def make_book_dict(isbn: int, language=None, price=10.99, author="Jose Saramago") -> dict:
+    """Builds the dictionary of one made-up book, as scraped from its product
+    page, for tests of the stages which store books.
+    """
+    return {
+        "ID" : isbn,
+        "Timestamp" : "Sun Oct 18 12:00:00 2026",
+        "Author" : author,
+        "Title" : f"Title {isbn}",
+        "Language" : language,
+        "Price (£)" : price,
+        "Image_link" : f"https://example.com/{isbn}.jpg",
+    }
+#%%
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """Serves the pages of a FixtureServer: the homepage, search and
+    language-filtered results pages, product pages, and cover images.
+    """
+    PRODUCT_PATH = re.compile(r"^/book/[^/]+/[^/]+/(\d{13})$")
+    IMAGE_PATH = re.compile(r"^/images/(\d{13})\.jpg$")
+    LANGUAGE_PATH = re.compile(r"^/books/search/term/([^/]+)/language/([^/]+?)(?:/page/(\d+))?$")
+
+    def do_GET(self):
+        fixtures = self.server.fixtures
+        if fixtures.latency:
+            time.sleep(fixtures.latency)
+        url = urlsplit(self.path)
+        product_match = self.PRODUCT_PATH.match(url.path)
+        image_match = self.IMAGE_PATH.match(url.path)
+        language_match = self.LANGUAGE_PATH.match(url.path)
+        if url.path == "/":
+            self.send_body("page", fixtures.render_home())
+        elif url.path == "/books/search":
+            term = parse_qs(url.query).get("term", [""])[0]
+            self.send_body("page", fixtures.render_search(term))
+        elif language_match is not None:
+            term, language, page = language_match.groups()
+            page = None if page is None else int(page)
+            self.send_body("page", fixtures.render_search(unquote_plus(term),
+                unquote_plus(language), page))
+        elif product_match is not None and int(product_match.group(1)) in fixtures.books_by_isbn:
+            self.send_body("page", fixtures.render_product(int(product_match.group(1))))
+        elif image_match is not None and int(image_match.group(1)) in fixtures.books_by_isbn:
+            self.send_body("image", fixtures.cover(int(image_match.group(1))), "image/jpeg")
+        else:
+            fixtures.count("missing")
+            self.send_error(404)
+
+    def send_body(self, kind: str, body, content_type="text/html; charset=utf-8"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.server.fixtures.count(kind, len(body))
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+#%%
+class LocalHTTPServer:
+    """HTTP server on a free local port, run in a background thread, so the
+    scraper can be tested and benchmarked without the network. Handlers reach
+    this object as self.server.fixtures, to count requests or read its state.
+
+    Parameters
+    ----------
+    handler : type
+        BaseHTTPRequestHandler subclass, or a partial of one, answering every
+        request.
+
+    Attributes
+    ----------
+    self.requests : Counter
+                Number of requests of each kind counted by the handler.
+    self.bytes_served : Counter
+                Bytes served of each kind counted by the handler.
+    self.base_url : str
+                URL of the server, once started.
+    """
+    def __init__(self, handler) -> None:
+        self.handler = handler
+        self.requests = Counter()
+        self.bytes_served = Counter()
+        self.base_url = None
+        self._httpd = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> str:
+        """Starts serving on a free local port in a background thread.
+
+        Returns
+        -------
+        str
+            URL of the server, without a trailing slash.
+        """
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fixtures = self
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+        return self.base_url
+
+    def stop(self):
+        """Stops the server.
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def count(self, kind: str, n_bytes=0) -> int:
+        """Counts one request of a kind, and the bytes served for it.
+
+        Returns
+        -------
+        int
+            Number of requests of the kind so far, including this one.
+        """
+        with self._lock:
+            self.requests[kind] += 1
+            self.bytes_served[kind] += n_bytes
+
+            return self.requests[kind]
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_served.clear()
+#%%
+class FixtureServer(LocalHTTPServer):
+    """Local HTTP server which replays a recorded Waterstones catalogue, so the
+    scraper can be run and benchmarked without the network. Pages are rendered
+    from the HTML templates in the fixtures folder, which keep the elements and
+    page structure the scraper's XPaths rely on, including a show more button
+    which loads the next page of results after a delay.
+
+    Parameters
+    ----------
+    fixtures_path : str
+        Folder holding catalogue.json, the HTML templates, and covers/*.jpg.
+    latency : float
+        Seconds every response is delayed by, to simulate a network.
+    show_more_delay : float
+        Seconds the show more button takes to load the next page of results.
+
+    Attributes
+    ----------
+    self.catalogue : dict
+                Search query, results per page, and recorded books.
+    self.books_by_isbn : dict
+                Each recorded book, by ISBN.
+    self.requests : Counter
+                Number of pages, images, and missing paths served.
+    self.bytes_served : Counter
+                Bytes of pages and images served.
+    self.base_url : str
+                URL of the server, once started.
+    """
+    def __init__(self, fixtures_path=FIXTURES_PATH, latency=0.0, show_more_delay=0.05) -> None:
+        super().__init__(FixtureRequestHandler)
+        self.fixtures_path = fixtures_path
+        self.latency = latency
+        self.show_more_delay = show_more_delay
+        with open(os.path.join(fixtures_path, "catalogue.json"), encoding="utf-8") as handler:
+            self.catalogue = json.load(handler)
+        self.books_by_isbn = {book["isbn"] : book for book in self.catalogue["books"]}
+        self.templates = {}
+        for name in ("home", "search", "product"):
+            with open(os.path.join(fixtures_path, f"{name}.html"), encoding="utf-8") as handler:
+                self.templates[name] = Template(handler.read())
+        covers_path = os.path.join(fixtures_path, "covers")
+        self.covers = []
+        for name in sorted(os.listdir(covers_path)):
+            with open(os.path.join(covers_path, name), "rb") as handler:
+                self.covers.append(handler.read())
+
+    def languages(self) -> list:
+        """Lists the languages of the recorded books, most books first.
+        """
+        counts = Counter(book["language"] for book in self.catalogue["books"])
+
+        return [language for language, _ in counts.most_common()]
+
+    def book_link(self, book: dict) -> str:
+        """Gets the product page URL of a recorded book, ending in its ISBN as
+        on the live site.
+        """
+        return (f"{self.base_url}/book/{slugify(book['title'])}/"
+            f"{slugify(book['author'])}/{book['isbn']}")
+
+    def image_link(self, book: dict) -> str:
+        return f"{self.base_url}/images/{book['isbn']}.jpg"
+
+    def language_link(self, term: str, language: str) -> str:
+        return f"{self.base_url}/books/search/term/{quote_plus(term)}/language/{quote_plus(language)}"
+
+    def cover(self, isbn: int) -> bytes:
+        """Gets the cover of a book. Covers are shared between books, as
+        editions often are on the live site.
+        """
+        return self.covers[isbn % len(self.covers)]
+
+    def render_home(self) -> str:
+        return self.templates["home"].substitute()
+
+    def render_product(self, isbn: int) -> str:
+        book = self.books_by_isbn[isbn]
+
+        return self.templates["product"].substitute(
+            title=escape(book["title"]),
+            author=escape(book["author"]),
+            author_slug=slugify(book["author"]),
+            price=f"{book['price']:.2f}",
+            image_link=self.image_link(book))
+
+    def render_search(self, term: str, language=None, page=None) -> str:
+        """Renders a search results page, filtered by language if given. Without
+        a page number only the first page of results is in the HTML and the
+        rest are added by the show more button; with one, only that page of
+        results is rendered, as by a /page/<number> URL.
+        """
+        matches = term.strip().lower() == self.catalogue["query"]
+        books = [book for book in self.catalogue["books"] if matches
+            and (language is None or book["language"] == language)]
+        per_page = self.catalogue["results_per_page"]
+        pages = ["".join(
+            f'<div class="book-preview"><a href="{self.book_link(book)}">{escape(book["title"])}</a></div>'
+            for book in books[start:start + per_page]) for start in range(0, len(books), per_page)] or [""]
+        remaining_pages = pages[1:]
+        if page is not None:
+            pages = [pages[page - 1] if page <= len(pages) else ""] + [""] * (len(pages) - 1)
+            remaining_pages = []
+        language_filter = ""
+        if books:
+            language_links = "".join(
+                f'<a href="{self.language_link(term, name)}">{escape(name)}</a>'
+                for name in self.languages())
+            language_filter = ('<div class="filter-header slide-trigger js-filter-trigger">LANGUAGE</div>'
+                f'<div class="filter-body">{language_links}</div>')
+        active_language = ""
+        if language is not None:
+            active_language = ('<div class="active-filters"><div><div><div>'
+                f'<span>{escape(language)}</span></div></div></div></div>')
+
+        return self.templates["search"].substitute(
+            heading=escape(term),
+            search_url=f"{self.base_url}/books/search?term={quote_plus(term)}",
+            language_filter=language_filter,
+            number_of_pages=len(pages),
+            first_page=pages[0],
+            show_more_style="" if remaining_pages else "display: none;",
+            active_language=active_language,
+            remaining_pages=json.dumps(remaining_pages).replace("</", "<\\/"),
+            show_more_delay_ms=round(self.show_more_delay * 1000))
+#%%
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the project modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "project_files"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "benchmarks"))
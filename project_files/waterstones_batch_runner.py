@@ -0,0 +1,283 @@
+#%%
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+#%%
+class GlobalRateLimiter:
+    """Rate limiter shared by every worker process of a batch, so the whole batch
+    makes at most requests_per_second page requests however many processes run.
+    The next free time slot is held in shared memory.
+
+    Parameters
+    ----------
+    requests_per_second : float
+        Maximum request rate across all processes.
+    next_slot : multiprocessing.Value
+        Shared double holding the time of the next free slot. Created if None.
+    """
+    def __init__(self, requests_per_second: float, next_slot=None) -> None:
+        self.min_interval = 1 / requests_per_second
+        self.next_slot = next_slot if next_slot is not None else multiprocessing.Value("d", 0.0)
+
+    def wait(self, url=None) -> float:
+        """Blocks until the batch may make another request.
+
+        Parameters
+        ----------
+        url : str
+            URL about to be requested. Unused, as the limit is global.
+
+        Returns
+        -------
+        float
+            Time spent waiting in seconds.
+        """
+        with self.next_slot.get_lock():
+            now = time.time()
+            slot = max(now, self.next_slot.value)
+            self.next_slot.value = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+        return max(delay, 0)
+#%%
+# state of each worker process, set by _init_worker
+_worker = {}
+
+def _init_worker(next_slot, requests_per_second, scraper_kwargs):
+    _worker["rate_limiter"] = None
+    if requests_per_second:
+        _worker["rate_limiter"] = GlobalRateLimiter(requests_per_second, next_slot)
+    _worker["scraper_kwargs"] = scraper_kwargs
+    _worker["session_pool"] = None
+
+def _get_session_pool():
+    if _worker.get("session_pool") is None:
+        from waterstones_http_cache import HTTPResponseCache
+        from waterstones_isbn_index import SeenISBNIndex
+        from waterstones_query import QueryWaterstones
+        from waterstones_results_cache import QueryResultsCache
+        from waterstones_session_manager import DriverSessionPool
+        scraper_kwargs = dict(_worker.get("scraper_kwargs", {}))
+        scraper_kwargs.setdefault("backend", "headless")
+        # each process opens its own connection to the shared results cache
+        results_cache_path = scraper_kwargs.pop("results_cache_path", None)
+        results_cache_ttl = scraper_kwargs.pop("results_cache_ttl", 6 * 60 * 60)
+        if results_cache_path is not None:
+            scraper_kwargs["results_cache"] = QueryResultsCache(results_cache_path,
+                ttl=results_cache_ttl)
+        # and to the shared on-disk HTTP cache
+        http_cache_dir = scraper_kwargs.pop("http_cache_dir", None)
+        if http_cache_dir is not None:
+            scraper_kwargs["http_cache"] = HTTPResponseCache(http_cache_dir)
+        session_pool = DriverSessionPool(QueryWaterstones, size=1,
+            isbn_index=SeenISBNIndex(keep_records=False), **scraper_kwargs)
+        # quit this process's Chrome when the worker process exits
+        util.Finalize(session_pool, session_pool.close, exitpriority=10)
+        _worker["session_pool"] = session_pool
+
+    return _worker["session_pool"]
+
+def scrape_author(author: str) -> dict:
+    """Scrapes and saves every result of one author query, using the warm
+    browser of the current worker process.
+
+    Parameters
+    ----------
+    author : str
+        Search query.
+
+    Returns
+    -------
+    dict
+        Number of rows scraped, whether the query's links came from the
+        results cache, and the summary of the requests made under the
+        scraper's fetch policy, including failures and skipped books.
+    """
+    with _get_session_pool().acquire() as driver:
+        driver.rate_limiter = _worker.get("rate_limiter")
+        driver.search(author)
+        driver.open_output_sink()
+        driver.get_language_filter_page_links()
+        number_of_books = sum(1 for _ in driver.iter_language_filtered_books())
+        driver.save_df_as_csv()
+        driver.save_imgs_as_jpg()
+
+        return {"rows" : number_of_books, "results_cache_hit" : driver.cached_results is not None,
+            "fetch" : driver.fetch_policy.summary()}
+
+def run_with_retries(scrape_function, author: str, retries=2, backoff=5.0) -> dict:
+    """Runs scrape_function for one author, retrying failures with exponential
+    backoff and jitter.
+
+    Parameters
+    ----------
+    scrape_function : callable
+        Called with the author, returning a dictionary of results.
+    author : str
+        Search query.
+    retries : int
+        Number of retries after the first attempt.
+    backoff : float
+        Seconds waited before the first retry, doubled for each later retry.
+
+    Returns
+    -------
+    dict
+        Summary of the author's run: status, attempts, seconds, errors, and
+        the results of scrape_function if it succeeded.
+    """
+    start = time.perf_counter()
+    errors = []
+    for attempt in range(1, retries + 2):
+        try:
+            result = scrape_function(author)
+        except Exception as error: # any failure of one author must not stop the batch
+            errors.append(f"{type(error).__name__}: {error}")
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            continue
+        return dict(result, author=author, status="ok", attempts=attempt,
+            seconds=time.perf_counter() - start, errors=errors)
+
+    return {"author" : author, "status" : "failed", "attempts" : retries + 1,
+        "seconds" : time.perf_counter() - start, "errors" : errors}
+
+def read_author_list(handler) -> list:
+    """Reads one author per line, ignoring blank lines and # comments.
+
+    Parameters
+    ----------
+    handler : file
+        Open text file or stdin.
+
+    Returns
+    -------
+    list
+        Authors in file order, without duplicates.
+    """
+    authors = []
+    for line in handler:
+        author = line.split("#", 1)[0].strip()
+        if author and author not in authors:
+            authors.append(author)
+
+    return authors
+
+def run_batch(authors: list, processes=None, requests_per_second=None, retries=2,
+        backoff=5.0, scrape_function=scrape_author, scraper_kwargs=None) -> dict:
+    """Fans a list of authors out across a pool of worker processes, each with
+    its own Chrome, under one global rate limit.
+
+    Parameters
+    ----------
+    authors : list
+        Search queries.
+    processes : int
+        Number of worker processes. Defaults to the number of CPUs.
+    requests_per_second : float
+        Maximum page request rate across the whole batch. None for no limit.
+    retries : int
+        Number of retries of a failed author.
+    backoff : float
+        Seconds waited before the first retry of an author.
+    scrape_function : callable
+        Module-level function called with each author in a worker process.
+    scraper_kwargs : dict
+        Keyword arguments for each worker's QueryWaterstones, such as its
+        driver backend, headless Chrome unless given. "results_cache_path" and
+        "results_cache_ttl" open a QueryResultsCache, and "http_cache_dir" an
+        HTTPResponseCache, in each worker process.
+
+    Returns
+    -------
+    dict
+        Combined summary: totals, timings, failed authors, fetch failures and
+        skipped books summed over authors, and one entry per author in input
+        order.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    next_slot = multiprocessing.Value("d", 0.0)
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+            initargs=(next_slot, requests_per_second, scraper_kwargs or {})) as executor:
+        futures = {executor.submit(run_with_retries, scrape_function, author, retries, backoff) : author
+            for author in authors}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            print(f"{result['author']}: {result['status']} after {result['attempts']} "
+                f"attempt(s) in {result['seconds']:.1f}s.")
+    per_author = [results[author] for author in authors]
+    seconds = [result["seconds"] for result in per_author]
+
+    return {
+        "authors" : len(authors),
+        "succeeded" : sum(result["status"] == "ok" for result in per_author),
+        "failed" : [result["author"] for result in per_author if result["status"] != "ok"],
+        "processes" : processes,
+        "wall_seconds" : time.perf_counter() - start,
+        "total_author_seconds" : sum(seconds),
+        "max_author_seconds" : max(seconds, default=0.0),
+        "fetch_failures" : sum(result.get("fetch", {}).get("failures", 0) for result in per_author),
+        "books_skipped" : sum(result.get("fetch", {}).get("skipped", {}).get("books", 0)
+            for result in per_author),
+        "results_cache_hits" : sum(bool(result.get("results_cache_hit")) for result in per_author),
+        "per_author" : per_author,
+    }
+#%%
+def main(argv=None):
+    """Non-interactive batch entry point. Reads authors from a file or stdin,
+    scrapes them across worker processes, and prints a JSON summary.
+    """
+    parser = argparse.ArgumentParser(description="Scrape a batch of Waterstones author queries.")
+    parser.add_argument("authors", nargs="?", type=argparse.FileType("r"), default=sys.stdin,
+        help="file with one author per line (default: stdin)")
+    parser.add_argument("--processes", type=int, default=None,
+        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--requests-per-second", type=float, default=None,
+        help="maximum page requests per second across all processes")
+    parser.add_argument("--retries", type=int, default=2, help="retries per failed author")
+    parser.add_argument("--backoff", type=float, default=5.0,
+        help="seconds before the first retry, doubled for each later retry")
+    parser.add_argument("--detail-backend", choices=["selenium", "http"], default="selenium",
+        help="backend used to scrape book pages")
+    parser.add_argument("--backend", choices=["headless", "lean", "chrome", "edge", "http"],
+        default="headless", help="driver backend of every worker; lean blocks images, "
+        "fonts, media, and trackers, and http scrapes without a browser")
+    parser.add_argument("--language-workers", type=int, default=1,
+        help="number of language-filter pages each worker scrapes concurrently")
+    parser.add_argument("--results-cache", default=None, metavar="PATH",
+        help="SQLite file caching the links of each query, so repeated queries skip the search")
+    parser.add_argument("--results-ttl", type=float, default=6 * 60 * 60,
+        help="seconds for which cached query results are reused")
+    parser.add_argument("--http-cache", default=None, metavar="DIR",
+        help="folder of an on-disk cache of the pages and images fetched over HTTP, "
+        "shared by every process")
+    parser.add_argument("--summary", default=None, help="also write the JSON summary to this file")
+    args = parser.parse_args(argv)
+
+    authors = read_author_list(args.authors)
+    summary = run_batch(authors, processes=args.processes,
+        requests_per_second=args.requests_per_second, retries=args.retries,
+        backoff=args.backoff, scraper_kwargs={"backend" : args.backend,
+        "detail_backend" : args.detail_backend, "n_language_workers" : args.language_workers,
+        "results_cache_path" : args.results_cache, "results_cache_ttl" : args.results_ttl,
+        "http_cache_dir" : args.http_cache})
+    summary_json = json.dumps(summary, indent=2)
+    print(summary_json)
+    if args.summary is not None:
+        with open(args.summary, "w", encoding="utf-8") as handler:
+            handler.write(summary_json)
+
+    return 0 if not summary["failed"] else 1
+#%%
+if __name__ == "__main__":
+    sys.exit(main())
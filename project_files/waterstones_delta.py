@@ -0,0 +1,178 @@
+#%%
+from waterstones_records import BookRecord
+import csv
+import os
+import time
+#%%
+CHANGELOG_COLUMNS = ["Timestamp", "Change", "ID", "Title", "Old price (£)", "New price (£)"]
+#%%
+def isbn_from_link(book_link: str) -> int:
+    """Reads the ISBN from the last 13 characters of a product page URL, as
+    get_ISBN does.
+
+    Parameters
+    ----------
+    book_link : str
+        URL of a product page.
+
+    Returns
+    -------
+    int
+        ISBN number.
+    """
+    return int(book_link[-13:])
+
+def parse_timestamp(timestamp: str) -> float:
+    """Converts a time.ctime() timestamp from a previous output back to seconds
+    since the epoch.
+
+    Parameters
+    ----------
+    timestamp : str
+        Timestamp in time.ctime() format.
+
+    Returns
+    -------
+    float
+        Seconds since the epoch, or 0 if the timestamp cannot be read.
+    """
+    try:
+        return time.mktime(time.strptime(timestamp, "%a %b %d %H:%M:%S %Y"))
+    except (TypeError, ValueError):
+        return 0.0
+#%%
+class IncrementalScrape:
+    """Delta mode for re-scraping a query whose output already exists. Books are
+    keyed on ISBN: unseen ISBNs are scraped in full, known ISBNs only have their
+    price refreshed once their data is older than refresh_interval, and the
+    rest are carried over from the previous output without a request. Added,
+    removed, and repriced books are collected for a changelog.
+
+    Parameters
+    ----------
+    previous_csv_path : str
+        Path of the previous .csv output of the query. If it does not exist,
+        every book is treated as new.
+    refresh_interval : float
+        Seconds after which the price of a known book is scraped again.
+
+    Attributes
+    ----------
+    self.previous_rows : dict
+                Previous row of each known ISBN, as a compact BookRecord.
+    self.added : dict
+                BookRecord of each ISBN not in the previous output, by ISBN.
+    self.repriced : dict
+                (previous BookRecord, new price) of books whose price changed,
+                by ISBN.
+    self.seen : set
+                ISBNs found in the current results.
+    """
+    def __init__(self, previous_csv_path: str, refresh_interval=24 * 60 * 60) -> None:
+        self.previous_csv_path = previous_csv_path
+        self.refresh_interval = refresh_interval
+        self.previous_rows = {}
+        if os.path.exists(previous_csv_path):
+            import pandas as pd # imported when first needed, to keep startup fast
+
+            previous_df = pd.read_csv(previous_csv_path)
+            previous_df = previous_df.loc[:, ~previous_df.columns.str.startswith("Unnamed")]
+            for row in previous_df.to_dict(orient="records"):
+                self.previous_rows.setdefault(int(row["ID"]), BookRecord.from_dict(row))
+        self.added = {}
+        self.repriced = {}
+        self.seen = set()
+
+    def previous_row(self, book_link: str):
+        """Looks up the previous row of a book.
+
+        Parameters
+        ----------
+        book_link : str
+            URL of the book's product page.
+
+        Returns
+        -------
+        dict or None
+            Previous row of the book, or None if its ISBN is new.
+        """
+        previous_record = self.previous_rows.get(isbn_from_link(book_link))
+
+        return None if previous_record is None else previous_record.to_dict()
+
+    def is_due_for_refresh(self, previous_row: dict) -> bool:
+        """Checks whether a known book's price should be scraped again.
+
+        Parameters
+        ----------
+        previous_row : dict
+            Previous row of the book.
+
+        Returns
+        -------
+        bool
+            True if the row is older than self.refresh_interval.
+        """
+        age = time.time() - parse_timestamp(previous_row.get("Timestamp"))
+
+        return age >= self.refresh_interval
+
+    def observe(self, book_dict: dict):
+        """Records a book in the current results, noting it as added or
+        repriced compared with the previous output.
+
+        Parameters
+        ----------
+        book_dict : dict
+            Current data of the book.
+        """
+        isbn = int(book_dict["ID"])
+        self.seen.add(isbn)
+        previous_record = self.previous_rows.get(isbn)
+        if previous_record is None:
+            self.added[isbn] = BookRecord.from_dict(book_dict)
+        elif previous_record.price != float(book_dict["Price (£)"]):
+            self.repriced[isbn] = (previous_record, float(book_dict["Price (£)"]))
+
+    def removed(self) -> dict:
+        """Finds books in the previous output which are no longer in the
+        results. Only meaningful once every result page has been observed.
+
+        Returns
+        -------
+        dict
+            Previous BookRecord of each removed book, by ISBN.
+        """
+        return {isbn : row for isbn, row in self.previous_rows.items() if isbn not in self.seen}
+
+    def write_changelog(self, path: str) -> int:
+        """Appends the added, removed, and repriced books of this run to a
+        changelog .csv file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the changelog file, created with a header if missing.
+
+        Returns
+        -------
+        int
+            Number of changes written.
+        """
+        timestamp = time.ctime()
+        changes = []
+        for isbn, record in self.added.items():
+            changes.append([timestamp, "added", isbn, record.title, None, record.price])
+        for isbn, record in self.removed().items():
+            changes.append([timestamp, "removed", isbn, record.title, record.price, None])
+        for isbn, (record, new_price) in self.repriced.items():
+            changes.append([timestamp, "repriced", isbn, record.title, record.price, new_price])
+        write_header = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as handler:
+            writer = csv.writer(handler)
+            if write_header:
+                writer.writerow(CHANGELOG_COLUMNS)
+            writer.writerows(changes)
+
+        return len(changes)
+#%%
@@ -0,0 +1,308 @@
+#%%
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.edge.options import Options as EdgeOptions
+from waterstones_http_scraper import USER_AGENT
+import os
+import requests
+import shutil
+import tempfile
+import weakref
+#%%
+# environment variable naming a browser profile made by warm_profile, which is
+# copied for every browser started so Chrome skips its first-run setup
+PROFILE_TEMPLATE_ENV = "WATERSTONES_PROFILE_TEMPLATE"
+# requests blocked by the lean browser profile: images, fonts, media, and
+# third-party trackers. Stylesheets are kept as the waits rely on the layout,
+# and so is the cookie banner so it can still be accepted.
+LEAN_BLOCKED_URLS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*",
+    "*criteo.com*", "*criteo.net*", "*bat.bing.com*", "*pinterest.com*",
+    "*tiktok.com*", "*trustpilot.com*", "*newrelic.com*", "*nr-data.net*",
+]
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images" : 2,
+    "profile.managed_default_content_settings.media_stream" : 2,
+    "profile.default_content_setting_values.notifications" : 2,
+    "profile.default_content_setting_values.geolocation" : 2,
+}
+#%%
+def lean_chrome_options(options: Options) -> Options:
+    """Adds the settings of the lean browser profile to Chrome or Edge options:
+    images and media disabled through prefs, an eager page load strategy which
+    returns once the DOM is ready instead of waiting for every subresource, and
+    extensions and background networking disabled.
+
+    Parameters
+    ----------
+    options : Options
+        Chrome or Edge options to update.
+
+    Returns
+    -------
+    options : Options
+        The updated options.
+    """
+    options.page_load_strategy = "eager"
+    options.add_experimental_option("prefs", LEAN_PREFS)
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--disable-component-update")
+    options.add_argument("--disable-default-apps")
+    options.add_argument("--disable-sync")
+    options.add_argument("--mute-audio")
+    options.add_argument("--no-first-run")
+
+    return options
+#%%
+class HTTPPageDriver:
+    """Browser-free stand-in for a webdriver, used by the "http" backend. Pages
+    are fetched with a pooled requests.Session and kept as HTML, so they can be
+    navigated and parsed but nothing on them is rendered, run, or clicked.
+
+    Parameters
+    ----------
+    pool_size : int
+        Maximum number of keep-alive connections kept open per host.
+    timeout : float
+        Timeout in seconds applied to every request.
+    cache : HTTPResponseCache
+        Optional on-disk cache through which pages are fetched.
+
+    Attributes
+    ----------
+    self.session : requests.Session
+                Session with a pooled HTTP adapter mounted for http and https.
+    self.cache : HTTPResponseCache
+                On-disk cache through which pages are fetched, or None.
+    self.current_url : str
+                URL of the last loaded page, after any redirects.
+    self.page_source : str
+                HTML of the last loaded page.
+    """
+    def __init__(self, pool_size=10, timeout=10, cache=None) -> None:
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent" : USER_AGENT})
+        self.current_url = None
+        self.page_source = ""
+
+    def get(self, url: str):
+        """Loads a page, raising requests.HTTPError for an error status as a
+        browser would show an error page.
+        """
+        if self.cache is not None:
+            response = self.cache.get(self.session, url, timeout=self.timeout)
+        else:
+            response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        self.current_url = response.url
+        self.page_source = response.text
+
+    def set_page_load_timeout(self, seconds: float):
+        self.timeout = seconds
+
+    def find_element(self, by=None, value=None):
+        """Pages are not rendered, so elements cannot be looked up; fields are
+        parsed from self.page_source instead.
+        """
+        raise NoSuchElementException(f"No element lookups without a browser: {value}")
+
+    def find_elements(self, by=None, value=None) -> list:
+        return []
+
+    def get_cookies(self) -> list:
+        return [{"name" : cookie.name, "value" : cookie.value, "domain" : cookie.domain,
+            "path" : cookie.path} for cookie in self.session.cookies]
+
+    def quit(self):
+        self.session.close()
+#%%
+class BrowserDriverFactory:
+    """Creates Chrome or Edge webdrivers, headed or headless, with the default
+    or lean browser profile.
+
+    Parameters
+    ----------
+    browser : str
+        "chrome" or "edge".
+    headless : bool
+        Run the browser without a window.
+    browser_profile : str
+        "default" loads every resource of each page. "lean" blocks images,
+        fonts, media, and third-party trackers, and uses an eager page load
+        strategy with extensions disabled, which cuts bandwidth, page latency,
+        and the browser's memory. Image links are still read from the page source.
+    profile_template : str
+        Optional browser profile directory made by warm_profile. Each browser
+        starts from its own copy of it, so it starts warm. Defaults to the
+        directory in the WATERSTONES_PROFILE_TEMPLATE environment variable, if set.
+    """
+    uses_browser = True
+
+    def __init__(self, browser="chrome", headless=True, browser_profile="default",
+            profile_template=None) -> None:
+        if browser not in ("chrome", "edge"):
+            raise ValueError(f"Unknown browser {browser!r}.")
+        if browser_profile not in ("default", "lean"):
+            raise ValueError(f"Unknown browser profile {browser_profile!r}.")
+        self.browser = browser
+        self.headless = headless
+        self.browser_profile = browser_profile
+        self.profile_template = profile_template
+
+    def __repr__(self) -> str:
+        return (f"BrowserDriverFactory(browser={self.browser!r}, headless={self.headless!r}, "
+            f"browser_profile={self.browser_profile!r})")
+
+    def get_profile_template(self):
+        """Gets the profile template directory, or None if there is none.
+        """
+        template = self.profile_template or os.environ.get(PROFILE_TEMPLATE_ENV)
+
+        return template if template and os.path.isdir(template) else None
+
+    def options(self, user_data_dir=None):
+        """Builds the options of the browser.
+
+        Parameters
+        ----------
+        user_data_dir : str
+            Optional profile directory the browser uses.
+
+        Returns
+        -------
+        Options or EdgeOptions
+            Options for webdriver.Chrome or webdriver.Edge.
+        """
+        options = Options() if self.browser == "chrome" else EdgeOptions()
+        if self.headless:
+            options.add_argument("--headless")
+            options.add_argument(f"user-agent={{{USER_AGENT}}}")
+            options.add_argument("--no-sandbox")
+            options.add_argument("--window-size=1920,1080")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--disable-dev-shm-usage")
+        if self.browser_profile == "lean":
+            lean_chrome_options(options)
+        if user_data_dir is not None:
+            options.add_argument(f"--user-data-dir={user_data_dir}")
+
+        return options
+
+    def create(self):
+        """Starts a new browser.
+
+        Returns
+        -------
+        webdriver.Chrome or webdriver.Edge
+            New webdriver. With the lean profile, blocked URLs are already set.
+        """
+        user_data_dir = None
+        template = self.get_profile_template()
+        if template is not None:
+            # browsers cannot share a profile, so each one gets its own copy
+            user_data_dir = tempfile.mkdtemp(prefix="waterstones-profile-")
+            shutil.copytree(template, user_data_dir, dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns("Singleton*", "*.lock"))
+        if self.browser == "chrome":
+            driver = webdriver.Chrome(options=self.options(user_data_dir))
+        else:
+            driver = webdriver.Edge(options=self.options(user_data_dir))
+        if user_data_dir is not None:
+            weakref.finalize(driver, shutil.rmtree, user_data_dir, ignore_errors=True)
+        if self.browser_profile == "lean":
+            # blocked before they leave the browser, through the DevTools Protocol
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls" : LEAN_BLOCKED_URLS})
+
+        return driver
+#%%
+class HTTPDriverFactory:
+    """Creates HTTPPageDriver instances, for scraping without a browser. Steps
+    which need a browser are replaced: searches submit the search form's URL,
+    and results pages are always fetched by their page-number URLs.
+
+    Parameters
+    ----------
+    pool_size : int
+        Maximum number of keep-alive connections kept open per host.
+    """
+    uses_browser = False
+
+    def __init__(self, pool_size=10) -> None:
+        self.pool_size = pool_size
+
+    def __repr__(self) -> str:
+        return f"HTTPDriverFactory(pool_size={self.pool_size!r})"
+
+    def create(self) -> HTTPPageDriver:
+        return HTTPPageDriver(pool_size=self.pool_size)
+#%%
+DRIVER_BACKENDS = {
+    "chrome" : BrowserDriverFactory("chrome", headless=False),
+    "headless" : BrowserDriverFactory("chrome", headless=True),
+    "lean" : BrowserDriverFactory("chrome", headless=True, browser_profile="lean"),
+    "edge" : BrowserDriverFactory("edge", headless=False),
+    "http" : HTTPDriverFactory(),
+}
+#%%
+def warm_profile(path: str, backend="headless"):
+    """Starts a browser once with a new profile at path and quits it, so the
+    profile holds everything the browser sets up on its first run. Used as
+    the profile_template of later browsers, for example when building a
+    Docker image.
+
+    Parameters
+    ----------
+    path : str
+        Directory to create the profile in.
+    backend : str or BrowserDriverFactory
+        Browser backend whose browser creates the profile.
+    """
+    factory = get_driver_factory(backend)
+    if not factory.uses_browser:
+        raise ValueError(f"Backend {backend!r} has no browser profile to warm.")
+    os.makedirs(path, exist_ok=True)
+    options = factory.options(user_data_dir=os.path.abspath(path))
+    driver = webdriver.Chrome(options=options) if factory.browser == "chrome" \
+        else webdriver.Edge(options=options)
+    try:
+        driver.get("about:blank")
+    finally:
+        driver.quit()
+#%%
+def get_driver_factory(backend):
+    """Gets the driver factory of a backend, so the backend can be chosen at
+    runtime from a name in the configuration.
+
+    Parameters
+    ----------
+    backend : str or driver factory
+        Name of a backend in DRIVER_BACKENDS ("chrome", "headless", "lean",
+        "edge", or "http"), or a driver factory, which is returned as it is.
+
+    Returns
+    -------
+    BrowserDriverFactory or HTTPDriverFactory
+        Factory whose create method starts a driver.
+    """
+    if not isinstance(backend, str):
+        return backend
+    try:
+        return DRIVER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown driver backend {backend!r}; choose from "
+            f"{', '.join(DRIVER_BACKENDS)}.") from None
+#%%
@@ -0,0 +1,361 @@
+#%%
+from collections import Counter
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from urllib.parse import urlsplit
+import random
+import requests
+import threading
+import time
+#%%
+class CircuitOpenError(Exception):
+    """Raised instead of making a request to a host whose circuit breaker is
+    open after repeated failures.
+    """
+#%%
+class RetryableStatusError(Exception):
+    """Raised when a response has a status which should be retried, such as
+    429 Too Many Requests or a 5xx server error.
+    """
+    def __init__(self, url: str, status_code: int, retry_after=None) -> None:
+        super().__init__(f"{status_code} for url: {url}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+#%%
+# errors of loading or scraping one page or image, which are counted and skipped
+# rather than stopping a run
+FETCH_ERRORS = (WebDriverException, requests.RequestException, CircuitOpenError)
+#%%
+class CircuitBreaker:
+    """Per-host circuit breaker. After failure_threshold consecutive failures a
+    host's circuit opens and requests to it fail fast for reset_timeout seconds.
+    The next request after that is a trial: a success closes the circuit, and
+    a failure opens it again. Safe to share between threads.
+
+    Parameters
+    ----------
+    failure_threshold : int
+        Consecutive failures after which the circuit opens.
+    reset_timeout : float
+        Seconds the circuit stays open.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = Counter()
+        self._opened_at = {}
+        self._lock = threading.Lock()
+
+    def check(self, host: str):
+        """Raises CircuitOpenError if the circuit of host is open.
+        """
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+        if opened_at is not None and time.monotonic() - opened_at < self.reset_timeout:
+            raise CircuitOpenError(f"Circuit open for {host} after "
+                f"{self._failures[host]} consecutive failures.")
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def record_failure(self, host: str) -> bool:
+        """Counts a failure, opening the circuit at the threshold.
+
+        Returns
+        -------
+        bool
+            True if the circuit of host is now open.
+        """
+        with self._lock:
+            self._failures[host] += 1
+            if self._failures[host] >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+                return True
+
+        return False
+#%%
+class AdaptiveConcurrencyLimiter:
+    """Limits the number of requests in flight, halving the limit whenever the
+    site signals overload (429 or 5xx) and growing it back by about one slot
+    per limit's worth of successful requests. Safe to share between threads.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        Upper bound of the limit, and its starting value.
+    """
+    def __init__(self, max_concurrency=8) -> None:
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify()
+
+    def raise_ceiling(self, max_concurrency: int):
+        """Raises the upper bound of the limit to max_concurrency, if higher.
+        A limit which has not been lowered by overload is raised with it.
+        """
+        with self._condition:
+            if max_concurrency <= self.max_concurrency:
+                return
+            if self.limit >= self.max_concurrency:
+                self.limit = float(max_concurrency)
+            self.max_concurrency = max_concurrency
+            self._condition.notify_all()
+
+    def on_overload(self):
+        with self._condition:
+            self.limit = max(1.0, self.limit / 2)
+#%%
+class FetchPolicy:
+    """Shared policy applied to every page and image fetch: per-request
+    timeouts, retries with exponential backoff and jitter, a per-host circuit
+    breaker, and adaptive concurrency which backs off when the site returns 429
+    or 5xx. Every retry and final failure is counted by stage, so failures show
+    up in the run summary instead of being hidden. Safe to share between threads.
+
+    Parameters
+    ----------
+    timeout : float
+        Timeout in seconds for each HTTP request.
+    page_load_timeout : float
+        Timeout in seconds for each page load of a webdriver.
+    retries : int
+        Number of retries after the first attempt of a request.
+    backoff : float
+        Seconds before the first retry, doubled for each later retry and
+        multiplied by a random jitter factor between 0.5 and 1.5.
+    max_backoff : float
+        Upper bound of the delay between retries.
+    failure_threshold : int
+        Consecutive failures of a host after which its circuit opens.
+    reset_timeout : float
+        Seconds a host's circuit stays open.
+    max_concurrency : int
+        Fixed maximum number of requests in flight through the policy. By
+        default the maximum starts at DEFAULT_MAX_CONCURRENCY and is raised by
+        fit_concurrency to the number of workers sharing the policy.
+    retry_statuses : tuple
+        HTTP statuses which are retried.
+
+    Attributes
+    ----------
+    self.stats : Counter
+                Numbers of requests, retries, overload responses, and requests
+                refused by an open circuit.
+    self.failures : Counter
+                Number of requests which failed after every retry, by stage.
+    self.errors : list
+                (stage, url, error message) of the most recent failures.
+    self.skipped : Counter
+                Number of books and language pages skipped after a failure.
+    """
+    RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, TimeoutException,
+        RetryableStatusError)
+    MAX_ERRORS_KEPT = 100
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    def __init__(self, timeout=10.0, page_load_timeout=30.0, retries=3, backoff=0.5,
+            max_backoff=30.0, failure_threshold=5, reset_timeout=30.0, max_concurrency=None,
+            retry_statuses=(429, 500, 502, 503, 504)) -> None:
+        self.timeout = timeout
+        self.page_load_timeout = page_load_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.fixed_concurrency = max_concurrency is not None
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            self.DEFAULT_MAX_CONCURRENCY if max_concurrency is None else max_concurrency)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def fit_concurrency(self, n_requests: int):
+        """Makes room for n_requests requests in flight at once, usually one per
+        worker sharing the policy, by raising the maximum of adaptive
+        concurrency. A fixed max_concurrency is kept, with a message that it
+        holds the workers back.
+
+        Parameters
+        ----------
+        n_requests : int
+            Number of requests the callers may make at the same time.
+        """
+        if n_requests <= self.concurrency.max_concurrency:
+            return
+        if self.fixed_concurrency:
+            print(f"max_concurrency={self.concurrency.max_concurrency} allows fewer requests "
+                f"in flight than the {n_requests} workers sharing the fetch policy.")
+            return
+        self.concurrency.raise_ceiling(n_requests)
+
+    def reset_stats(self):
+        """Clears the counts, keeping the state of the circuit breakers.
+        """
+        with self._lock:
+            self.stats = Counter()
+            self.failures = Counter()
+            self.errors = []
+            self.skipped = Counter()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def record_failure(self, stage: str, url: str, error: Exception):
+        """Counts a failure which the caller handles, so it appears in the
+        run summary.
+
+        Parameters
+        ----------
+        stage : str
+            Stage in which the failure happened.
+        url : str
+            URL being processed.
+        error : Exception
+            The failure.
+        """
+        with self._lock:
+            self.failures[stage] += 1
+            self.errors.append((stage, url, f"{type(error).__name__}: {error}"))
+            del self.errors[:-self.MAX_ERRORS_KEPT]
+
+    def record_skipped(self, kind: str):
+        """Counts a book or language page skipped after a failure.
+        """
+        with self._lock:
+            self.skipped[kind] += 1
+
+    def _check_status(self, url: str, result):
+        status_code = getattr(result, "status_code", None)
+        if status_code in self.retry_statuses:
+            retry_after = getattr(result, "headers", {}).get("Retry-After")
+            raise RetryableStatusError(url, status_code, retry_after)
+
+    def _as_retryable(self, url: str, error: Exception) -> Exception:
+        # raise_for_status errors carry the response, so 429 and 5xx are retried
+        response = getattr(error, "response", None)
+        if isinstance(error, requests.HTTPError) and response is not None \
+                and response.status_code in self.retry_statuses:
+            return RetryableStatusError(url, response.status_code,
+                getattr(response, "headers", {}).get("Retry-After"))
+
+        return error
+
+    def backoff_delay(self, attempt: int, retry_after=None) -> float:
+        """Seconds to wait before retry number attempt + 1, with jitter, and
+        at least as long as a numeric Retry-After header asks.
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+        try:
+            delay = max(delay, min(self.max_backoff, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+
+        return delay
+
+    def call(self, stage: str, url: str, function, *args, **kwargs):
+        """Calls function(*args, **kwargs), which makes a request to url, under
+        the policy. Connection errors, timeouts, and responses or HTTPErrors
+        with a retried status are retried with backoff; any other error is
+        raised at once.
+
+        Parameters
+        ----------
+        stage : str
+            Stage the request belongs to, under which failures are counted.
+        url : str
+            URL requested, whose host selects the circuit breaker.
+        function : callable
+            Function making the request.
+
+        Returns
+        -------
+        Whatever function returns.
+
+        Raises
+        ------
+        CircuitOpenError
+            If the circuit of the host is open.
+        Exception
+            The last error of function once every retry has failed.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            try:
+                self.circuit_breaker.check(host)
+            except CircuitOpenError as error:
+                self._count("circuit_open")
+                self.record_failure(stage, url, error)
+                raise
+            self._count("requests")
+            result = None
+            try:
+                with self.concurrency:
+                    result = function(*args, **kwargs)
+                self._check_status(url, result)
+            except Exception as raised:
+                error = self._as_retryable(url, raised)
+                if isinstance(error, RetryableStatusError):
+                    self._count("overloaded")
+                    self.concurrency.on_overload()
+                if not isinstance(error, self.RETRYABLE_ERRORS):
+                    self.record_failure(stage, url, error)
+                    raise
+                self.circuit_breaker.record_failure(host)
+                if attempt == self.retries:
+                    self.record_failure(stage, url, error)
+                    if result is not None: # the caller handles the status as usual
+                        return result
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff_delay(attempt, getattr(error, "retry_after", None)))
+                continue
+            self.circuit_breaker.record_success(host)
+            self.concurrency.on_success()
+
+            return result
+
+    def summary(self) -> dict:
+        """Summarises the requests made under the policy.
+
+        Returns
+        -------
+        dict
+            Counts of requests, retries, overload responses, and requests refused
+            by an open circuit, failures by stage, the total number of failures,
+            the numbers of books and language pages skipped, the current
+            concurrency limit, and the most recent errors.
+        """
+        with self._lock:
+            return {
+                "requests" : self.stats["requests"],
+                "retries" : self.stats["retries"],
+                "overloaded" : self.stats["overloaded"],
+                "circuit_open" : self.stats["circuit_open"],
+                "failures" : sum(self.failures.values()),
+                "failures_by_stage" : dict(self.failures),
+                "skipped" : dict(self.skipped),
+                "concurrency_limit" : int(self.concurrency.limit),
+                "recent_errors" : [list(error) for error in self.errors[-10:]],
+            }
+#%%
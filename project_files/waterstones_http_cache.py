@@ -0,0 +1,230 @@
+#%%
+from requests.exceptions import HTTPError
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+#%%
+class CachedResponse:
+    """Minimal stand-in for requests.Response returned by HTTPResponseCache,
+    whether the body came from the network or from disk.
+
+    Attributes
+    ----------
+    self.status_code : int
+                HTTP status of the original response.
+    self.url : str
+                Final URL of the original response, after any redirects.
+    self.content : bytes
+                Response body.
+    self.headers : dict
+                Headers of the original response when it came from the network,
+                empty when the body came from disk.
+    self.from_cache : bool
+                True if the body was served from disk.
+    """
+    def __init__(self, url: str, status_code: int, content: bytes, encoding=None,
+            from_cache=False, headers=None) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = {} if headers is None else headers
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+#%%
+class HTTPResponseCache:
+    """Local on-disk cache for GET responses. Bodies are stored once per distinct
+    content under their SHA-256 hash, and an SQLite index maps each URL to its
+    body and validators. Fresh entries are served from disk, stale entries are
+    revalidated with If-None-Match / If-Modified-Since, and the least recently
+    used entries are evicted once the cache grows beyond max_bytes. Safe to share
+    between threads.
+
+    Parameters
+    ----------
+    directory : str
+        Folder holding the index and the stored bodies.
+    ttl : float
+        Seconds for which an entry is served without revalidation.
+    max_bytes : int
+        Maximum total size of stored bodies.
+
+    Attributes
+    ----------
+    self.stats : dict
+                Counts of hits, misses, revalidated entries, evictions, and bytes
+                served from disk.
+    """
+    def __init__(self, directory: str, ttl=24 * 60 * 60, max_bytes=1024 ** 3) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits" : 0, "misses" : 0, "revalidated" : 0, "evictions" : 0,
+            "bytes_from_cache" : 0}
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"),
+            check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.commit()
+
+    def _object_path(self, body_hash: str) -> str:
+        return os.path.join(self.directory, "objects", body_hash[:2], body_hash)
+
+    def _read_body(self, body_hash: str) -> bytes:
+        with open(self._object_path(body_hash), "rb") as handler:
+            return handler.read()
+
+    def _write_body(self, content: bytes) -> str:
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._object_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part_path = f"{path}.{threading.get_ident()}.part"
+            with open(part_path, "wb") as handler:
+                handler.write(content)
+            os.replace(part_path, path)
+
+        return body_hash
+
+    def _lookup(self, url: str):
+        with self._lock:
+            return self._db.execute("""SELECT final_url, body_hash, encoding, etag,
+                last_modified, stored_at FROM entries WHERE url = ?""", (url,)).fetchone()
+
+    def _store(self, url: str, response):
+        body_hash = self._write_body(response.content)
+        now = time.time()
+        with self._lock:
+            self._db.execute("""INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (url, response.url, body_hash, len(response.content), response.encoding,
+                response.headers.get("ETag"), response.headers.get("Last-Modified"), now, now))
+            self._db.commit()
+        self._evict()
+
+    def _touch(self, url: str, revalidated=False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE url = ?",
+                    (now, now, url))
+            else:
+                self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            removed_hashes = set()
+            for url, body_hash, size in self._db.execute(
+                    "SELECT url, body_hash, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                removed_hashes.add(body_hash)
+                total -= size
+                self.stats["evictions"] += 1
+            for body_hash in removed_hashes:
+                still_used = self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1",
+                    (body_hash,)).fetchone()
+                if still_used is None:
+                    try:
+                        os.remove(self._object_path(body_hash))
+                    except FileNotFoundError:
+                        pass
+            self._db.commit()
+
+    def _from_disk(self, url: str, entry) -> CachedResponse:
+        final_url, body_hash, encoding = entry[:3]
+        content = self._read_body(body_hash)
+        with self._lock:
+            self.stats["bytes_from_cache"] += len(content)
+
+        return CachedResponse(final_url, 200, content, encoding, from_cache=True)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, session, url: str, timeout=10) -> CachedResponse:
+        """Gets url through the cache.
+
+        Parameters
+        ----------
+        session : requests.Session
+            Session used for requests which cannot be served from disk. The
+            requests module itself may be passed to use no session.
+        url : str
+            URL to get.
+        timeout : float
+            Timeout in seconds for network requests.
+
+        Returns
+        -------
+        CachedResponse
+            Response from disk or the network. Only successful responses are
+            cached.
+        """
+        entry = self._lookup(url)
+        if entry is not None:
+            try:
+                if time.time() - entry[5] < self.ttl:
+                    response = self._from_disk(url, entry)
+                    self._touch(url)
+                    self._count("hits")
+                    return response
+                headers = {}
+                if entry[3]:
+                    headers["If-None-Match"] = entry[3]
+                if entry[4]:
+                    headers["If-Modified-Since"] = entry[4]
+                if headers:
+                    response = session.get(url, headers=headers, timeout=timeout)
+                    if response.status_code == 304:
+                        cached = self._from_disk(url, entry)
+                        self._touch(url, revalidated=True)
+                        self._count("revalidated")
+                        return cached
+                else:
+                    response = session.get(url, timeout=timeout)
+            except FileNotFoundError:
+                # body removed from disk behind the index, treat as a miss
+                response = session.get(url, timeout=timeout)
+        else:
+            response = session.get(url, timeout=timeout)
+        self._count("misses")
+        if response.status_code == 200:
+            self._store(url, response)
+
+        return CachedResponse(response.url, response.status_code, response.content,
+            response.encoding, headers=response.headers)
+
+    def close(self):
+        """Closes the index database.
+        """
+        with self._lock:
+            self._db.close()
+#%%
@@ -0,0 +1,172 @@
+#%%
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import NoSuchElementException
+from waterstones_fetch_policy import FetchPolicy
+from waterstones_metrics import timed_stage
+from waterstones_page_parser import parse_book_page
+import requests
+#%%
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36")
+#%%
+class WaterstonesHTTPScraper:
+    """Browser-free scraper for Waterstones product pages. Pages are fetched with
+    a pooled requests.Session and parsed locally, so the getter methods share the
+    names and return types of those in the WaterstonesScraper class but
+    make no WebDriver round trips.
+
+    Parameters
+    ----------
+    pool_size : int
+        Maximum number of keep-alive connections kept open per host.
+    timeout : float
+        Timeout in seconds applied to every request.
+    cache : HTTPResponseCache
+        Optional on-disk cache through which pages and images are fetched.
+    metrics : StageMetrics
+        Optional recorder of the count, latency, and bytes of each call.
+    fetch_policy : FetchPolicy
+        Retries, circuit breaker, and adaptive concurrency applied to every
+        request. Defaults to a new FetchPolicy with the given timeout.
+
+    Attributes
+    ----------
+    self.session : requests.Session
+                Session with a pooled HTTP adapter mounted for http and https.
+    self.current_url : str
+                URL of the last loaded page, after any redirects.
+    self.page_fields : dict
+                Fields parsed from the last loaded page.
+    """
+    def __init__(self, pool_size=10, timeout=10, cache=None, metrics=None,
+            fetch_policy=None) -> None:
+        self.timeout = timeout
+        self.fetch_policy = FetchPolicy(timeout=timeout) if fetch_policy is None else fetch_policy
+        self.cache = cache
+        self.metrics = metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent" : USER_AGENT})
+        self.current_url = None
+        self.page_fields = {}
+
+    def _get(self, url: str, stage="load_book_page"):
+        if self.cache is not None:
+            return self.fetch_policy.call(stage, url, self.cache.get, self.session, url,
+                timeout=self.timeout)
+
+        return self.fetch_policy.call(stage, url, self.session.get, url, timeout=self.timeout)
+
+    @timed_stage("load_book_page")
+    def load_book_page(self, book_link: str) -> requests.Response:
+        """Fetches a product page and parses all book fields from it.
+
+        Parameters
+        ----------
+        book_link : str
+            URL of the product page.
+
+        Returns
+        -------
+        requests.Response or CachedResponse
+            Response of the product page request.
+        """
+        response = self._get(book_link)
+        response.raise_for_status()
+        self.current_url = response.url
+        self.page_fields = parse_book_page(response.text, response.url)
+        if self.metrics is not None:
+            self.metrics.add_bytes("load_book_page", len(response.content))
+
+        return response
+
+    def quit_browser(self):
+        """Closes the HTTP session and its pooled connections.
+        """
+        self.session.close()
+
+    def _get_field(self, field: str) -> str:
+        try:
+            return self.page_fields[field]
+        except KeyError:
+            raise NoSuchElementException(f"No {field} found on {self.current_url}.")
+
+    @timed_stage("get_author")
+    def get_author(self) -> str:
+        """Scrapes the author's name.
+
+        Returns
+        -------
+        str
+            Name of the author.
+        """
+        return self._get_field("author")
+
+    @timed_stage("get_title")
+    def get_title(self) -> str:
+        """Scrapes the book title.
+
+        Returns
+        -------
+        str
+            Title of the book.
+        """
+        return self._get_field("title")
+
+    @timed_stage("get_ISBN")
+    def get_ISBN(self) -> int:
+        """Scrapes ISBN from the last 13 characters of the product page URL.
+
+        Returns
+        -------
+        int
+            ISBN number.
+        """
+        isbn = self.current_url[-13:]
+
+        return int(isbn)
+
+    @timed_stage("get_price")
+    def get_price(self) -> float:
+        """Scrapes price in GBP.
+
+        Returns
+        -------
+        float
+            Item price.
+        """
+        price = self._get_field("price").strip('£')
+
+        return float(price)
+
+    @timed_stage("get_image_link")
+    def get_image_link(self) -> str:
+        """Scrapes links for book images.
+
+        Returns
+        -------
+        str
+            Source of image link.
+        """
+        return self._get_field("image")
+
+    @timed_stage("download_img")
+    def download_img(self, img_url: str, file_path: str):
+        """Downloads image over the pooled session.
+
+        Parameters
+        ----------
+        img_url : str
+            URL of image to be downloaded.
+        file_path : str
+            File path of location where the image is to be saved.
+        """
+        response = self._get(img_url, "download_img")
+        response.raise_for_status()
+        with open(file_path, "wb") as handler:
+            handler.write(response.content)
+        if self.metrics is not None:
+            self.metrics.add_bytes("download_img", len(response.content))
+#%%
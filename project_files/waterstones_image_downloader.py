@@ -0,0 +1,153 @@
+#%%
+from requests.adapters import HTTPAdapter
+from waterstones_fetch_policy import CircuitOpenError, FetchPolicy
+import asyncio
+import os
+import requests
+import time
+#%%
+class AsyncImageDownloader:
+    """asyncio stage which downloads many images with a bounded number of requests
+    in flight. Requests share one pooled requests.Session so connections are kept
+    alive between images, and each body is streamed to disk in chunks rather than
+    held in memory.
+
+    Parameters
+    ----------
+    max_in_flight : int
+        Maximum number of images being downloaded at once.
+    timeout : float
+        Timeout in seconds for connecting and for each read.
+    chunk_size : int
+        Number of bytes read from the response and written to disk at a time.
+    cache : HTTPResponseCache
+        Optional on-disk cache through which images are fetched. Cached images
+        are held in memory once rather than streamed.
+    fetch_policy : FetchPolicy
+        Retries with backoff, circuit breaker, and adaptive concurrency applied
+        to every download. Defaults to a new FetchPolicy with the given timeout.
+
+    Attributes
+    ----------
+    self.session : requests.Session
+                Session whose connection pool is sized to max_in_flight.
+    self.failures : list
+                (img_url, error message) tuples for images which failed to download.
+    """
+    def __init__(self, max_in_flight=8, timeout=10, chunk_size=64 * 1024, cache=None,
+            fetch_policy=None) -> None:
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.timeout = timeout
+        self.fetch_policy = FetchPolicy(timeout=timeout) if fetch_policy is None else fetch_policy
+        self.fetch_policy.fit_concurrency(max_in_flight)
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.failures = []
+
+    def download_img(self, img_url: str, file_path: str) -> int:
+        """Streams one image to disk. The file is written under a temporary name
+        and only renamed to file_path once complete, so a failed download
+        leaves neither a partial image nor its temporary file behind.
+
+        Parameters
+        ----------
+        img_url : str
+            URL of image to be downloaded.
+        file_path : str
+            File path of location where the image is to be saved.
+
+        Returns
+        -------
+        int
+            Number of bytes written.
+        """
+        part_path = f"{file_path}.part"
+        try:
+            if self.cache is not None:
+                response = self.cache.get(self.session, img_url, timeout=self.timeout)
+                response.raise_for_status()
+                with open(part_path, "wb") as handler:
+                    handler.write(response.content)
+                os.replace(part_path, file_path)
+                return len(response.content)
+            n_bytes = 0
+            with self.session.get(img_url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as handler:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        handler.write(chunk)
+                        n_bytes += len(chunk)
+            os.replace(part_path, file_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        return n_bytes
+
+    async def _download_one(self, semaphore, img_url: str, file_path: str) -> int:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(self.fetch_policy.call, "download_img",
+                    img_url, self.download_img, img_url, file_path)
+            except (requests.RequestException, OSError, CircuitOpenError) as error:
+                self.failures.append((img_url, str(error)))
+                return 0
+
+    async def download_all(self, downloads: list) -> dict:
+        """Downloads every image concurrently.
+
+        Parameters
+        ----------
+        downloads : list
+            (img_url, file_path) tuples.
+
+        Returns
+        -------
+        dict
+            Download statistics: number of images and bytes saved, failures,
+            wall time in seconds, images per second and bytes per second.
+        """
+        self.failures = []
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        start = time.perf_counter()
+        sizes = await asyncio.gather(*(self._download_one(semaphore, img_url, file_path)
+            for img_url, file_path in downloads))
+        seconds = time.perf_counter() - start
+        images = len(downloads) - len(self.failures)
+        n_bytes = sum(sizes)
+
+        return {
+            "images" : images,
+            "bytes" : n_bytes,
+            "failures" : len(self.failures),
+            "seconds" : seconds,
+            "images_per_second" : images / seconds if seconds else 0.0,
+            "bytes_per_second" : n_bytes / seconds if seconds else 0.0,
+        }
+
+    def run(self, downloads: list) -> dict:
+        """Runs download_all in a new event loop. Use download_all directly
+        from code which is already running in an event loop.
+
+        Parameters
+        ----------
+        downloads : list
+            (img_url, file_path) tuples.
+
+        Returns
+        -------
+        dict
+            Download statistics, see download_all.
+        """
+        return asyncio.run(self.download_all(downloads))
+
+    def close(self):
+        """Closes the session and its pooled connections.
+        """
+        self.session.close()
+#%%
@@ -0,0 +1,194 @@
+#%%
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+#%%
+def process_image(file_path: str, thumbnail_directory: str, thumbnail_size: tuple) -> dict:
+    """Verifies one downloaded cover, hashes its content, and writes its
+    thumbnail. Runs in a worker process of a CoverImageProcessor.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the downloaded cover.
+    thumbnail_directory : str
+        Folder in which thumbnails are saved under the content hash.
+    thumbnail_size : tuple
+        Maximum (width, height) of thumbnails. The aspect ratio is kept.
+
+    Returns
+    -------
+    dict
+        Path, SHA-256 hash, size in bytes, and width and height of the image,
+        with the path of its thumbnail, or an error if it is not a valid JPEG.
+    """
+    from PIL import Image # optional dependency, only needed to process images
+
+    result = {"path" : file_path}
+    try:
+        with open(file_path, "rb") as handler:
+            data = handler.read()
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format != "JPEG":
+                raise ValueError(f"not a JPEG but {image.format}")
+            image.verify()
+        content_hash = hashlib.sha256(data).hexdigest()
+        thumbnail_path = os.path.join(thumbnail_directory, f"{content_hash}.jpg")
+        with Image.open(io.BytesIO(data)) as image:
+            result.update(width=image.width, height=image.height)
+            if not os.path.exists(thumbnail_path):
+                image = image.convert("RGB")
+                image.thumbnail(thumbnail_size)
+                part_path = f"{thumbnail_path}.{os.getpid()}.part"
+                image.save(part_path, "JPEG", quality=85, optimize=True)
+                os.replace(part_path, thumbnail_path)
+    except Exception as error: # any unreadable image is reported, not raised
+        result["error"] = f"{type(error).__name__}: {error}"
+        return result
+    result.update(hash=content_hash, bytes=len(data), thumbnail=thumbnail_path)
+
+    return result
+#%%
+class CoverImageProcessor:
+    """Post-processing stage for downloaded covers. Each image is verified as a
+    decodable JPEG, hashed, and thumbnailed in a pool of worker processes.
+    Identical covers of different ISBNs and editions are then stored once in a
+    content-addressed archive, with each images/<isbn>.jpg hard-linked to its
+    archived copy, and invalid downloads are deleted so they are fetched again.
+    A manifest maps each ISBN to its content hash, and each hash to its
+    archived image, thumbnail, and every path it is saved at.
+
+    Parameters
+    ----------
+    directory : str
+        Folder of the archive, holding objects/, thumbnails/ and manifest.json.
+        Shared between queries.
+    processes : int
+        Number of worker processes. Defaults to the number of CPUs.
+    thumbnail_size : tuple
+        Maximum (width, height) of thumbnails.
+
+    Attributes
+    ----------
+    self.manifest : dict
+                "isbns" maps each ISBN to its content hash, and "images" maps
+                each content hash to its paths, size, and dimensions.
+    """
+    def __init__(self, directory: str, processes=None, thumbnail_size=(160, 240)) -> None:
+        import PIL # optional dependency, only needed to process images
+
+        self.directory = directory
+        self.processes = processes
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.objects_directory = os.path.join(directory, "objects")
+        self.thumbnail_directory = os.path.join(directory, "thumbnails")
+        os.makedirs(self.objects_directory, exist_ok=True)
+        os.makedirs(self.thumbnail_directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.manifest = {"isbns" : {}, "images" : {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as handler:
+                self.manifest = json.load(handler)
+
+    def _is_processed(self, isbn: str, file_path: str) -> bool:
+        content_hash = self.manifest["isbns"].get(isbn)
+        if content_hash is None:
+            return False
+        image = self.manifest["images"][content_hash]
+
+        return file_path in image["paths"] and os.path.exists(image["object"])
+
+    def _archive(self, isbn: str, result: dict) -> bool:
+        """Stores a verified image once under its content hash and links its
+        ISBN path to that copy.
+
+        Returns
+        -------
+        bool
+            True if an identical image was already archived.
+        """
+        content_hash = result["hash"]
+        object_path = os.path.join(self.objects_directory, f"{content_hash}.jpg")
+        duplicate = os.path.exists(object_path)
+        if duplicate:
+            if not os.path.samefile(object_path, result["path"]):
+                part_path = f"{result['path']}.part"
+                try:
+                    os.link(object_path, part_path)
+                    os.replace(part_path, result["path"])
+                except OSError: # no hard links here, so keep the separate copy
+                    pass
+        else:
+            try:
+                os.link(result["path"], object_path)
+            except OSError: # no hard links here, so archive a copy
+                shutil.copyfile(result["path"], object_path)
+        image = self.manifest["images"].setdefault(content_hash, {
+            "object" : object_path,
+            "thumbnail" : result["thumbnail"],
+            "bytes" : result["bytes"],
+            "width" : result["width"],
+            "height" : result["height"],
+            "paths" : [],
+        })
+        if result["path"] not in image["paths"]:
+            image["paths"].append(result["path"])
+        self.manifest["isbns"][isbn] = content_hash
+
+        return duplicate
+
+    def process(self, images: dict) -> dict:
+        """Verifies, thumbnails, and deduplicates a batch of downloaded covers,
+        then saves the manifest. Images already in the manifest, or missing
+        from disk, are skipped.
+
+        Parameters
+        ----------
+        images : dict
+            Path of each downloaded cover, by ISBN.
+
+        Returns
+        -------
+        stats : dict
+            Number of images processed, valid, invalid, and duplicates of an
+            archived image, bytes saved by deduplication, seconds taken, and
+            the error of each invalid image by ISBN.
+        """
+        start = time.perf_counter()
+        images = {str(isbn) : file_path for isbn, file_path in images.items()
+            if os.path.exists(file_path) and not self._is_processed(str(isbn), file_path)}
+        stats = {"images" : len(images), "valid" : 0, "invalid" : 0, "duplicates" : 0,
+            "bytes_saved" : 0, "errors" : {}}
+        if images:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                results = list(executor.map(process_image, images.values(),
+                    [self.thumbnail_directory] * len(images),
+                    [self.thumbnail_size] * len(images), chunksize=8))
+            for isbn, result in zip(images, results):
+                if "error" in result:
+                    stats["invalid"] += 1
+                    stats["errors"][isbn] = result["error"]
+                    if os.path.exists(result["path"]):
+                        os.remove(result["path"]) # so it is downloaded again
+                    continue
+                stats["valid"] += 1
+                if self._archive(isbn, result):
+                    stats["duplicates"] += 1
+                    stats["bytes_saved"] += result["bytes"]
+            self.save()
+        stats["seconds"] = time.perf_counter() - start
+
+        return stats
+
+    def save(self):
+        """Writes the manifest atomically.
+        """
+        part_path = f"{self.manifest_path}.part"
+        with open(part_path, "w", encoding="utf-8") as handler:
+            json.dump(self.manifest, handler, indent=2, sort_keys=True)
+        os.replace(part_path, self.manifest_path)
+#%%
@@ -0,0 +1,221 @@
+#%%
+from waterstones_records import BookRecord
+import hashlib
+import math
+import os
+import threading
+#%%
+class BloomFilter:
+    """Fixed-size probabilistic set of ISBNs. Membership tests never miss an
+    added ISBN, and report an ISBN that was never added with probability of
+    about error_rate.
+
+    Parameters
+    ----------
+    expected_items : int
+        Number of ISBNs the filter is sized for.
+    error_rate : float
+        Target false positive rate at expected_items.
+    """
+    def __init__(self, expected_items=1_000_000, error_rate=0.001) -> None:
+        self.n_bits = max(8, int(-expected_items * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / expected_items * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def _positions(self, isbn: int):
+        digest = hashlib.blake2b(str(isbn).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.n_hashes):
+            yield (first + i * second) % self.n_bits
+
+    def add(self, isbn: int):
+        for position in self._positions(isbn):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, isbn: int) -> bool:
+        return all(self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(isbn))
+
+    def save(self, path: str):
+        with open(path, "wb") as handler:
+            handler.write(self.n_bits.to_bytes(8, "little"))
+            handler.write(self.n_hashes.to_bytes(8, "little"))
+            handler.write(self.bits)
+
+    @classmethod
+    def load(cls, path: str):
+        bloom_filter = cls.__new__(cls)
+        with open(path, "rb") as handler:
+            bloom_filter.n_bits = int.from_bytes(handler.read(8), "little")
+            bloom_filter.n_hashes = int.from_bytes(handler.read(8), "little")
+            bloom_filter.bits = bytearray(handler.read())
+
+        return bloom_filter
+#%%
+class SeenISBNIndex:
+    """Index of ISBNs already scraped in a run, shared by every language filter
+    and every author query, so each product page and cover image is fetched once.
+    Books scraped in this run can be remembered so repeats reuse their data;
+    otherwise repeats are skipped like books seen in an earlier run, and only
+    the ISBNs are kept.
+    The index can be persisted between runs, as a plain set or, for very large
+    catalogues, as a Bloom filter. Safe to share between threads: a lookup of
+    a book another thread has claimed but not yet scraped waits for it, so
+    "being fetched now" is never mistaken for "seen in an earlier run".
+
+    Parameters
+    ----------
+    path : str
+        Optional file from which seen ISBNs are loaded and to which save writes.
+    use_bloom_filter : bool
+        Track ISBNs in a BloomFilter instead of a set.
+    expected_items : int
+        Number of ISBNs the Bloom filter is sized for.
+    error_rate : float
+        Target false positive rate of the Bloom filter.
+    keep_records : bool
+        True (default) to remember the data of each book scraped in this run,
+        so that repeats reuse it. False keeps memory to the ISBNs alone.
+
+    Attributes
+    ----------
+    self.records : dict
+                Compact BookRecord of each book scraped in this run, by ISBN,
+                if keep_records is True.
+    self.image_paths : dict
+                Path each cover image was saved to in this run, by ISBN.
+    self.duplicates : int
+                Number of product pages not fetched because their ISBN was seen.
+    """
+    def __init__(self, path=None, use_bloom_filter=False, expected_items=1_000_000,
+            error_rate=0.001, keep_records=True) -> None:
+        self.path = path
+        self.keep_records = keep_records
+        self.use_bloom_filter = use_bloom_filter
+        if use_bloom_filter:
+            if path is not None and os.path.exists(path):
+                self.seen = BloomFilter.load(path)
+            else:
+                self.seen = BloomFilter(expected_items, error_rate)
+        else:
+            self.seen = set()
+            if path is not None and os.path.exists(path):
+                with open(path, encoding="utf-8") as handler:
+                    self.seen.update(int(line) for line in handler if line.strip())
+        self.records = {}
+        self.image_paths = {}
+        self.duplicates = 0
+        self._in_flight = {} # isbn -> Event set once the claiming thread is done
+        self._lock = threading.Lock()
+
+    def __contains__(self, isbn: int) -> bool:
+        with self._lock:
+            return isbn in self.seen
+
+    def claim(self, isbn: int) -> bool:
+        """Marks an ISBN as seen.
+
+        Parameters
+        ----------
+        isbn : int
+            ISBN about to be scraped.
+
+        Returns
+        -------
+        bool
+            True if the ISBN had not been seen, so its page should be fetched.
+            The caller must then call remember or release.
+        """
+        with self._lock:
+            if isbn in self.seen:
+                self.duplicates += 1
+                return False
+            self.seen.add(isbn)
+            self._in_flight[isbn] = threading.Event()
+
+            return True
+
+    def _finish(self, isbn: int):
+        event = self._in_flight.pop(isbn, None)
+        if event is not None:
+            event.set()
+
+    def release(self, isbn: int):
+        """Unmarks an ISBN whose page failed to load, so it is fetched again.
+        ISBNs cannot be removed from a Bloom filter, so there they stay seen.
+        """
+        with self._lock:
+            if not self.use_bloom_filter:
+                self.seen.discard(isbn)
+            self._finish(isbn)
+
+    def remember(self, isbn: int, book_dict: dict):
+        """Stores the scraped data of a book for reuse by later duplicates, if
+        self.keep_records, and ends its claim.
+        """
+        with self._lock:
+            if self.keep_records:
+                self.records[isbn] = BookRecord.from_dict(book_dict)
+            self._finish(isbn)
+
+    def lookup(self, isbn: int, timeout=None):
+        """Gets the data of a book scraped earlier in this run, first waiting
+        for any other thread which has claimed the ISBN to finish scraping it.
+
+        Parameters
+        ----------
+        isbn : int
+            ISBN of the book.
+        timeout : float
+            Maximum seconds to wait for a claim in flight. None waits until done.
+
+        Returns
+        -------
+        dict or None
+            Copy of the book's data, or None if it was seen in a previous run,
+            or its claim was released after its page failed.
+        """
+        with self._lock:
+            event = self._in_flight.get(isbn)
+        if event is not None:
+            event.wait(timeout)
+        with self._lock:
+            record = self.records.get(isbn)
+
+        return None if record is None else record.to_dict()
+
+    def claim_image(self, isbn: int, file_path: str):
+        """Marks a cover image as saved to file_path unless it has already
+        been saved in this run.
+
+        Parameters
+        ----------
+        isbn : int or str
+            ISBN of the book.
+        file_path : str
+            Path the image is about to be saved to.
+
+        Returns
+        -------
+        str or None
+            Path the image was already saved to, or None if it should be
+            downloaded.
+        """
+        with self._lock:
+            if isbn in self.image_paths:
+                return self.image_paths[isbn]
+            self.image_paths[isbn] = file_path
+
+            return None
+
+    def save(self):
+        """Writes the seen ISBNs to self.path.
+        """
+        with self._lock:
+            if self.use_bloom_filter:
+                self.seen.save(self.path)
+            else:
+                with open(self.path, "w", encoding="utf-8") as handler:
+                    handler.writelines(f"{isbn}\n" for isbn in sorted(self.seen))
+#%%
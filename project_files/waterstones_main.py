@@ -0,0 +1,139 @@
+#%%
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+#%%
+# close to the start of the process when run as a script, as only the
+# standard library is imported before it
+STARTED_AT = time.perf_counter()
+# heavy dependencies, imported when first needed rather than with this module
+HEAVY_MODULES = ["requests", "selenium.webdriver", "pandas", "waterstones_query"]
+BACKENDS = ["headless", "lean", "chrome", "edge", "http"]
+#%%
+def timed_imports(modules=HEAVY_MODULES) -> dict:
+    """Imports modules one after another, timing each. A module already
+    imported, directly or by an earlier one, takes almost no time.
+
+    Parameters
+    ----------
+    modules : list
+        Names of the modules to import.
+
+    Returns
+    -------
+    dict
+        Seconds taken to import each module, by name.
+    """
+    import_seconds = {}
+    for module in modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        import_seconds[module] = time.perf_counter() - start
+
+    return import_seconds
+
+def profile_startup(backend="headless", url=None) -> dict:
+    """Measures the startup of a run without scraping anything: importing
+    the heavy modules, starting the driver, and optionally loading a first page.
+
+    Parameters
+    ----------
+    backend : str
+        Driver backend to start.
+    url : str
+        Optional page loaded once the driver has started.
+
+    Returns
+    -------
+    dict
+        Seconds spent importing each module and in total, launching the
+        driver, and loading the first page, the profile template used, and
+        the seconds since this module was imported.
+    """
+    import_seconds = timed_imports()
+    from waterstones_drivers import PROFILE_TEMPLATE_ENV
+    from waterstones_query import QueryWaterstones
+
+    scraper = QueryWaterstones(backend=backend)
+    first_page_seconds = None
+    try:
+        scraper.start_driver()
+        if url is not None:
+            start = time.perf_counter()
+            scraper.get_page(url, "load_page")
+            first_page_seconds = time.perf_counter() - start
+    finally:
+        scraper.quit_browser()
+
+    return {
+        "backend" : backend,
+        "import_seconds" : import_seconds,
+        "total_import_seconds" : sum(import_seconds.values()),
+        "launch_seconds" : scraper.launch_seconds,
+        "first_page_seconds" : first_page_seconds,
+        "profile_template" : os.environ.get(PROFILE_TEMPLATE_ENV),
+        "seconds_since_start" : time.perf_counter() - STARTED_AT,
+    }
+#%%
+def main(argv=None) -> int:
+    """Startup-optimised entry point of the scraper. Arguments are parsed
+    before any heavy module is imported, and the browser is only launched
+    on the first page load of the first query.
+    """
+    parser = argparse.ArgumentParser(description="Scrape Waterstones search results by author.")
+    parser.add_argument("authors", nargs="*",
+        help="authors to search for (default: ask for them one at a time)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+        help="driver backend (default: WATERSTONES_BACKEND, or headless)")
+    parser.add_argument("--startup-profile", action="store_true",
+        help="report the import and browser launch times as JSON, without scraping")
+    parser.add_argument("--startup-url", default=None,
+        help="page loaded once the browser has started, with --startup-profile")
+    parser.add_argument("--warm-profile", default=None, metavar="PATH",
+        help="create a warm browser profile at PATH to use as WATERSTONES_PROFILE_TEMPLATE")
+    parser.add_argument("--http-cache", default=None, metavar="DIR",
+        help="folder of an on-disk cache of the pages and images fetched over HTTP")
+    parser.add_argument("--results-cache", default=os.path.join("raw_data", "query_results.sqlite3"),
+        metavar="PATH", help="SQLite file caching the links of each query "
+        "(default: raw_data/query_results.sqlite3)")
+    parser.add_argument("--process-images", default=None, metavar="DIR",
+        help="verify, deduplicate, and thumbnail the saved covers into an archive in DIR "
+        "(needs Pillow)")
+    args = parser.parse_args(argv)
+    backend = args.backend or os.environ.get("WATERSTONES_BACKEND", "headless")
+
+    if args.warm_profile is not None:
+        from waterstones_drivers import warm_profile
+
+        warm_profile(args.warm_profile, backend)
+        print(f"Browser profile saved to {args.warm_profile}.")
+        return 0
+    if args.startup_profile:
+        print(json.dumps(profile_startup(backend, args.startup_url), indent=2))
+        return 0
+    from waterstones_query import run_the_scraper
+
+    http_cache = None
+    if args.http_cache is not None:
+        from waterstones_http_cache import HTTPResponseCache
+
+        http_cache = HTTPResponseCache(args.http_cache)
+    image_processor = None
+    if args.process_images is not None:
+        from waterstones_image_processing import CoverImageProcessor
+
+        image_processor = CoverImageProcessor(args.process_images)
+    try:
+        run_the_scraper(args.authors or None, backend=backend, http_cache=http_cache,
+            results_cache_path=args.results_cache, image_processor=image_processor)
+    finally:
+        if http_cache is not None:
+            http_cache.close()
+
+    return 0
+#%%
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#%%
+from contextlib import contextmanager
+import functools
+import json
+import math
+import threading
+import time
+#%%
+class StageSample:
+    """Mutable handle for one timed call, through which the call can report
+    the number of bytes it transferred.
+    """
+    __slots__ = ("bytes",)
+
+    def __init__(self) -> None:
+        self.bytes = 0
+#%%
+class StageMetrics:
+    """Records the count, latency, and bytes transferred of each pipeline stage,
+    and reports them as structured JSON or as a Prometheus text file. Safe to
+    share between threads.
+
+    Attributes
+    ----------
+    self.latencies : dict
+                Latency in seconds of every call, by stage name.
+    self.bytes : dict
+                Total bytes transferred, by stage name.
+    self.errors : dict
+                Number of calls which raised, by stage name.
+    """
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self) -> None:
+        self.latencies = {}
+        self.bytes = {}
+        self.errors = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, n_bytes=0, error=False):
+        """Records one call of a stage.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        seconds : float
+            Latency of the call.
+        n_bytes : int
+            Bytes transferred by the call.
+        error : bool
+            Whether the call raised.
+        """
+        with self._lock:
+            self.latencies.setdefault(stage, []).append(seconds)
+            self.bytes[stage] = self.bytes.get(stage, 0) + n_bytes
+            if error:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def add_bytes(self, stage: str, n_bytes: int):
+        """Adds bytes transferred to a stage without recording a call, for use
+        inside methods timed with timed_stage.
+        """
+        with self._lock:
+            self.bytes[stage] = self.bytes.get(stage, 0) + n_bytes
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Times the body of a with block as one call of a stage.
+
+        Yields
+        ------
+        StageSample
+            Handle whose bytes attribute may be set to the bytes transferred.
+        """
+        sample = StageSample()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield sample
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, sample.bytes, error)
+
+    @staticmethod
+    def _quantile(sorted_values: list, quantile: float) -> float:
+        index = max(0, math.ceil(quantile * len(sorted_values)) - 1)
+
+        return sorted_values[index]
+
+    def summary(self) -> dict:
+        """Summarises every stage.
+
+        Returns
+        -------
+        dict
+            For each stage: count, errors, total, mean, p50, p95, p99 and max
+            latency in seconds, and bytes transferred.
+        """
+        with self._lock:
+            latencies = {stage : sorted(values) for stage, values in self.latencies.items()}
+            n_bytes = dict(self.bytes)
+            errors = dict(self.errors)
+        summary = {}
+        for stage, values in sorted(latencies.items()):
+            total = sum(values)
+            summary[stage] = {
+                "count" : len(values),
+                "errors" : errors.get(stage, 0),
+                "total_seconds" : total,
+                "mean_seconds" : total / len(values),
+                "p50_seconds" : self._quantile(values, 0.5),
+                "p95_seconds" : self._quantile(values, 0.95),
+                "p99_seconds" : self._quantile(values, 0.99),
+                "max_seconds" : values[-1],
+                "bytes" : n_bytes.get(stage, 0),
+            }
+
+        return summary
+
+    def write_json(self, path: str) -> dict:
+        """Writes the summary of every stage to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the JSON file.
+
+        Returns
+        -------
+        dict
+            The report written.
+        """
+        report = {
+            "started_at" : self.started_at,
+            "wall_seconds" : time.time() - self.started_at,
+            "stages" : self.summary(),
+        }
+        with open(path, "w", encoding="utf-8") as handler:
+            json.dump(report, handler, indent=2)
+
+        return report
+
+    def write_prometheus(self, path: str, prefix="waterstones_scraper"):
+        """Writes every stage in the Prometheus text exposition format, as a
+        summary of latencies with p50/p95/p99 quantiles, plus bytes and error
+        counters.
+
+        Parameters
+        ----------
+        path : str
+            Path of the text file, e.g. for the node exporter textfile collector.
+        prefix : str
+            Prefix of every metric name.
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, stats in summary.items():
+            for quantile in self.QUANTILES:
+                value = stats[f"p{round(quantile * 100)}_seconds"]
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_seconds"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for name, key, help_text in (("stage_bytes_total", "bytes", "Bytes transferred by each stage."),
+                ("stage_errors_total", "errors", "Calls of each stage which raised.")):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for stage, stats in summary.items():
+                lines.append(f'{prefix}_{name}{{stage="{stage}"}} {stats[key]}')
+        with open(path, "w", encoding="utf-8") as handler:
+            handler.write("\n".join(lines) + "\n")
+#%%
+def timed_stage(stage: str):
+    """Decorator which times a scraper method as a pipeline stage, using the
+    StageMetrics object in the scraper's metrics attribute if it has one.
+
+    Parameters
+    ----------
+    stage : str
+        Name under which calls are recorded.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = getattr(self, "metrics", None)
+            if metrics is None:
+                return method(self, *args, **kwargs)
+            with metrics.timed(stage):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+#%%
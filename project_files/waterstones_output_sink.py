@@ -0,0 +1,187 @@
+#%%
+from waterstones_records import COLUMNS, import_pyarrow
+import csv
+import glob
+import json
+import os
+#%%
+class StreamingBookSink:
+    """Appends each scraped book to the output files as soon as it is parsed,
+    so finished work is on disk even if the run is interrupted. Always writes
+    CSV, and optionally JSON Lines and Parquet. A new run replaces the output
+    of earlier runs, while a resumed run adds to it.
+
+    Parameters
+    ----------
+    directory : str
+        Folder in which output files are written.
+    query : str
+        Normalised search query, used as the output file name.
+    formats : tuple
+        Any of "csv", "jsonl", and "parquet". CSV is always written.
+    parquet_batch_size : int
+        Number of books buffered per Parquet row group. Parquet files cannot be
+        appended to, so each resumed run writes its own part file.
+    resume : bool
+        True to add to the output of an interrupted run, False (default) to
+        replace any earlier output.
+
+    Attributes
+    ----------
+    self.csv_path : str
+                Path of the CSV file, which accumulates rows across the runs
+                resuming the same interrupted run.
+    self.rows_written : int
+                Number of books written by this sink.
+    """
+    def __init__(self, directory: str, query: str, formats=("csv",),
+            parquet_batch_size=500, resume=False) -> None:
+        self.formats = set(formats) | {"csv"}
+        if "parquet" in self.formats:
+            import_pyarrow("Parquet output") # before any earlier output is replaced
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.query = query
+        self.rows_written = 0
+        self.csv_path = os.path.join(directory, f"{query}.csv")
+        mode = "a" if resume else "w"
+        write_header = not resume or not os.path.exists(self.csv_path) \
+            or os.path.getsize(self.csv_path) == 0
+        self._csv_file = open(self.csv_path, mode, newline="", encoding="utf-8")
+        self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=COLUMNS)
+        if write_header:
+            self._csv_writer.writeheader()
+            self._csv_file.flush()
+        self._jsonl_file = None
+        if "jsonl" in self.formats:
+            self._jsonl_file = open(os.path.join(directory, f"{query}.jsonl"), mode,
+                encoding="utf-8")
+        self._parquet_writer = None
+        self._parquet_rows = []
+        self.parquet_batch_size = parquet_batch_size
+        if "parquet" in self.formats:
+            parts = glob.glob(os.path.join(directory, f"{query}.part*.parquet"))
+            if not resume:
+                for part_path in parts:
+                    os.remove(part_path)
+                parts = []
+            part = len(parts)
+            self.parquet_path = os.path.join(directory, f"{query}.part{part:04d}.parquet")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, book_dict: dict):
+        """Appends one book to every output file and flushes it to disk.
+
+        Parameters
+        ----------
+        book_dict : dict
+            Scraped data of the book, keyed by column name.
+        """
+        row = {column : book_dict.get(column) for column in COLUMNS}
+        self._csv_writer.writerow(row)
+        self._csv_file.flush()
+        if self._jsonl_file is not None:
+            self._jsonl_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._jsonl_file.flush()
+        if "parquet" in self.formats:
+            self._parquet_rows.append(row)
+            if len(self._parquet_rows) >= self.parquet_batch_size:
+                self._flush_parquet()
+        self.rows_written += 1
+
+    def _flush_parquet(self):
+        if not self._parquet_rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(self._parquet_rows, schema=pa.schema([
+            ("ID", pa.int64()), ("Timestamp", pa.string()), ("Author", pa.string()),
+            ("Title", pa.string()), ("Language", pa.string()),
+            ("Price (£)", pa.float64()), ("Image_link", pa.string())]))
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.parquet_path, table.schema)
+        self._parquet_writer.write_table(table)
+        self._parquet_rows = []
+
+    def close(self):
+        """Flushes any buffered Parquet rows and closes every output file.
+        """
+        if "parquet" in self.formats:
+            self._flush_parquet()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
+        if self._jsonl_file is not None:
+            self._jsonl_file.close()
+            self._jsonl_file = None
+        if not self._csv_file.closed:
+            self._csv_file.close()
+#%%
+class RunCheckpoint:
+    """Append-only record of which language-filter pages and book links of a
+    query have been completely scraped, so an interrupted run can skip them
+    when restarted. Each completed link is one line of a text file, so marking
+    work as done costs one small write however large the run.
+
+    Parameters
+    ----------
+    path : str
+        Path of the checkpoint file. Existing entries are loaded.
+
+    Attributes
+    ----------
+    self.language_links_done : set
+                Language-filter page links whose books have all been scraped.
+    self.book_links_done : set
+                Book links which have been scraped and written out.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.language_links_done = set()
+        self.book_links_done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handler:
+                for line in handler:
+                    kind, _, link = line.rstrip("\n").partition("\t")
+                    if kind == "language":
+                        self.language_links_done.add(link)
+                    elif kind == "book":
+                        self.book_links_done.add(link)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _mark(self, kind: str, link: str):
+        self._file.write(f"{kind}\t{link}\n")
+        self._file.flush()
+
+    def mark_language_done(self, language_link: str):
+        """Records that every book of a language-filter page has been scraped.
+        """
+        if language_link not in self.language_links_done:
+            self.language_links_done.add(language_link)
+            self._mark("language", language_link)
+
+    def mark_book_done(self, book_link: str):
+        """Records that a book has been scraped and written out.
+        """
+        if book_link not in self.book_links_done:
+            self.book_links_done.add(book_link)
+            self._mark("book", book_link)
+
+    def close(self):
+        """Closes the checkpoint file.
+        """
+        self._file.close()
+
+    def remove(self):
+        """Closes and deletes the checkpoint file once its run has finished,
+        so the next run of the query starts afresh instead of resuming.
+        """
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+#%%
@@ -0,0 +1,417 @@
+#%%
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+#%%
+class BookPageParser(HTMLParser):
+    """Single-pass HTML parser which pulls the book fields out of a Waterstones
+    product page without a browser. Matches the same elements as the Selenium
+    getters of the WaterstonesScraper class.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the page being parsed, used to resolve relative image links.
+
+    Attributes
+    ----------
+    self.fields : dict
+                Dictionary of scraped fields ("author", "title", "price", "image")
+                populated as the page is fed to the parser.
+    """
+    # field name -> (tag, attribute, attribute value)
+    TEXT_FIELDS = {
+        "author" : ("span", "itemprop", "author"),
+        "title" : ("span", "class", "book-title"),
+        "price" : ("b", "itemprop", "price"),
+    }
+
+    def __init__(self, base_url: str = "") -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.fields = {}
+        self._captures = [] # [field, tag, depth, list_of_text_chunks]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] += 1
+        for field, (field_tag, attr, value) in self.TEXT_FIELDS.items():
+            if field in self.fields or tag != field_tag or attrs.get(attr) != value:
+                continue
+            if any(capture[0] == field for capture in self._captures):
+                continue
+            self._captures.append([field, tag, 1, []])
+        if tag == "img" and attrs.get("itemprop") == "image" and "image" not in self.fields:
+            src = attrs.get("src")
+            if src is not None:
+                self.fields["image"] = urljoin(self.base_url, src)
+
+    def handle_endtag(self, tag):
+        for capture in list(self._captures):
+            if capture[1] != tag:
+                continue
+            capture[2] -= 1
+            if capture[2] == 0:
+                field, _, _, chunks = capture
+                self.fields[field] = " ".join("".join(chunks).split())
+                self._captures.remove(capture)
+
+    def handle_data(self, data):
+        for capture in self._captures:
+            capture[3].append(data)
+
+def parse_book_page(html: str, base_url: str = "") -> dict:
+    """Parses a product page in one pass.
+
+    Parameters
+    ----------
+    html : str
+        HTML source of a Waterstones product page.
+    base_url : str
+        URL of the page, used to resolve relative image links.
+
+    Returns
+    -------
+    dict
+        Dictionary of the fields found on the page. Missing fields are absent.
+    """
+    parser = BookPageParser(base_url)
+    parser.feed(html)
+    parser.close()
+
+    return parser.fields
+#%%
+class SearchResultsParser(HTMLParser):
+    """Single-pass HTML parser which collects the link of every result card in
+    the search-results-list of a Waterstones results page, as
+    get_all_book_links_from_page does with one WebDriver call per card.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the page being parsed, used to resolve relative links.
+
+    Attributes
+    ----------
+    self.links : list
+                URL of the first link in each result card, in page order.
+    """
+    def __init__(self, base_url: str = "") -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.links = []
+        self._depth = None # depth of nested divs inside the results list
+        self._card_linked = False
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        attrs = dict(attrs)
+        if self._depth is None:
+            if tag == "div" and attrs.get("class") == "search-results-list":
+                self._depth = 0
+            return
+        if tag == "div":
+            self._depth += 1
+            if self._depth == 1:
+                self._card_linked = False
+        elif tag == "a" and self._depth >= 1 and not self._card_linked and attrs.get("href"):
+            self.links.append(urljoin(self.base_url, attrs["href"]))
+            self._card_linked = True
+
+    def handle_endtag(self, tag):
+        if self._done or self._depth is None or tag != "div":
+            return
+        if self._depth == 0:
+            self._done = True # only the first results list is read, as with find_element
+        else:
+            self._depth -= 1
+
+def parse_book_links(html: str, base_url: str = "") -> list:
+    """Parses the book links of a search results page in one pass.
+
+    Parameters
+    ----------
+    html : str
+        HTML source of a results page, or of its search-results-list element.
+    base_url : str
+        URL of the page, used to resolve relative links.
+
+    Returns
+    -------
+    list
+        Link of each result card, in page order.
+    """
+    parser = SearchResultsParser(base_url)
+    parser.feed(html)
+    parser.close()
+
+    return parser.links
+#%%
+class ElementPathParser(HTMLParser):
+    """Single-pass HTML parser which collects the text of the elements at
+    absolute XPaths of the form /html/body/div[1]/span[2], as find_element
+    does with such an XPath, so pages fetched without a browser can be read
+    with the same paths.
+
+    Parameters
+    ----------
+    paths : list
+        Absolute XPaths made of tag names with optional 1-based indexes.
+
+    Attributes
+    ----------
+    self.texts : dict
+                Whitespace-normalised text of the first element found at each
+                path, by path.
+    """
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+        "meta", "param", "source", "track", "wbr"}
+
+    def __init__(self, paths: list) -> None:
+        super().__init__(convert_charrefs=True)
+        self.paths = {path : self.split_path(path) for path in paths}
+        self.texts = {}
+        self._stack = [] # [tag, index among siblings of the same tag, counts of child tags]
+        self._root_counts = {}
+        self._captures = {} # path -> [depth, list_of_text_chunks]
+
+    @staticmethod
+    def split_path(path: str) -> tuple:
+        steps = []
+        for step in path.strip("/").split("/"):
+            tag, _, index = step.partition("[")
+            steps.append((tag, int(index.rstrip("]")) if index else 1))
+
+        return tuple(steps)
+
+    def handle_starttag(self, tag, attrs):
+        counts = self._stack[-1][2] if self._stack else self._root_counts
+        counts[tag] = counts.get(tag, 0) + 1
+        if tag in self.VOID_TAGS:
+            return
+        self._stack.append([tag, counts[tag], {}])
+        current = tuple((step[0], step[1]) for step in self._stack)
+        for path, steps in self.paths.items():
+            if steps == current and path not in self.texts and path not in self._captures:
+                self._captures[path] = [len(self._stack), []]
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID_TAGS or not any(step[0] == tag for step in self._stack):
+            return
+        while self._stack:
+            depth = len(self._stack)
+            for path, (capture_depth, chunks) in list(self._captures.items()):
+                if capture_depth == depth:
+                    self.texts[path] = " ".join("".join(chunks).split())
+                    del self._captures[path]
+            if self._stack.pop()[0] == tag:
+                break
+
+    def handle_data(self, data):
+        for capture in self._captures.values():
+            capture[1].append(data)
+
+def find_text_by_path(html: str, path: str):
+    """Gets the text of the element at an absolute XPath in one pass.
+
+    Parameters
+    ----------
+    html : str
+        HTML source of a page.
+    path : str
+        Absolute XPath such as /html/body/div[1]/span[2].
+
+    Returns
+    -------
+    str or None
+        Text of the element, or None if there is no element at path.
+    """
+    parser = ElementPathParser([path])
+    parser.feed(html)
+    parser.close()
+
+    return parser.texts.get(path)
+#%%
+class LanguageFilterParser(HTMLParser):
+    """Single-pass HTML parser which collects the links of the LANGUAGE section
+    of the filter bar of a results page, as get_language_filter_page_links
+    does in the browser.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the page being parsed, used to resolve relative links.
+
+    Attributes
+    ----------
+    self.links : list
+                URL of every link in the element after the LANGUAGE header.
+    """
+    HEADER_CLASS = "filter-header slide-trigger js-filter-trigger"
+
+    def __init__(self, base_url: str = "") -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.links = []
+        self._header_depth = None # depth of nested divs inside a filter header
+        self._header_text = []
+        self._after_language_header = False
+        self._body_tag = None
+        self._body_depth = 0
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        attrs = dict(attrs)
+        if self._body_tag is not None:
+            if tag == self._body_tag:
+                self._body_depth += 1
+            if tag == "a" and attrs.get("href"):
+                self.links.append(urljoin(self.base_url, attrs["href"]))
+        elif self._after_language_header:
+            # the next sibling of the header holds the language links
+            self._body_tag = tag
+            self._body_depth = 1
+        elif self._header_depth is not None:
+            if tag == "div":
+                self._header_depth += 1
+        elif tag == "div" and attrs.get("class") == self.HEADER_CLASS:
+            self._header_depth = 1
+            self._header_text = []
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if self._body_tag is not None:
+            if tag == self._body_tag:
+                self._body_depth -= 1
+                if self._body_depth == 0:
+                    self._done = True
+        elif self._header_depth is not None and tag == "div":
+            self._header_depth -= 1
+            if self._header_depth == 0:
+                self._header_depth = None
+                self._after_language_header = "".join(self._header_text).strip() == "LANGUAGE"
+
+    def handle_data(self, data):
+        if self._header_depth is not None:
+            self._header_text.append(data)
+
+def parse_language_links(html: str, base_url: str = "") -> list:
+    """Parses the language filter links of a results page in one pass.
+
+    Parameters
+    ----------
+    html : str
+        HTML source of a results page.
+    base_url : str
+        URL of the page, used to resolve relative links.
+
+    Returns
+    -------
+    list
+        Links of the LANGUAGE filter section, in page order, or an empty list
+        if the page has no such section.
+    """
+    parser = LanguageFilterParser(base_url)
+    parser.feed(html)
+    parser.close()
+
+    return parser.links
+#%%
+class SearchFormParser(HTMLParser):
+    """Single-pass HTML parser which finds the form holding the search bar, so
+    a search can be submitted without a browser as pressing return in it would.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the page being parsed, used to resolve the form action.
+
+    Attributes
+    ----------
+    self.action : str or None
+                URL the search form submits to.
+    self.field_name : str or None
+                Name of the search bar's input.
+    """
+    INPUT_CLASS = "input input-search"
+
+    def __init__(self, base_url: str = "") -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.action = None
+        self.field_name = None
+        self._form_action = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._form_action = attrs.get("action") or ""
+        elif tag == "input" and attrs.get("class") == self.INPUT_CLASS and self.field_name is None:
+            self.field_name = attrs.get("name")
+            if self._form_action is not None:
+                self.action = urljoin(self.base_url, self._form_action)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form_action = None
+
+def parse_search_form(html: str, base_url: str = "") -> tuple:
+    """Parses the search form of a page in one pass.
+
+    Parameters
+    ----------
+    html : str
+        HTML source of a page with the search bar.
+    base_url : str
+        URL of the page, used to resolve the form action.
+
+    Returns
+    -------
+    tuple
+        URL the search form submits to and the name of its search input,
+        either of which is None if not found.
+    """
+    parser = SearchFormParser(base_url)
+    parser.feed(html)
+    parser.close()
+
+    return parser.action, parser.field_name
+
+def search_form_url(action: str, field_name: str, query: str) -> str:
+    """Builds the URL a GET search form submits to, keeping any query string
+    already in its action.
+
+    Parameters
+    ----------
+    action : str
+        Absolute URL the search form submits to.
+    field_name : str
+        Name of the search input.
+    query : str
+        Search terms typed into the search input.
+
+    Returns
+    -------
+    str
+        URL of the search results.
+
+    Raises
+    ------
+    ValueError
+        If the search input has no name, so a browser would not submit it.
+    """
+    if not field_name:
+        raise ValueError(f"The search input of the form at {action} has no name.")
+    scheme, netloc, path, action_query, _ = urlsplit(action)
+    params = [(name, value) for name, value in parse_qsl(action_query, keep_blank_values=True)
+        if name != field_name]
+    params.append((field_name, query))
+
+    return urlunsplit((scheme, netloc, path, urlencode(params), ""))
+#%%
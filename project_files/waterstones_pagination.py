@@ -0,0 +1,178 @@
+#%%
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urlunsplit
+from waterstones_fetch_policy import FetchPolicy
+from waterstones_http_scraper import USER_AGENT
+from waterstones_page_parser import parse_book_links
+import re
+import requests
+#%%
+class PaginationError(Exception):
+    """Raised when a results page fetched by URL has no results, so the page
+    URLs cannot be trusted and the show more button should be used instead.
+    """
+#%%
+def page_url(results_url: str, page_number: int) -> str:
+    """Builds the URL of one page of a search or language-filtered results
+    list, in the /page/<number> form used by waterstones.com.
+
+    Parameters
+    ----------
+    results_url : str
+        URL of any page of the results.
+    page_number : int
+        Number of the page, starting at 1.
+
+    Returns
+    -------
+    str
+        URL of the page.
+    """
+    scheme, netloc, path, query, fragment = urlsplit(results_url)
+    path = re.sub(r"/page/\d+$", "", path.rstrip("/"))
+
+    return urlunsplit((scheme, netloc, f"{path}/page/{page_number}", query, fragment))
+#%%
+class PaginatedResultsFetcher:
+    """Collects the book links of every page of a results list by requesting
+    each page directly by its page-number URL, concurrently over a pooled
+    requests.Session, instead of clicking the show more button in the browser
+    and re-rendering the growing list after every page.
+
+    Parameters
+    ----------
+    n_workers : int
+        Maximum number of results pages fetched at once.
+    timeout : float
+        Timeout in seconds applied to every request.
+    cache : HTTPResponseCache
+        Optional on-disk cache through which pages are fetched.
+    metrics : StageMetrics
+        Optional recorder of the latency and bytes of each page fetched.
+    fetch_policy : FetchPolicy
+        Retries, circuit breaker, and adaptive concurrency applied to every
+        request. Defaults to a new FetchPolicy with the given timeout.
+
+    Attributes
+    ----------
+    self.session : requests.Session
+                Session with a pooled HTTP adapter mounted for http and https.
+    self.rate_limiter : HostRateLimiter or GlobalRateLimiter
+                Optional limiter whose wait method is called before each page
+                request. None by default.
+    """
+    def __init__(self, n_workers=8, timeout=10, cache=None, metrics=None,
+            fetch_policy=None) -> None:
+        self.n_workers = n_workers
+        self.timeout = timeout
+        self.fetch_policy = FetchPolicy(timeout=timeout) if fetch_policy is None else fetch_policy
+        self.fetch_policy.fit_concurrency(n_workers)
+        self.cache = cache
+        self.metrics = metrics
+        self.rate_limiter = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=n_workers, pool_maxsize=n_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent" : USER_AGENT})
+        self._executor = ThreadPoolExecutor(max_workers=n_workers,
+            thread_name_prefix="results-page")
+
+    def copy_cookies(self, driver):
+        """Copies the cookies of a webdriver into the session, so pages are
+        requested with the same consent and session state as the browser.
+
+        Parameters
+        ----------
+        driver : webdriver.Chrome
+            Webdriver whose cookies are copied.
+        """
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie["name"], cookie["value"],
+                domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    def _get(self, url: str):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+        if self.cache is not None:
+            return self.fetch_policy.call("fetch_results_page", url, self.cache.get,
+                self.session, url, timeout=self.timeout)
+
+        return self.fetch_policy.call("fetch_results_page", url, self.session.get, url,
+            timeout=self.timeout)
+
+    def fetch_page_links(self, url: str) -> list:
+        """Fetches one results page and parses its book links.
+
+        Parameters
+        ----------
+        url : str
+            URL of the results page.
+
+        Returns
+        -------
+        list
+            Link of each result card on the page.
+
+        Raises
+        ------
+        PaginationError
+            If the page has no results.
+        """
+        if self.metrics is None:
+            response = self._get(url)
+        else:
+            with self.metrics.timed("fetch_results_page") as sample:
+                response = self._get(url)
+                sample.bytes = len(response.content)
+        response.raise_for_status()
+        links = parse_book_links(response.text, response.url)
+        if not links:
+            raise PaginationError(f"No results on {url}.")
+
+        return links
+
+    def fetch_links(self, results_url: str, number_of_pages: int, first_page_links=None) -> list:
+        """Fetches every page of a results list concurrently and merges their
+        book links in page order, without duplicates.
+
+        Parameters
+        ----------
+        results_url : str
+            URL of any page of the results.
+        number_of_pages : int
+            Number of pages of results.
+        first_page_links : list
+            Links already read from page 1, which is then not fetched again.
+
+        Returns
+        -------
+        list
+            Link of every book in the results.
+
+        Raises
+        ------
+        PaginationError
+            If a page has no results.
+        requests.RequestException
+            If a page cannot be fetched.
+        """
+        first_page = 1 if first_page_links is None else 2
+        urls = [page_url(results_url, page_number)
+            for page_number in range(first_page, number_of_pages + 1)]
+        pages = [] if first_page_links is None else [first_page_links]
+        pages += self._executor.map(self.fetch_page_links, urls)
+        links = {}
+        for page_links in pages:
+            for link in page_links:
+                links.setdefault(link, None)
+
+        return list(links)
+
+    def close(self):
+        """Stops the fetching threads and closes the HTTP session.
+        """
+        self._executor.shutdown(wait=True)
+        self.session.close()
+#%%
@@ -1,12 +1,33 @@
 #%%
+from __future__ import annotations
 from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from waterstones_delta import IncrementalScrape, isbn_from_link
+from waterstones_drivers import get_driver_factory
+from waterstones_fetch_policy import FETCH_ERRORS
+from waterstones_http_scraper import WaterstonesHTTPScraper
+from waterstones_image_downloader import AsyncImageDownloader
+from waterstones_isbn_index import SeenISBNIndex
+from waterstones_metrics import StageMetrics, timed_stage
+from waterstones_output_sink import RunCheckpoint, StreamingBookSink
+from waterstones_page_parser import (find_text_by_path, parse_book_links,
+    parse_language_links, parse_search_form, search_form_url)
+from waterstones_pagination import PaginatedResultsFetcher, PaginationError
+from waterstones_records import BookRecordAccumulator
+from waterstones_results_cache import QueryResultsCache, normalize_query
 from waterstones_scraper_class import WaterstonesScraper
+from waterstones_session_manager import DriverSessionPool
+from waterstones_worker_pool import BookPageWorkerPool, StreamClosed
+import itertools
 import os
-import pandas as pd
+import requests
+import shutil
 import time
 #%%
+LANGUAGE_NAME_XPATH = "/html/body/div[1]/div[3]/div[3]/div[1]/div[1]/div/span"
+#%%
 class QueryWaterstones(WaterstonesScraper):
     """This class inherits from the WaterstonesScraper class, and includes methods relevant
     to specific search queries. All relevant data about books appearing in the search result
@@ -17,6 +38,64 @@ class QueryWaterstones(WaterstonesScraper):
     ----------
     WaterstonesScraper : class
         Parent class containing methods not specific to a particular search query.
+    backend : str or driver factory
+        Driver backend of the query and its workers: "edge" (default, a headed
+        Microsoft Edge browser), "headless", "lean", "chrome", or "http", or a
+        driver factory. See waterstones_drivers. Can be chosen at runtime, for
+        example from the WATERSTONES_BACKEND environment variable read by
+        run_the_scraper.
+    detail_backend : str
+        Backend used to scrape individual book pages. "selenium" (default) uses the
+        query's driver, "http" fetches and parses product pages with a
+        WaterstonesHTTPScraper whatever the driver backend.
+    n_workers : int
+        Number of workers scraping book pages concurrently. With n_workers=1
+        (default) book pages are scraped one after another by self.detail_scraper.
+    n_language_workers : int
+        Number of language-filter pages scraped concurrently, each by a worker
+        with its own driver and, if n_workers > 1, its own book page workers.
+        With n_language_workers=1 (default) languages are scraped one after
+        another by this query's driver.
+    max_per_host : int
+        Maximum number of book page requests in flight to the same host when
+        n_workers > 1. None (default) allows one per worker.
+    requests_per_second : float
+        Maximum rate of book page requests per host when n_workers > 1. None
+        (default) disables rate limiting.
+    max_image_downloads : int
+        Maximum number of cover images downloaded at once by save_imgs_as_jpg.
+    http_cache : HTTPResponseCache
+        Optional on-disk cache in front of product pages fetched by the "http"
+        detail backend, of results pages fetched by their URLs, of every page
+        loaded by the "http" backend, and of cover image downloads.
+    isbn_index : SeenISBNIndex
+        Optional index of ISBNs already scraped, shared between queries so each
+        product page and cover image is fetched once per run.
+    metrics : StageMetrics
+        Optional recorder of the count, latency, and bytes of each pipeline
+        stage, shared with the detail scrapers.
+    max_books_per_language : int
+        Optional cap on the number of books scraped from each language filter.
+        None (default) scrapes every result.
+    max_seconds_per_language : float
+        Optional cap on the time spent scraping the books of each language
+        filter. No new book is started once it has passed.
+    image_processor : CoverImageProcessor
+        Optional post-processing stage which verifies, deduplicates, and
+        thumbnails the covers saved by save_imgs_as_jpg.
+    pagination : str
+        How results pages after the first are collected. "url" (default)
+        requests every page by its page-number URL concurrently, falling back
+        to "show_more", which clicks the show more button in the browser.
+        Without a browser only "url" is available.
+    fetch_policy : FetchPolicy
+        Timeouts, retries with backoff, per-host circuit breaker, and adaptive
+        concurrency shared by every page load and image download of the query,
+        including those of the workers. Defaults to a new FetchPolicy.
+    results_cache : QueryResultsCache
+        Optional index of the language-filter and book links of recent queries.
+        A query found in it skips the search, the language filters, and the
+        results pages, and goes straight to the book pages.
     
     Attributes
     ----------
@@ -31,44 +110,287 @@ class QueryWaterstones(WaterstonesScraper):
     self.language_filtered_DataFrame : pd.DataFrame
                 DataFrame where all relevant data about each book in a search query 
                 will be stored. 
+    self.records : BookRecordAccumulator
+                Typed columns of every book scraped for the search query, from
+                which self.language_filtered_DataFrame is built.
+    self.output_sink : StreamingBookSink
+                Sink to which each book is written as soon as it is scraped, once
+                open_output_sink has been called.
+    self.checkpoint : RunCheckpoint
+                Record of completed language-filter pages and book links, used to
+                skip finished work when a run is restarted.
+    self.page_completed : bool
+                True if every pending book of the last results page was scraped,
+                rather than cut off by the per-language limits.
+    self.run_completed : bool
+                True once every language of the query has been fully scraped, so the
+                checkpoint is deleted by close_output_sink rather than kept for
+                a restarted run.
+    self.homepage_pending : bool
+                True after reset_query_state until the homepage is loaded, which
+                search does itself on a cache miss.
+    self.delta : IncrementalScrape
+                Delta mode state, once enable_delta_mode has been called.
+    self.detail_scraper : QueryWaterstones or WaterstonesHTTPScraper
+                Object whose getter methods scrape individual book pages.
+    self.worker_pool : BookPageWorkerPool
+                Pool of workers scraping book pages, created on first use when
+                n_workers > 1.
+    self.language_pool : BookPageWorkerPool
+                Pool of workers scraping language-filter pages, each owning a
+                QueryWaterstones, created on first use when n_language_workers > 1.
+    self.paginator : PaginatedResultsFetcher
+                Fetcher of results pages by URL, created on first use.
+    self.cached_results : dict or None
+                Results of the current query found in self.results_cache, or
+                None if the query was searched.
+    self.language_results : dict
+                Language name and book links of each language-filter page of
+                the current query, stored in self.results_cache once every
+                language has been scraped. Only kept for a searched query when
+                there is a results cache.
     """
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, backend="edge", detail_backend="selenium", n_workers=1,
+            n_language_workers=1, max_per_host=None, requests_per_second=None, max_image_downloads=8,
+            http_cache=None, isbn_index=None, metrics=None, max_books_per_language=None,
+            max_seconds_per_language=None, pagination="url", image_processor=None,
+            fetch_policy=None, results_cache=None) -> None:
+        if pagination not in ("url", "show_more"):
+            raise ValueError(f"Unknown pagination {pagination!r}.")
+        if pagination == "show_more" and not get_driver_factory(backend).uses_browser:
+            raise ValueError("pagination='show_more' needs a browser backend.")
+        super().__init__(backend=backend, metrics=metrics, fetch_policy=fetch_policy)
+        # every language worker runs its own n_workers book page workers
+        self.fetch_policy.fit_concurrency(n_workers * n_language_workers)
+        self.image_processor = image_processor
+        self.results_cache = results_cache
+        self.pagination = pagination
+        self.paginator = None
+        self.max_books_per_language = max_books_per_language
+        self.max_seconds_per_language = max_seconds_per_language
+        self.http_cache = http_cache
+        self.isbn_index = isbn_index
+        self.detail_backend = detail_backend
+        self.n_workers = n_workers
+        self.n_language_workers = n_language_workers
+        self.max_per_host = max_per_host
+        self.requests_per_second = requests_per_second
+        self.max_image_downloads = max_image_downloads
+        self.worker_pool = None
+        self.language_pool = None
+        if detail_backend == "http":
+            self.detail_scraper = WaterstonesHTTPScraper(cache=http_cache, metrics=metrics,
+                fetch_policy=self.fetch_policy)
+        elif detail_backend == "selenium":
+            self.detail_scraper = self
+        else:
+            raise ValueError(f"Unknown detail backend {detail_backend!r}.")
+        # a shared fetch policy keeps the counts of the run using it
+        self.reset_query_state(reset_stats=False)
+    
+    def reset_query_state(self, reset_stats=True):
+        """Clears the query, links, scraped data, and fetch failure counts so
+        the scraper can be reused for a new search query without restarting
+        the browser.
+
+        Parameters
+        ----------
+        reset_stats : bool
+            False to keep the counts of self.fetch_policy, which may be shared
+            with other scrapers of the same run.
+        """
+        self.close_output_sink() # before run_completed is cleared
         self.query = None
+        self.homepage_pending = True
+        self.run_completed = False
+        self.cached_results = None
+        self.language_results = {}
         self.list_of_language_page_links = []
         self.list_of_book_links = []
-        self.language_filtered_DataFrame = pd.DataFrame(columns=["ID", "Timestamp", "Author", "Title", 
-            "Language", "Price (£)", "Image_link"])
+        self.page_completed = False
+        self.records = BookRecordAccumulator()
+        self._language_filtered_DataFrame = None
+        self.streamed_csv_path = None
+        self.delta = None
+        if reset_stats:
+            self.fetch_policy.reset_stats()
     
-    def search(self, query) -> webdriver.Edge:
-        """Searches given query in waterstones website searchbar.
+    @property
+    def language_filtered_DataFrame(self) -> pd.DataFrame:
+        # built on first use, so pandas is not imported until it is needed
+        if self._language_filtered_DataFrame is None:
+            self._language_filtered_DataFrame = self.records.to_DataFrame()
+
+        return self._language_filtered_DataFrame
+
+    @language_filtered_DataFrame.setter
+    def language_filtered_DataFrame(self, df: pd.DataFrame):
+        self._language_filtered_DataFrame = df
+
+    def open_output_sink(self, formats=("csv",)) -> StreamingBookSink:
+        """Starts streaming scraped books to raw_data/<query>/ as they are parsed,
+        and checkpointing completed work there. If a checkpoint from an earlier,
+        interrupted run of the same query exists, its completed language-filter
+        pages and books are skipped and new rows are appended to its output.
+        Otherwise the output of earlier runs is replaced. The checkpoint of a
+        run which finishes is deleted when the sink is closed, so the next run
+        scrapes every book again into fresh output. Must be called after
+        search.
+
+        Parameters
+        ----------
+        formats : tuple
+            Any of "csv", "jsonl", and "parquet". CSV is always written.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        self.output_sink : StreamingBookSink
+            Returns attribute self.output_sink.
         """
-        self.query = query.replace(" ", "_").lower()
+        self.close_output_sink()
+        self.run_completed = False
+        query_path = f"{self.raw_data_path}/{self.query}"
+        checkpoint_path = f"{query_path}/{self.query}.checkpoint"
+        resume = os.path.exists(checkpoint_path)
+        self.output_sink = StreamingBookSink(query_path, self.query, formats=formats,
+            resume=resume)
+        self.streamed_csv_path = self.output_sink.csv_path
+        self.checkpoint = RunCheckpoint(checkpoint_path)
+
+        return self.output_sink
+    
+    def enable_delta_mode(self, refresh_interval=24 * 60 * 60) -> IncrementalScrape:
+        """Switches to incremental re-scraping against the previous .csv output
+        of the query. Only books with unseen ISBNs are scraped in full, known
+        books only have their price refreshed once older than refresh_interval,
+        and all other rows are carried over without loading their page. The
+        output is rewritten in full, so save it with save_df_as_csv rather than
+        an output sink. Must be called after search.
+
+        Parameters
+        ----------
+        refresh_interval : float
+            Seconds after which the price of a known book is scraped again.
+
+        Returns
+        -------
+        self.delta : IncrementalScrape
+            Returns attribute self.delta.
+        """
+        self.delta = IncrementalScrape(f"{self.raw_data_path}/{self.query}/{self.query}.csv",
+            refresh_interval=refresh_interval)
+
+        return self.delta
+    
+    def save_changelog(self) -> int:
+        """Appends the books added, removed, and repriced since the previous
+        output to raw_data/<query>/<query>_changelog.csv. Requires delta mode.
+
+        Returns
+        -------
+        int
+            Number of changes written.
+        """
+        os.makedirs(f"{self.raw_data_path}/{self.query}", exist_ok=True)
+        number_of_changes = self.delta.write_changelog(
+            f"{self.raw_data_path}/{self.query}/{self.query}_changelog.csv")
+        print(f"Number of changes is {number_of_changes}.")
+
+        return number_of_changes
+    
+    def close_output_sink(self):
+        """Flushes and closes the output sink and checkpoint, if open. The
+        checkpoint is deleted if the run completed, and kept for a restart if
+        it was interrupted or a language page failed to load.
+        """
+        if getattr(self, "output_sink", None) is not None:
+            self.output_sink.close()
+        if getattr(self, "checkpoint", None) is not None:
+            if self.run_completed:
+                self.checkpoint.remove()
+            else:
+                self.checkpoint.close()
+        self.output_sink = None
+        self.checkpoint = None
+
+    def load_page(self) -> webdriver.Chrome:
+        """Loads the homepage, from which the next search is made.
+
+        Returns
+        -------
+        webdriver.Chrome
+            Chrome webdriver on the homepage.
+        """
+        super().load_page()
+        self.homepage_pending = False
+
+        return self.driver
+    
+    @timed_stage("search")
+    def search(self, query) -> webdriver.Chrome:
+        """Searches given query in waterstones website searchbar. Without a
+        browser the search form of the current page is submitted by its URL.
+        If self.results_cache holds recent results of the query, or of one
+        differing only in case or spacing, nothing is searched and they are
+        used instead. Otherwise, after reset_query_state, the homepage is
+        loaded first, accepting cookies if the driver has not yet, so a
+        scraper whose searches all hit the cache never starts its driver.
+
+        Returns
+        -------
+        webdriver.Chrome
+            Chrome webdriver, or None after a cache hit if it has not been started.
+        """
+        self.query = normalize_query(query)
+        if self.results_cache is not None:
+            self.cached_results = self.results_cache.get(self.query)
+            if self.cached_results is not None:
+                print(f"Using cached results of {self.query}.")
+                return self._driver
+        if self.homepage_pending and self.cookies_accepted:
+            self.load_page()
+        elif self.homepage_pending:
+            self.load_and_accept_cookies()
+        if not self.uses_browser:
+            action, field_name = parse_search_form(self.driver.page_source, self.driver.current_url)
+            if action is None:
+                raise NoSuchElementException("No search bar on the current page.")
+            try:
+                search_url = search_form_url(action, field_name, self.query.replace("_", " "))
+            except ValueError as error:
+                raise NoSuchElementException(str(error)) from None
+            return self.get_page(search_url, "search")
         search_bar = self.driver.find_element(by=By.XPATH, 
             value="//input[@class='input input-search']")
         search_bar.click()
         try:
             search_bar.send_keys(self.query.replace("_", " "))
             search_bar.send_keys(Keys.RETURN)
-        except:
+        except WebDriverException as error:
+            self.fetch_policy.record_failure("search", self.driver.current_url, error)
             print("Invalid query input.")
 
         return self.driver
 
-    def get_language_filter_page_links(self) -> webdriver.Edge:
+    @timed_stage("get_language_filter_page_links")
+    def get_language_filter_page_links(self) -> webdriver.Chrome:
         """Populates self.list_of_language_page_links with all the links to 
         language-filtered query results.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
+        if self.cached_results is not None:
+            self.list_of_language_page_links.extend(self.cached_results["language_links"])
+            return self._driver
+        if not self.uses_browser:
+            html, url = self.take_snapshot()
+            self.list_of_language_page_links.extend(parse_language_links(html, url))
+            if len(self.list_of_language_page_links) > 6:
+                self.list_of_language_page_links.pop()
+            return self.driver
         # Find language section of the filter bar (not always in the same place!)
         search_filters = self.driver.find_elements(by=By.XPATH, 
             value="//div[@class='filter-header slide-trigger js-filter-trigger']") 
@@ -89,23 +411,82 @@ class QueryWaterstones(WaterstonesScraper):
 
         return self.driver
 
-    def get_all_book_links_from_page(self) -> webdriver.Edge:
+    def snapshot_results_list(self) -> tuple:
+        """Gets the HTML of the results list of the current page and the page's
+        URL in a single WebDriver round trip, so its links can be parsed locally.
+
+        Returns
+        -------
+        tuple
+            HTML of the search-results-list element and URL of the page. Without
+            a browser, HTML of the whole page.
+        """
+        if not self.uses_browser:
+            html, url = self.take_snapshot()
+            if 'class="search-results-list"' not in html:
+                raise NoSuchElementException("No search-results-list on the page.")
+            return html, url
+        snapshot = self.driver.execute_script("""
+        var results = document.evaluate("//div[@class='search-results-list']", document,
+            null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return results === null ? null : [results.outerHTML, window.location.href]""")
+        if snapshot is None:
+            raise NoSuchElementException("No search-results-list on the page.")
+
+        return tuple(snapshot)
+    
+    def get_paginator(self) -> PaginatedResultsFetcher:
+        """Gets self.paginator, creating it with the browser's cookies on first use.
+
+        Returns
+        -------
+        self.paginator : PaginatedResultsFetcher
+            Returns attribute self.paginator.
+        """
+        if self.paginator is None:
+            self.paginator = PaginatedResultsFetcher(timeout=self.fetch_policy.timeout,
+                cache=self.http_cache, metrics=self.metrics, fetch_policy=self.fetch_policy)
+            self.paginator.copy_cookies(self.driver)
+        self.paginator.rate_limiter = self.rate_limiter
+
+        return self.paginator
+    
+    @timed_stage("get_all_book_links_from_page")
+    def get_all_book_links_from_page(self) -> webdriver.Chrome:
         """Populates self.list_of_book_links with all the links to books on the
-        current page.
+        current page. The links of the first page are parsed locally from one
+        snapshot of the results list. With pagination="url" the remaining pages
+        are fetched concurrently by their page-number URLs; otherwise, or if
+        that fails, all results are displayed with the show more button and the
+        whole list is read in one snapshot.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
         self.list_of_book_links = []
-        book_container = self.driver.find_element(by=By.XPATH, 
-            value="//div[@class='search-results-list']")
-        book_list = book_container.find_elements(by=By.XPATH, value="./div")
-        for book in book_list:
-            a_tag = book.find_element(by=By.TAG_NAME, value="a")
-            link = a_tag.get_attribute("href")
-            self.list_of_book_links.append(link)
+        results_html, url = self.snapshot_results_list()
+        book_links = parse_book_links(results_html, url)
+        if self.pagination == "url":
+            try:
+                number_of_pages = self.get_number_of_pages()
+            except (NoSuchElementException, ValueError):
+                number_of_pages = 1
+            print(f"Number of pages is {number_of_pages}.")
+            if number_of_pages > 1:
+                try:
+                    book_links = self.get_paginator().fetch_links(url, number_of_pages, book_links)
+                except (PaginationError, requests.RequestException) as error:
+                    if not self.uses_browser:
+                        raise
+                    print(f"Fetching pages by URL failed ({error}); showing all results instead.")
+                    book_links = None
+        if self.pagination == "show_more" or book_links is None:
+            self.display_all_results()
+            results_html, url = self.snapshot_results_list()
+            book_links = parse_book_links(results_html, url)
+        self.list_of_book_links = book_links
         print(f"Number of items is {len(self.list_of_book_links)}.")
 
         return self.driver
@@ -118,10 +499,227 @@ class QueryWaterstones(WaterstonesScraper):
         language_name.test : str
                 Name of the language which is filtering search results.
         """
+        if not self.uses_browser:
+            language_name = find_text_by_path(self.driver.page_source, LANGUAGE_NAME_XPATH)
+            if language_name is None:
+                raise NoSuchElementException("No language name on the page.")
+            return language_name
         language_name = self.driver.find_element(by=By.XPATH, 
-            value="/html/body/div[1]/div[3]/div[3]/div[1]/div[1]/div/span")
+            value=LANGUAGE_NAME_XPATH)
         return language_name.text
     
+    def get_book_dict(self, scraper, book_link: str) -> dict:
+        """Loads a book's product page with the given scraper and scrapes ISBN,
+        author name, book title, price, and image link from it.
+
+        Parameters
+        ----------
+        scraper : WaterstonesScraper or WaterstonesHTTPScraper
+            Scraper used to load the page and call the getter methods.
+        book_link : str
+            URL of the product page.
+
+        Returns
+        -------
+        book_dict : dict
+            Dictionary of the scraped data. Data for language is assigned elsewhere.
+        """
+        self.throttle(book_link)
+        scraper.load_book_page(book_link)
+        book_dict = {
+                    "ID" : scraper.get_ISBN(),
+                    "Timestamp" : time.ctime(), # timestamp of scraping.
+                    "Author" : scraper.get_author(), 
+                    "Title" : scraper.get_title(),
+                    "Language" : None,
+                    "Price (£)" : scraper.get_price(),
+                    "Image_link" : scraper.get_image_link()
+                    }
+
+        return book_dict
+    
+    def create_detail_scraper(self):
+        """Creates a new scraper for a worker of self.worker_pool, using the
+        same backend as self.detail_scraper.
+
+        Returns
+        -------
+        WaterstonesScraper or WaterstonesHTTPScraper
+            New scraper with its own driver, from the same driver backend, or
+            HTTP session.
+        """
+        if self.detail_backend == "http":
+            return WaterstonesHTTPScraper(cache=self.http_cache, metrics=self.metrics,
+                fetch_policy=self.fetch_policy)
+
+        return WaterstonesScraper(backend=self.driver_factory, metrics=self.metrics,
+            fetch_policy=self.fetch_policy)
+    
+    def record_book(self, book_link: str, book_dict: dict):
+        """Writes a scraped book to the output sink and checkpoints its link,
+        if an output sink is open.
+
+        Parameters
+        ----------
+        book_link : str
+            URL of the book's product page.
+        book_dict : dict
+            Scraped data of the book.
+        """
+        if self.output_sink is not None and book_dict is not None:
+            self.output_sink.write(book_dict)
+            self.checkpoint.mark_book_done(book_link)
+    
+    def get_language_book_dict(self, scraper, book_link: str, language_name=None):
+        """Gets the data of one book on a language-filtered page, loading its
+        product page only when needed. In delta mode known books are carried
+        over or only have their price refreshed, and with self.isbn_index a book
+        already scraped in this run reuses its data instead of being fetched again.
+
+        Parameters
+        ----------
+        scraper : WaterstonesScraper or WaterstonesHTTPScraper
+            Scraper used to load the page and call the getter methods.
+        book_link : str
+            URL of the product page.
+        language_name : str
+            Language of the books on the current page.
+
+        Returns
+        -------
+        book_dict : dict or None
+            Dictionary of the book's data, or None if self.isbn_index saw the
+            book in a previous run.
+        """
+        previous_row = None if self.delta is None else self.delta.previous_row(book_link)
+        if previous_row is not None:
+            if self.delta.is_due_for_refresh(previous_row):
+                self.throttle(book_link)
+                scraper.load_book_page(book_link)
+                book_dict = dict(previous_row, **{"Timestamp" : time.ctime(),
+                    "Price (£)" : scraper.get_price()})
+            else:
+                book_dict = dict(previous_row)
+        elif self.isbn_index is not None:
+            isbn = isbn_from_link(book_link)
+            while True:
+                if self.isbn_index.claim(isbn):
+                    try:
+                        book_dict = self.get_book_dict(scraper, book_link)
+                    except BaseException:
+                        self.isbn_index.release(isbn) # so a later duplicate fetches it
+                        raise
+                    self.isbn_index.remember(isbn, book_dict)
+                    break
+                # waits while another worker is scraping the same book
+                book_dict = self.isbn_index.lookup(isbn)
+                if book_dict is not None:
+                    break
+                if isbn in self.isbn_index:
+                    return None # seen in an earlier run
+                # the other worker failed and released the ISBN, so fetch it here
+        else:
+            book_dict = self.get_book_dict(scraper, book_link)
+        book_dict["Language"] = language_name
+        if self.delta is not None:
+            self.delta.observe(book_dict)
+
+        return book_dict
+    
+    def iter_page_results(self, language_name=None):
+        """Scrapes ISBN, author name, book title, price, and image link for
+        each book in self.list_of_book_links, yielding each book as soon as it
+        is scraped. With n_workers > 1 the book links are split between the
+        workers of self.worker_pool, with a bounded number in flight. Books
+        already checkpointed are skipped, and scraping stops at
+        self.max_books_per_language books or after self.max_seconds_per_language.
+        Once the results are consumed, self.page_completed tells whether every
+        book was scraped or the page was cut off by either limit. In delta mode, known books are carried over or only have their price
+        refreshed. A book whose page still fails after the retries of
+        self.fetch_policy is counted as skipped.
+
+        Parameters
+        ----------
+        language_name : str
+            Language of the books on the current page.
+
+        Yields
+        ------
+        tuple
+            Link of each book and its dictionary of scraped data, in the order
+            of self.list_of_book_links. The dictionary is None for a book
+            skipped by self.isbn_index or whose page failed.
+        """
+        pending_links = self.list_of_book_links
+        if self.checkpoint is not None:
+            pending_links = [book_link for book_link in pending_links
+                if book_link not in self.checkpoint.book_links_done]
+        self.page_completed = False
+        book_links = itertools.islice(pending_links, self.max_books_per_language)
+        if self.max_seconds_per_language is not None:
+            deadline = time.monotonic() + self.max_seconds_per_language
+            book_links = itertools.takewhile(lambda _: time.monotonic() < deadline, book_links)
+
+        def scrape_book(scraper, book_link):
+            try:
+                return self.get_language_book_dict(scraper, book_link, language_name)
+            except FETCH_ERRORS as error:
+                print(f"Skipping {book_link}: {type(error).__name__}: {error}")
+                self.fetch_policy.record_skipped("books")
+                return None
+
+        if self.n_workers > 1:
+            if self.worker_pool is None:
+                self.worker_pool = BookPageWorkerPool(self.create_detail_scraper,
+                    n_workers=self.n_workers, max_per_host=self.max_per_host,
+                    requests_per_second=self.requests_per_second)
+            results = self.worker_pool.imap(scrape_book, book_links)
+        else:
+            results = ((book_link, scrape_book(self.detail_scraper, book_link))
+                for book_link in book_links)
+        books_scraped = 0
+        for result in results:
+            books_scraped += 1
+            yield result
+        self.page_completed = books_scraped == len(pending_links)
+
+    def iter_page_book_dicts(self, language_name=None):
+        """Yields each book scraped by iter_page_results, passing it to
+        record_book first. A book whose page failed is left out of the
+        checkpoint, so a restarted run tries it again.
+
+        Parameters
+        ----------
+        language_name : str
+            Language of the books on the current page.
+
+        Yields
+        ------
+        book_dict : dict
+            Dictionary of scraped data for each book, in the order of
+            self.list_of_book_links. Books skipped by self.isbn_index are left out.
+        """
+        for book_link, book_dict in self.iter_page_results(language_name):
+            self.record_book(book_link, book_dict)
+            if book_dict is not None:
+                yield book_dict
+
+    def get_page_book_dicts(self, language_name=None) -> list:
+        """Collects every book yielded by iter_page_book_dicts.
+
+        Parameters
+        ----------
+        language_name : str
+            Language of the books on the current page.
+
+        Returns
+        -------
+        book_dicts : list
+            Dictionary of scraped data for each book, in the order of
+            self.list_of_book_links. Books skipped by self.isbn_index are left out.
+        """
+        return list(self.iter_page_book_dicts(language_name))
+    
     def create_DataFrame_of_page_data(self) -> pd.DataFrame:
         """Calls scraping methods to obtain ISBN, author name, book title,
         price, and image link from the current page, returning the information
@@ -133,87 +731,416 @@ class QueryWaterstones(WaterstonesScraper):
             DataFrame including all relevant data from the current page. Data
             for language is assigned elsewhere.
         """
-        index = 0
-        page_df = pd.DataFrame(columns=["ID", "Timestamp", "Author", "Title", 
-            "Language", "Price (£)", "Image_link"])
-        for book_link in self.list_of_book_links[:1]:
-            self.driver.get(book_link)
-            isbn = self.get_ISBN()
-            author = self.get_author()
-            title = self.get_title()
-            price = self.get_price()
-            image = self.get_image_link()
-            book_dict = {
-                        "ID" : isbn,
-                        "Timestamp" : time.ctime(), # timestamp of scraping.
-                        "Author" : author, 
-                        "Title" : title,
-                        "Language" : None,
-                        "Price (£)" : price,
-                        "Image_link" : image
-                        }
-            df = pd.DataFrame(book_dict, index=[index])
-            page_df = pd.concat([page_df, df])
-            index += 1
-    
-        return page_df
+        page_records = BookRecordAccumulator()
+        page_records.extend(self.get_page_book_dicts())
+    
+        return page_records.to_DataFrame()
+    
+    def load_language_page(self, language_link: str) -> tuple:
+        """Loads a language-filtered results page and populates
+        self.list_of_book_links with the links of its books. A page which
+        fails to load is counted as skipped. Pages in self.cached_results are
+        not loaded.
+
+        Parameters
+        ----------
+        language_link : str
+            URL of the language-filtered results page.
+
+        Returns
+        -------
+        tuple
+            True if the page and its book links were loaded, and the name of
+            the page's language, or None if the page does not identify it.
+        """
+        if self.cached_results is not None and language_link in self.cached_results["languages"]:
+            cached = self.cached_results["languages"][language_link]
+            self.list_of_book_links = list(cached["book_links"])
+            return True, cached["language_name"]
+        self.throttle(language_link)
+        try:
+            self.get_page(language_link, "load_language_page")
+        except FETCH_ERRORS as error:
+            print(f"Skipping language page {language_link}: {type(error).__name__}: {error}")
+            self.fetch_policy.record_skipped("language_pages")
+            return False, None
+        try:
+            language_name = self.get_language_name()
+        except NoSuchElementException as error:
+            # this runs if the page does not identify language
+            self.fetch_policy.record_failure("get_language_name", language_link, error)
+            language_name = None
+        try:
+            self.get_all_book_links_from_page()
+        except NoSuchElementException:
+            # this runs if there is only one book in the query search
+            current_url = self.driver.current_url
+            self.list_of_book_links = [current_url]
+        except FETCH_ERRORS + (PaginationError,) as error:
+            print(f"Skipping language page {language_link}: {type(error).__name__}: {error}")
+            self.fetch_policy.record_failure("get_all_book_links_from_page", language_link, error)
+            self.fetch_policy.record_skipped("language_pages")
+            return False, language_name
+
+        return True, language_name
+
+    def create_language_scraper(self):
+        """Creates a new query for a worker of self.language_pool, with its own
+        driver from the same driver backend, sharing this query's settings,
+        fetch policy, metrics, cache, and ISBN index. Its cookies are accepted
+        before it is used.
+
+        Returns
+        -------
+        QueryWaterstones
+            New query scraping book pages one language at a time.
+        """
+        scraper = QueryWaterstones(backend=self.driver_factory, detail_backend=self.detail_backend,
+            n_workers=self.n_workers, max_per_host=self.max_per_host,
+            requests_per_second=self.requests_per_second, http_cache=self.http_cache,
+            isbn_index=self.isbn_index, metrics=self.metrics,
+            max_books_per_language=self.max_books_per_language,
+            max_seconds_per_language=self.max_seconds_per_language,
+            pagination=self.pagination, fetch_policy=self.fetch_policy)
+        scraper.base_url = self.base_url
+        scraper.load_and_accept_cookies()
+
+        return scraper
+
+    @property
+    def keeps_language_results(self) -> bool:
+        return self.results_cache is not None and self.cached_results is None
+
+    def iter_language_results(self, language_links: list):
+        """Scrapes every language-filtered page of language_links on the
+        workers of self.language_pool, one language per task, so languages
+        are scraped at the same time and the slowest one sets the pace. Each
+        book is passed on as soon as it is scraped, through a bounded queue
+        per language, so a language running ahead waits instead of holding
+        all of its books.
+
+        Parameters
+        ----------
+        language_links : list
+            URLs of the language-filtered results pages.
+
+        Yields
+        ------
+        tuple
+            Each language link and a (kind, value) message, in the order of
+            language_links: ("language", language name and book links) once
+            the page has loaded, if self.keeps_language_results, then
+            ("book", (book link, book dictionary)) for each book, and finally
+            ("end", whether every book was scraped), False if the page failed
+            to load.
+        """
+        if self.language_pool is None:
+            self.language_pool = BookPageWorkerPool(self.create_language_scraper,
+                n_workers=self.n_language_workers)
+        keeps_language_results = self.keeps_language_results
+
+        def scrape_language(scraper, language_link, put):
+            scraper.delta = self.delta
+            scraper.rate_limiter = self.rate_limiter
+            scraper.cached_results = self.cached_results
+            loaded, language_name = scraper.load_language_page(language_link)
+            if not loaded:
+                put(("end", False))
+                return
+            if keeps_language_results:
+                put(("language", {"language_name" : language_name,
+                    "book_links" : list(scraper.list_of_book_links)}))
+            if self.checkpoint is not None:
+                scraper.list_of_book_links = [book_link for book_link in scraper.list_of_book_links
+                    if book_link not in self.checkpoint.book_links_done]
+            page_results = scraper.iter_page_results(language_name)
+            try:
+                for result in page_results:
+                    put(("book", result))
+            except StreamClosed:
+                page_results.close() # cancels the book pages not started yet
+                raise
+            put(("end", scraper.page_completed))
+
+        yield from self.language_pool.imap_streams(scrape_language, language_links)
+
+    def iter_language_filtered_books(self):
+        """Streams every book of all language-filtered query results, yielding
+        each one as soon as it is scraped without keeping it, so memory stays
+        constant however many results there are. With n_language_workers > 1
+        languages are scraped concurrently by self.language_pool, and the
+        books are yielded one language after another, in the order of
+        self.list_of_language_page_links. With an output sink open the books
+        are also written to disk as they arrive. A language is only
+        checkpointed as done once all its books have been consumed, so one
+        cut off by max_books_per_language or max_seconds_per_language is
+        resumed by a restarted run, and a language page which fails to load is
+        counted as skipped and left for a restarted run. Once every language
+        has been fully scraped, the run is marked as completed and the links
+        of a searched query are stored in self.results_cache.
+
+        Yields
+        ------
+        book_dict : dict
+            Dictionary of scraped data for each book, including its language.
+        """
+        language_links = self.list_of_language_page_links
+        if self.checkpoint is not None:
+            language_links = [language_link for language_link in language_links
+                if language_link not in self.checkpoint.language_links_done]
+        languages_unfinished = 0
+        if self.n_language_workers > 1 and len(language_links) > 1:
+            for language_link, (kind, value) in self.iter_language_results(language_links):
+                if kind == "language":
+                    self.language_results[language_link] = value
+                elif kind == "book":
+                    book_link, book_dict = value
+                    self.record_book(book_link, book_dict)
+                    if book_dict is not None:
+                        yield book_dict
+                elif not value:
+                    languages_unfinished += 1
+                elif self.checkpoint is not None:
+                    self.checkpoint.mark_language_done(language_link)
+        else:
+            for language_link in language_links:
+                loaded, language_name = self.load_language_page(language_link)
+                if not loaded:
+                    languages_unfinished += 1
+                    continue
+                if self.keeps_language_results:
+                    self.language_results[language_link] = {"language_name" : language_name,
+                        "book_links" : list(self.list_of_book_links)}
+                yield from self.iter_page_book_dicts(language_name)
+                if not self.page_completed:
+                    languages_unfinished += 1
+                elif self.checkpoint is not None:
+                    self.checkpoint.mark_language_done(language_link)
+        self.run_completed = languages_unfinished == 0
+        self.store_query_results()
+
+    def store_query_results(self):
+        """Stores the language-filter and book links of the current query in
+        self.results_cache, if the query was searched rather than taken from
+        the cache and every language page was loaded.
+        """
+        if self.results_cache is None or self.cached_results is not None:
+            return
+        if self.list_of_language_page_links and all(language_link in self.language_results
+                for language_link in self.list_of_language_page_links):
+            self.results_cache.put(self.query, self.list_of_language_page_links,
+                self.language_results)
     
     def get_DataFrame_of_language_filtered_query_results(self):
         """Populates self.language_filtered_DataFrame with data from all
-        language-filtered query results.
+        language-filtered query results. Rows are accumulated in self.records
+        and the DataFrame is built once, after every language has been scraped.
 
         Returns
         -------
         self.language_filtered_DataFrame : pd.DataFrame
-            Returns attribute self.language_filtered_DataFrame.
+            Returns attribute self.language_filtered_DataFrame, with int64 ID,
+            float64 price, and categorical author and language columns.
         """
-        for language_link in self.list_of_language_page_links:
-            self.driver.get(language_link)
-            try:
-                language_name = self.get_language_name()
-            except:
-                # this runs if the page does not identify language
-                language_name = None
-            try:
-                self.get_all_book_links_from_page()
-            except:
-                # this runs if there is only one book in the query search
-                current_url = self.driver.current_url
-                self.list_of_book_links = [current_url]
-            page_df = self.create_DataFrame_of_page_data()
-            page_df["Language"] = language_name
-            self.language_filtered_DataFrame = pd.concat([self.language_filtered_DataFrame,
-            page_df], ignore_index=True)
+        self.records.extend(self.iter_language_filtered_books())
+        self.language_filtered_DataFrame = self.records.to_DataFrame()
         
-        return self.language_filtered_DataFrame.astype(str)
+        return self.language_filtered_DataFrame
     
+    def quit_browser(self):
+        """Quits the webdriver and the workers of self.worker_pool and
+        self.language_pool, and closes the HTTP sessions of the detail scraper
+        and self.paginator and the output sink if in use.
+        """
+        if self.language_pool is not None:
+            self.language_pool.close()
+            self.language_pool = None
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+        if self.paginator is not None:
+            self.paginator.close()
+            self.paginator = None
+        if self.detail_scraper is not self:
+            self.detail_scraper.quit_browser()
+        self.close_output_sink()
+        super().quit_browser()
+    
+    @timed_stage("save_df_as_csv")
     def save_df_as_csv(self):
         """Saves self.language_filtered_DataFrame to a .csv file in
-        a folder with the name of the search query, with the raw_data
-        folder.
+        a folder with the name of the search query, within the raw_data
+        folder. If an output sink is open the rows are already on disk, 
+        so the sink is closed instead.
         """
+        if self.output_sink is not None:
+            self.close_output_sink()
+            return
         if not os.path.exists(f"{self.raw_data_path}/{self.query}"):
             os.mkdir(f"{self.raw_data_path}/{self.query}")
         self.language_filtered_DataFrame.to_csv(f"{self.raw_data_path}/{self.query}/{self.query}.csv")
     
-    def save_imgs_as_jpg(self):
+    def save_df_to_sqlite(self, store=None) -> int:
+        """Upserts self.language_filtered_DataFrame into a SQLite database shared
+        by all queries, as an alternative to save_df_as_csv.
+
+        Parameters
+        ----------
+        store : SQLiteBookStore
+            Open store to write to. Defaults to raw_data/books.sqlite3, which is
+            opened and closed by this method.
+
+        Returns
+        -------
+        int
+            Number of rows upserted.
+        """
+        if store is not None:
+            return store.upsert_DataFrame(self.language_filtered_DataFrame, query=self.query)
+        from waterstones_sqlite_store import SQLiteBookStore # imports pandas
+
+        with SQLiteBookStore(f"{self.raw_data_path}/books.sqlite3") as store:
+            return store.upsert_DataFrame(self.language_filtered_DataFrame, query=self.query)
+    
+    @timed_stage("save_imgs_as_jpg")
+    def save_imgs_as_jpg(self) -> dict:
         """Saves images found in the Image_link column of self.language_filtered_DataFrame 
-        in images folder, in the folder with the name of the search query.
+        in images folder, in the folder with the name of the search query. Images are
+        downloaded concurrently by an AsyncImageDownloader, skipping any already saved,
+        and copying any already downloaded for another query of self.isbn_index.
+        When books were streamed to an output sink, links are read from its CSV.
+        With self.image_processor the saved covers are then verified,
+        deduplicated, and thumbnailed.
+
+        Returns
+        -------
+        stats : dict
+            Download statistics, including images and bytes per second, and
+            the statistics of self.image_processor under "processing".
         """
-        os.mkdir(f"{self.raw_data_path}/{self.query}/images")
-        for img_url in self.language_filtered_DataFrame["Image_link"]:
-            isbn = img_url[-17:-4]
-            self.download_img(img_url, f"{self.raw_data_path}/{self.query}/images/{isbn}.jpg")
+        os.makedirs(f"{self.raw_data_path}/{self.query}/images", exist_ok=True)
+        if self.streamed_csv_path is not None:
+            import pandas as pd # imported when first needed, to keep startup fast
+
+            # includes books scraped by earlier, interrupted runs
+            image_df = pd.read_csv(self.streamed_csv_path, usecols=["ID", "Image_link"])
+        else:
+            image_df = self.language_filtered_DataFrame
+        images = {}
+        downloads = {}
+        for isbn, img_url in zip(image_df["ID"], image_df["Image_link"]):
+            isbn = str(isbn)
+            file_path = f"{self.raw_data_path}/{self.query}/images/{isbn}.jpg"
+            images[isbn] = file_path
+            if file_path in downloads or os.path.exists(file_path):
+                continue # repeated row, or saved by an earlier, interrupted run
+            saved_path = None if self.isbn_index is None else self.isbn_index.claim_image(isbn, file_path)
+            if saved_path is None:
+                downloads[file_path] = img_url
+            elif os.path.exists(saved_path):
+                shutil.copyfile(saved_path, file_path) # already downloaded for another query
+        downloads = [(img_url, file_path) for file_path, img_url in downloads.items()]
+        downloader = AsyncImageDownloader(max_in_flight=self.max_image_downloads,
+            timeout=self.fetch_policy.timeout, cache=self.http_cache,
+            fetch_policy=self.fetch_policy)
+        try:
+            stats = downloader.run(downloads)
+        finally:
+            downloader.close()
+        if self.metrics is not None:
+            self.metrics.add_bytes("save_imgs_as_jpg", stats["bytes"])
+        print(f"Downloaded {stats['images']} images ({stats['bytes']} bytes) in "
+            f"{stats['seconds']:.2f}s: {stats['images_per_second']:.1f} images/s, "
+            f"{stats['bytes_per_second'] / 1e6:.2f} MB/s.")
+        for img_url, error in downloader.failures:
+            print(f"Failed to download {img_url}: {error}")
+        if self.image_processor is not None:
+            stats["processing"] = self.image_processor.process(images)
+            print(f"Processed {stats['processing']['images']} images: "
+                f"{stats['processing']['invalid']} invalid, {stats['processing']['duplicates']} "
+                f"duplicates ({stats['processing']['bytes_saved']} bytes saved).")
+
+        return stats
+#%%
+def run_the_scraper(author_list=None, backend=None, metrics=None, http_cache=None,
+        results_cache_path=os.path.join("raw_data", "query_results.sqlite3"),
+        image_processor=None) -> StageMetrics:
+    """The user inputs desired search queries one at a time which 
+    are iteratively appended to the author_list list, unless it is 
+    given. The function then borrows a warm QueryWaterstones instance from a 
+    DriverSessionPool for each query and calls all relevant methods 
+    to scrape and save desired data, streaming every book to disk. 
+    Every browser is quit when the run ends, even if a query fails. 
+    Timings of each pipeline stage are saved as JSON and Prometheus 
+    text in the raw_data folder. Unless given, the driver backend is 
+    read from the WATERSTONES_BACKEND environment variable, headed 
+    Edge by default. The links found by each query are kept in 
+    results_cache_path, so a query repeated within the 
+    WATERSTONES_RESULTS_TTL seconds (6 hours by default) skips its search.
+
+    Parameters
+    ----------
+    author_list : list
+        Optional authors to search for, instead of asking the user.
+    backend : str
+        Optional driver backend of the queries.
+    metrics : StageMetrics
+        Optional recorder of the stage timings. Defaults to a new StageMetrics.
+    http_cache : HTTPResponseCache
+        Optional on-disk cache in front of the pages and images fetched over
+        HTTP by every query. See QueryWaterstones.
+    results_cache_path : str
+        SQLite file in which the links found by each query are kept.
+        Defaults to raw_data/query_results.sqlite3.
+    image_processor : CoverImageProcessor
+        Optional stage which verifies, deduplicates, and thumbnails the
+        covers saved by every query. See QueryWaterstones.
+
+    Returns
+    -------
+    metrics : StageMetrics
+        Stage timings of the run, including the browser launch.
+    """
+    if author_list is None:
+        author_list = []
+        while True:
+            author = input("Enter author, or press ENTER to proceed: ")
+            if author != "":
+                author_list.append(author)
+            else:
+                break
+    
+    print(author_list)
+    # fetch each book and cover once across all authors, keeping only the ISBNs
+    isbn_index = SeenISBNIndex(keep_records=False)
+    metrics = StageMetrics() if metrics is None else metrics
+    backend = backend or os.environ.get("WATERSTONES_BACKEND", "edge")
+    results_cache = QueryResultsCache(results_cache_path,
+        ttl=float(os.environ.get("WATERSTONES_RESULTS_TTL", 6 * 60 * 60)))
+    with results_cache, DriverSessionPool(QueryWaterstones, size=1, backend=backend,
+            isbn_index=isbn_index, metrics=metrics, results_cache=results_cache,
+            http_cache=http_cache, image_processor=image_processor) as pool:
+        for author in author_list:
+            with pool.acquire() as driver:
+                driver.search(author)
+                driver.open_output_sink()
+                driver.get_language_filter_page_links()
+                # stream books straight to the output sink rather than keeping them
+                number_of_books = sum(1 for _ in driver.iter_language_filtered_books())
+                print(f"Number of books scraped is {number_of_books}.")
+                driver.save_df_as_csv()
+                driver.save_imgs_as_jpg()
+                fetch_summary = driver.fetch_policy.summary()
+                print(f"{fetch_summary['requests']} requests, {fetch_summary['retries']} retries, "
+                    f"{fetch_summary['failures']} failures {fetch_summary['failures_by_stage']}, "
+                    f"skipped {fetch_summary['skipped']}.")
+                raw_data_path = driver.raw_data_path
+    if author_list:
+        metrics.write_json(f"{raw_data_path}/metrics.json")
+        metrics.write_prometheus(f"{raw_data_path}/metrics.prom")
+        print(f"Stage metrics saved to {raw_data_path}/metrics.json.")
+
+    return metrics
 #%%
 if __name__ == "__main__":
-    author_list = ["jose saramago", "isabel allende", "gabriel garcia marquez"]
-    for author in author_list:
-        driver = QueryWaterstones()
-        driver.load_and_accept_cookies()
-        driver.search(author)
-        driver.get_language_filter_page_links()
-        driver.get_DataFrame_of_language_filtered_query_results()
-        driver.save_df_as_csv()
-        driver.save_imgs_as_jpg()
-    driver.quit_browser()
-#%%
\ No newline at end of file
+    run_the_scraper()
\ No newline at end of file
@@ -0,0 +1,359 @@
+#%%
+from __future__ import annotations
+from array import array
+from enum import Enum
+import math
+import sys
+#%%
+COLUMNS = ["ID", "Timestamp", "Author", "Title", "Language", "Price (£)", "Image_link"]
+#%%
+def import_pyarrow(output: str):
+    """Imports pyarrow, an optional dependency only needed for Arrow and
+    Parquet output, failing with a clear message if it is not installed.
+
+    Parameters
+    ----------
+    output : str
+        Name of the output which needs pyarrow, for the error message.
+
+    Returns
+    -------
+    module
+        The pyarrow module.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError(f"{output} needs pyarrow, which is not installed. Install it "
+            "with pip install pyarrow, or choose another output format.") from error
+
+    return pyarrow
+
+def _intern_text(value):
+    """Interns a string, so equal values of many books share one copy. None
+    and the NaN read back from an empty .csv cell become None, and any other
+    value is returned as it is.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+
+    return value
+#%%
+class Language(str, Enum):
+    """Languages offered by the language filter of waterstones.com. Members
+    compare equal to their names as shown on the site.
+    """
+    ARABIC = "Arabic"
+    CATALAN = "Catalan"
+    CHINESE = "Chinese"
+    DANISH = "Danish"
+    DUTCH = "Dutch"
+    ENGLISH = "English"
+    FRENCH = "French"
+    GALICIAN = "Galician"
+    GERMAN = "German"
+    GREEK = "Greek"
+    IRISH = "Irish"
+    ITALIAN = "Italian"
+    JAPANESE = "Japanese"
+    LATIN = "Latin"
+    POLISH = "Polish"
+    PORTUGUESE = "Portuguese"
+    RUSSIAN = "Russian"
+    SPANISH = "Spanish"
+    SWEDISH = "Swedish"
+    WELSH = "Welsh"
+
+    @classmethod
+    def parse(cls, name):
+        """Converts a language name to its member.
+
+        Parameters
+        ----------
+        name : str or None
+            Name of the language as shown on the site.
+
+        Returns
+        -------
+        Language, str, or None
+            Member of the language, or the interned name if the site offers a
+            language not listed here, or None if name is None or NaN.
+        """
+        if name is None or isinstance(name, cls):
+            return name
+        if isinstance(name, float): # missing value read back from a .csv file
+            return None
+        try:
+            return cls(name)
+        except ValueError:
+            return sys.intern(str(name))
+
+    def __str__(self) -> str:
+        return self.value
+#%%
+class BookRecord:
+    """Compact typed record of one book. Slots instead of a per-instance
+    dictionary, an int ISBN, a float price, a Language member, and interned
+    author and timestamp strings shared between records keep millions of
+    records in a fraction of the memory of book dictionaries.
+
+    Parameters
+    ----------
+    isbn : int
+        ISBN of the book.
+    timestamp : str or None
+        time.ctime() timestamp of scraping. None or NaN if missing.
+    author : str or None
+        Name of the author. None or NaN if missing.
+    title : str
+        Title of the book.
+    language : Language, str, or None
+        Language of the book.
+    price : float
+        Price in GBP.
+    image_link : str
+        URL of the cover image.
+    """
+    __slots__ = ("isbn", "timestamp", "author", "title", "language", "price", "image_link")
+
+    def __init__(self, isbn: int, timestamp: str, author: str, title: str, language,
+            price: float, image_link: str) -> None:
+        self.isbn = int(isbn)
+        self.timestamp = _intern_text(timestamp)
+        self.author = _intern_text(author)
+        self.title = title
+        self.language = Language.parse(language)
+        self.price = float(price)
+        self.image_link = image_link
+
+    @classmethod
+    def from_dict(cls, book_dict: dict, language=None):
+        """Creates a record from a book dictionary keyed by column name.
+
+        Parameters
+        ----------
+        book_dict : dict
+            Scraped data of the book.
+        language : str
+            Language of the book, used when book_dict has none.
+        """
+        return cls(book_dict["ID"], book_dict["Timestamp"], book_dict["Author"],
+            book_dict["Title"], book_dict.get("Language") or language,
+            book_dict["Price (£)"], book_dict["Image_link"])
+
+    def to_dict(self) -> dict:
+        """Converts the record back to a book dictionary keyed by column name.
+        """
+        return {
+            "ID" : self.isbn,
+            "Timestamp" : self.timestamp,
+            "Author" : self.author,
+            "Title" : self.title,
+            "Language" : None if self.language is None else str(self.language),
+            "Price (£)" : self.price,
+            "Image_link" : self.image_link,
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BookRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"BookRecord(isbn={self.isbn}, title={self.title!r}, price={self.price})"
+#%%
+class CategoryColumn:
+    """Column of repeated strings stored as integer codes into a list of
+    categories, so each distinct value is held only once.
+
+    Attributes
+    ----------
+    self.categories : list
+                Distinct values in order of first appearance.
+    self.codes : array.array
+                Index into self.categories for each row, -1 for missing values.
+    """
+    def __init__(self) -> None:
+        self.categories = []
+        self.codes = array("i")
+        self._lookup = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            self._lookup[value] = code
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def to_Categorical(self) -> pd.Categorical:
+        import numpy as np # imported when first needed, to keep startup fast
+        import pandas as pd
+
+        return pd.Categorical.from_codes(np.array(self.codes, dtype=np.int32),
+            categories=self.categories)
+#%%
+class BookRecordAccumulator:
+    """Accumulates scraped book records in typed columns and builds a single
+    DataFrame from them only when asked, instead of concatenating one-row
+    DataFrames per book. ID is stored as int64, price as float64, and author
+    and language as categoricals. Books may be added as dictionaries or as
+    BookRecord objects, and read back as either.
+
+    Attributes
+    ----------
+    self.ids : array.array
+                ISBN of each book.
+    self.prices : array.array
+                Price in GBP of each book.
+    self.authors : CategoryColumn
+                Author of each book.
+    self.languages : CategoryColumn
+                Language of each book.
+    """
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.timestamps = []
+        self.authors = CategoryColumn()
+        self.titles = []
+        self.languages = CategoryColumn()
+        self.prices = array("d")
+        self.image_links = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records):
+        """Bulk-loads an accumulator from BookRecord objects or dictionaries.
+
+        Parameters
+        ----------
+        records : iterable
+            Books to add.
+
+        Returns
+        -------
+        BookRecordAccumulator
+            Accumulator holding every book.
+        """
+        accumulator = cls()
+        accumulator.extend(records)
+
+        return accumulator
+
+    def append(self, book_dict, language=None):
+        """Adds one book to the columns.
+
+        Parameters
+        ----------
+        book_dict : dict or BookRecord
+            Scraped data of the book, keyed by column name.
+        language : str
+            Language of the book, used when book_dict has none.
+        """
+        if isinstance(book_dict, BookRecord):
+            self.ids.append(book_dict.isbn)
+            self.timestamps.append(book_dict.timestamp)
+            self.authors.append(book_dict.author)
+            self.titles.append(book_dict.title)
+            book_language = book_dict.language or language
+            self.languages.append(None if book_language is None else str(book_language))
+            self.prices.append(book_dict.price)
+            self.image_links.append(book_dict.image_link)
+            return
+        self.ids.append(int(book_dict["ID"]))
+        self.timestamps.append(_intern_text(book_dict["Timestamp"]))
+        self.authors.append(_intern_text(book_dict["Author"]))
+        self.titles.append(book_dict["Title"])
+        self.languages.append(_intern_text(book_dict.get("Language")) or language)
+        self.prices.append(float(book_dict["Price (£)"]))
+        self.image_links.append(book_dict["Image_link"])
+
+    def extend(self, book_dicts, language=None):
+        """Adds several books to the columns.
+
+        Parameters
+        ----------
+        book_dicts : iterable
+            Scraped data of each book, keyed by column name.
+        language : str
+            Language of the books, used when a book_dict has none.
+        """
+        for book_dict in book_dicts:
+            self.append(book_dict, language)
+
+    def records(self):
+        """Reads the accumulated books back as BookRecord objects.
+
+        Yields
+        ------
+        BookRecord
+            Record of each book, in the order added.
+        """
+        authors = self.authors.categories
+        languages = self.languages.categories
+        for i, isbn in enumerate(self.ids):
+            language_code = self.languages.codes[i]
+            yield BookRecord(isbn, self.timestamps[i], authors[self.authors.codes[i]],
+                self.titles[i], None if language_code < 0 else languages[language_code],
+                self.prices[i], self.image_links[i])
+
+    def to_DataFrame(self) -> pd.DataFrame:
+        """Builds a DataFrame of every record accumulated so far.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with one row per book and typed columns.
+        """
+        import numpy as np # imported when first needed, to keep startup fast
+        import pandas as pd
+
+        return pd.DataFrame({
+            "ID" : np.array(self.ids, dtype=np.int64),
+            "Timestamp" : pd.Series(self.timestamps, dtype=object),
+            "Author" : self.authors.to_Categorical(),
+            "Title" : pd.Series(self.titles, dtype=object),
+            "Language" : self.languages.to_Categorical(),
+            "Price (£)" : np.array(self.prices, dtype=np.float64),
+            "Image_link" : pd.Series(self.image_links, dtype=object),
+        }, columns=COLUMNS)
+
+    def to_Arrow(self):
+        """Builds a pyarrow Table of every record accumulated so far, with
+        author and language dictionary-encoded.
+
+        Returns
+        -------
+        pyarrow.Table
+            Table with one row per book and typed columns.
+        """
+        pa = import_pyarrow("Arrow output")
+        import numpy as np
+
+        def dictionary(column: CategoryColumn):
+            return pa.DictionaryArray.from_arrays(
+                pa.array(np.array(column.codes, dtype=np.int32), mask=np.array(column.codes) < 0),
+                pa.array(column.categories, type=pa.string()))
+
+        return pa.Table.from_arrays([
+            pa.array(np.array(self.ids, dtype=np.int64)),
+            pa.array(self.timestamps, type=pa.string()),
+            dictionary(self.authors),
+            pa.array(self.titles, type=pa.string()),
+            dictionary(self.languages),
+            pa.array(np.array(self.prices, dtype=np.float64)),
+            pa.array(self.image_links, type=pa.string()),
+        ], names=COLUMNS)
+#%%
@@ -0,0 +1,128 @@
+#%%
+import json
+import os
+import sqlite3
+import threading
+import time
+#%%
+def normalize_query(query: str) -> str:
+    """Normalises a search query so queries differing only in case or
+    spacing are the same, e.g. " Jose  SARAMAGO" becomes "jose_saramago".
+
+    Parameters
+    ----------
+    query : str
+        Search query as typed.
+
+    Returns
+    -------
+    str
+        Lower case query with words joined by underscores.
+    """
+    return "_".join(query.split()).lower()
+#%%
+class QueryResultsCache:
+    """Local on-disk index of the results of recent search queries. Each
+    normalised query maps to its language-filter links and, for every language,
+    the language's name and book links, with the time they were stored. A
+    query repeated within ttl seconds skips the whole search phase: the search,
+    the language filters, and the results pages. Safe to share between threads.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file, created if missing.
+    ttl : float
+        Seconds for which the results of a query are reused.
+
+    Attributes
+    ----------
+    self.stats : dict
+                Counts of hits, misses, expired entries, and stored queries.
+    """
+    def __init__(self, path: str, ttl=6 * 60 * 60) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.stats = {"hits" : 0, "misses" : 0, "expired" : 0, "stored" : 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # several worker processes of a batch may share the file
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get(self, query: str):
+        """Gets the results of a query stored less than self.ttl seconds ago.
+
+        Parameters
+        ----------
+        query : str
+            Search query, normalised with normalize_query before lookup.
+
+        Returns
+        -------
+        dict or None
+            "language_links", the list of language-filter links, and
+            "languages", the "language_name" and "book_links" of each
+            language-filter link, or None if the query has no fresh entry.
+        """
+        with self._lock:
+            entry = self._db.execute("SELECT results, stored_at FROM queries WHERE query = ?",
+                (normalize_query(query),)).fetchone()
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - entry[1] >= self.ttl:
+                self.stats["expired"] += 1
+                return None
+            self.stats["hits"] += 1
+
+        return json.loads(entry[0])
+
+    def put(self, query: str, language_links: list, languages: dict):
+        """Stores the results of a query, replacing any older entry.
+
+        Parameters
+        ----------
+        query : str
+            Search query, normalised with normalize_query.
+        language_links : list
+            Links of the language-filtered results pages, in page order.
+        languages : dict
+            Dictionary with the "language_name" and "book_links" of each
+            language-filter link.
+        """
+        results = json.dumps({"language_links" : list(language_links), "languages" : languages})
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                (normalize_query(query), results, time.time()))
+            self._db.commit()
+            self.stats["stored"] += 1
+
+    def invalidate(self, query: str):
+        """Removes the results of a query, so it is searched again.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM queries WHERE query = ?", (normalize_query(query),))
+            self._db.commit()
+
+    def close(self):
+        """Closes the database.
+        """
+        with self._lock:
+            self._db.close()
+#%%
@@ -1,79 +1,271 @@
 #%%
+from __future__ import annotations
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+from waterstones_drivers import HTTPPageDriver, get_driver_factory
+from waterstones_fetch_policy import FetchPolicy
+from waterstones_metrics import timed_stage
+from waterstones_page_parser import find_text_by_path, parse_book_page
+from waterstones_waits import AdaptiveWaiter, number_of_elements_greater_than
 import requests
 import time
 #%%
+# one WebDriver round trip returning everything needed to parse a page locally
+SNAPSHOT_SCRIPT = "return [document.documentElement.outerHTML, window.location.href];"
+NUMBER_OF_PAGES_XPATH = "/html/body/div[1]/div[3]/div[2]/div[1]/div[2]/div[1]/div/div/span[2]"
+#%%
 class WaterstonesScraper:
     """This class generates a web scraper to scrape key data from the
     popular bookseller Waterstone's website. This is a parent class which contains
-    generic methods not specific to a particular search query.
+    generic methods not specific to a particular search query. The driver is
+    created by a driver factory, so the same scraper runs in Chrome or Edge,
+    headed or headless, with the lean browser profile, or without a browser.
+    The driver is only started when it is first used, so scrapers which only
+    load or save data never launch a browser.
+
+    Parameters
+    ----------
+    backend : str or driver factory
+        Name of the driver backend, "edge" (default, a headed Microsoft Edge
+        browser), "headless", "lean", "chrome", or "http", or a
+        BrowserDriverFactory or HTTPDriverFactory.
+        See waterstones_drivers.
+    metrics : StageMetrics
+        Optional recorder of the count, latency, and bytes of each pipeline stage.
+    fetch_policy : FetchPolicy
+        Timeouts, retries, and circuit breaker applied to page loads and image
+        downloads. Defaults to a new FetchPolicy.
 
     Attributes
     ----------
-    self.driver : webdriver.Edge()
-                Instance of a Microsoft Edge webdriver.
+    self.driver_factory : BrowserDriverFactory or HTTPDriverFactory
+                Factory which created self.driver, and creates the drivers of
+                any workers.
+    self.driver : webdriver.Chrome(), webdriver.Edge() or HTTPPageDriver
+                Instance of a Chrome or Edge webdriver, or of the browser-free
+                HTTPPageDriver, started on first use.
+    self.launch_seconds : float or None
+                Seconds taken to start self.driver, or None if not started yet.
+    self.cookies_accepted : bool
+                True once the cookie banner has been accepted in self.driver.
     self.raw_data_path : str
                 File path to which scraped data will be saved.
+    self.base_url : str
+                Homepage loaded by load_page. Can be pointed at a local fixture
+                server for offline benchmarks.
+    self.waiter : AdaptiveWaiter
+                Event-driven wait layer which records how long each wait took.
+    self.http_cache : HTTPResponseCache
+                Optional on-disk cache used by download_img and by the pages
+                of an HTTPPageDriver. None by default.
+    self.metrics : StageMetrics
+                Recorder of stage timings, or None if not instrumented.
+    self.fetch_policy : FetchPolicy
+                Policy through which pages are loaded and images downloaded,
+                counting every failure for the run summary.
+    self.rate_limiter : HostRateLimiter or GlobalRateLimiter
+                Optional limiter whose wait method is called before page loads.
+                None by default.
+    self.page_fields : dict or None
+                Book fields parsed from a snapshot of the product page loaded by
+                load_book_page, read by the getter methods. None on other pages.
+    self.page_url : str
+                URL of the page the snapshot was taken of.
     """
-    def __init__(self) -> None:
-        try:
-            self.driver = webdriver.Edge()
-            self.raw_data_path = r"C:\Users\tutto\OneDrive\Documents\Documents\AiCore\Projects\ai_core_data_collection_pipeline\project_files\raw_data"
-        except:
-            print("Query must be a string.")
+    def __init__(self, backend="edge", metrics=None, fetch_policy=None) -> None:
+        self.driver_factory = get_driver_factory(backend)
+        self._driver = None
+        self._waiter = None
+        self.launch_seconds = None
+        self.cookies_accepted = False
+        
+        # self.raw_data_path = "project_files/raw_data" # for Docker
+        self.raw_data_path = "raw_data" # for local running
+        self.base_url = "https://www.waterstones.com/"
+        self.http_cache = None
+        self.rate_limiter = None
+        self.metrics = metrics
+        self.fetch_policy = FetchPolicy() if fetch_policy is None else fetch_policy
+        self.page_fields = None
+        self.page_url = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self.start_driver()
+
+        return self._driver
+
+    @property
+    def driver_started(self) -> bool:
+        return self._driver is not None
+
+    @property
+    def waiter(self) -> AdaptiveWaiter:
+        if self._waiter is None:
+            self._waiter = AdaptiveWaiter(self.driver)
+
+        return self._waiter
+
+    @timed_stage("launch_driver")
+    def start_driver(self):
+        """Starts the driver with self.driver_factory. Called on first use of
+        self.driver, usually the first navigation.
+
+        Returns
+        -------
+        webdriver.Chrome(), webdriver.Edge() or HTTPPageDriver
+            The started driver.
+        """
+        start = time.perf_counter()
+        driver = self.driver_factory.create()
+        driver.set_page_load_timeout(self.fetch_policy.page_load_timeout)
+        if isinstance(driver, HTTPPageDriver):
+            driver.cache = self.http_cache
+        self.launch_seconds = time.perf_counter() - start
+        self._driver = driver
+
+        return driver
+
+    def load_page(self) -> webdriver.Chrome:
+        """Loads the waterstones.com homepage, or self.base_url if changed.
+
+        Returns
+        -------
+        webdriver.Chrome()
+            Chrome webdriver on watersones.com homepage.
+        """
+        URL = self.base_url
+        self.throttle(URL)
+        self.get_page(URL, "load_page")
+
+        return self.driver
+    
+    def get_page(self, url: str, stage: str) -> webdriver.Chrome:
+        """Navigates the webdriver to url through self.fetch_policy, so page
+        load timeouts are retried with backoff and counted under stage.
+
+        Parameters
+        ----------
+        url : str
+            URL of the page.
+        stage : str
+            Stage under which failures are counted.
+
+        Returns
+        -------
+        webdriver.Chrome
+            Chrome webdriver.
+        """
+        self.page_fields = None
+        self.fetch_policy.call(stage, url, self.driver.get, url)
+
+        return self.driver
+    
+    def throttle(self, url: str):
+        """Waits for self.rate_limiter, if set, before a page is requested.
+
+        Parameters
+        ----------
+        url : str
+            URL about to be requested.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+    
+    @property
+    def uses_browser(self) -> bool:
+        """False for the "http" backend, whose pages are never rendered.
+        """
+        return self.driver_factory.uses_browser
+    
+    def take_snapshot(self) -> tuple:
+        """Gets the HTML and URL of the current page in a single WebDriver
+        round trip, so its fields can be parsed locally.
+
+        Returns
+        -------
+        tuple
+            HTML source of the page and its URL.
+        """
+        if not self.uses_browser:
+            return self.driver.page_source, self.driver.current_url
+        html, url = self.driver.execute_script(SNAPSHOT_SCRIPT)
 
-    def load_page(self) -> webdriver.Edge:
-        """Loads the waterstones.com homepage.
+        return html, url
+    
+    @timed_stage("load_book_page")
+    def load_book_page(self, book_link: str) -> webdriver.Chrome:
+        """Navigates the webdriver to a book's product page and parses every
+        book field from one snapshot of it into self.page_fields.
+
+        Parameters
+        ----------
+        book_link : str
+            URL of the product page.
 
         Returns
         -------
-        webdriver.Edge()
-            Edge webdriver on watersones.com homepage.
+        webdriver.Chrome
+            Chrome webdriver.
         """
-        URL = "https://www.waterstones.com/"
-        self.driver.get(URL)
+        self.get_page(book_link, "load_book_page")
+        html, self.page_url = self.take_snapshot()
+        self.page_fields = parse_book_page(html, self.page_url)
+        if self.metrics is not None:
+            self.metrics.add_bytes("load_book_page", len(html.encode("utf-8")))
 
         return self.driver
     
     def quit_browser(self):
-        """Quits the webdriver.
+        """Quits the webdriver, if it was started.
         """
-        self.driver.quit()
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+            self._waiter = None
+            self.cookies_accepted = False
     
-    def accept_cookies(self) -> webdriver.Edge:
-        """Accepts cookies on entry to the waterstones website.
+    def accept_cookies(self) -> webdriver.Chrome:
+        """Accepts cookies on entry to the waterstones website. Without a
+        browser there is no cookie banner, so there is nothing to do.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
+        if not self.uses_browser:
+            return self.driver
+        # imported when first needed, as it loads the whole remote webdriver
+        from selenium.webdriver.support import expected_conditions as EC
+
         delay = 10
         try:
-            WebDriverWait(self.driver, delay).until(EC.presence_of_element_located((By.XPATH, 
-                "//*[@id='onetrust-banner-sdk']")))
-            accept_cookies_button = self.driver.find_element(by=By.XPATH, 
-                value="//button[@id='onetrust-accept-btn-handler']")
+            accept_cookies_button = self.waiter.until(EC.element_to_be_clickable((By.XPATH, 
+                "//button[@id='onetrust-accept-btn-handler']")), "cookie_banner", delay)
             accept_cookies_button.click()
+            self.waiter.until(EC.invisibility_of_element_located((By.XPATH,
+                "//*[@id='onetrust-banner-sdk']")), "cookie_banner_closed", delay)
         except TimeoutException:
             print('Loading took too long.')
         
         return self.driver
     
-    def load_and_accept_cookies(self) -> webdriver.Edge:
-        """Loads the page and accepts cookies. 
+    @timed_stage("load_and_accept_cookies")
+    def load_and_accept_cookies(self) -> webdriver.Chrome:
+        """Loads the page and accepts cookies as soon as the cookie banner is
+        clickable.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
         self.load_page()
         self.accept_cookies()
+        self.cookies_accepted = True
 
         return self.driver
     
@@ -82,8 +274,8 @@ class WaterstonesScraper:
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
         self.driver.execute_script("document.getElementById('footer').scrollIntoView();")
 
@@ -94,8 +286,8 @@ class WaterstonesScraper:
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
         """
         show_more = self.driver.find_element(by=By.XPATH, 
             value="//button[@class='button button-teal']")
@@ -104,59 +296,103 @@ class WaterstonesScraper:
 
         return self.driver
     
+    def get_number_of_pages(self) -> int:
+        """Reads the number of pages of results from the current results page.
+
+        Returns
+        -------
+        int
+            Number of pages of results.
+        """
+        if not self.uses_browser:
+            number_of_pages_text = find_text_by_path(self.driver.page_source, NUMBER_OF_PAGES_XPATH)
+            if number_of_pages_text is None:
+                raise NoSuchElementException("No number of pages on the page.")
+            return int(number_of_pages_text.replace('of', ''))
+        number_of_pages = self.driver.find_element(by=By.XPATH, value=NUMBER_OF_PAGES_XPATH)
+        number_of_pages_text = number_of_pages.text
+        number_of_pages_text = number_of_pages_text.replace('of', '')
+
+        return int(number_of_pages_text)
+    
+    @timed_stage("display_all_results")
     def display_all_results(self):
         """Scrolls down to load all pages of results of a query if there is more 
-        than one page.
+        than one page. After each click of the show more button, waits only until
+        more results have loaded or the button has gone, and stops as soon as
+        there is no show more button left. Needs a browser.
 
         Returns
         -------
-        webdriver.Edge
-            Edge webdriver.
+        webdriver.Chrome
+            Chrome webdriver.
+
+        Raises
+        ------
+        RuntimeError
+            If the scraper uses a backend without a browser, such as http.
         """
+        if not self.uses_browser:
+            raise RuntimeError(f"display_all_results clicks the show more button, which needs "
+                f"a browser backend, not {self.driver_factory!r}; results pages are "
+                f"fetched by their page-number URLs instead.")
+        from selenium.webdriver.support import expected_conditions as EC
+
+        results = (By.XPATH, "//div[@class='search-results-list']/div")
+        show_more = (By.XPATH, "//button[@class='button button-teal']")
         try:
-            number_of_pages = self.driver.find_element(by=By.XPATH, 
-                value="/html/body/div[1]/div[3]/div[2]/div[1]/div[2]/div[1]/div/div/span[2]")
-            number_of_pages_text = number_of_pages.text
-            number_of_pages_text = number_of_pages_text.replace('of', '')
-            number_of_pages_integer = int(number_of_pages_text)
+            number_of_pages_integer = self.get_number_of_pages()
             print(f"Number of pages is {number_of_pages_integer}.")
             page_counter = 0
             while page_counter <= number_of_pages_integer:
+                buttons = self.driver.find_elements(*show_more)
+                if not buttons or not buttons[0].is_displayed():
+                    break
+                number_of_results = len(self.driver.find_elements(*results))
                 self.scroll_to_bottom()
                 self.click_show_more()
-                time.sleep(2) # wait for next page of results to load
+                self.waiter.until(EC.any_of(
+                    number_of_elements_greater_than(results, number_of_results),
+                    EC.invisibility_of_element_located(show_more)), "show_more")
                 page_counter += 1
-        except NoSuchElementException:
+        except (NoSuchElementException, TimeoutException):
             pass
 
         return self.driver
     
+    @timed_stage("get_author")
     def get_author(self) -> str:
-        """Srapes the author's name.
+        """Srapes the author's name, from the page snapshot if there is one.
 
         Returns
         -------
         str
             Name of the author.
         """
+        if self.page_fields is not None and "author" in self.page_fields:
+            return self.page_fields["author"]
         author = self.driver.find_element(by=By.XPATH, 
             value="//span[@itemprop='author']").text
 
         return author
 
+    @timed_stage("get_title")
     def get_title(self) -> str:
-        """Srapes the book title.
+        """Srapes the book title, from the page snapshot if there is one.
 
         Returns
         -------
         str
             Title of the book.
         """
+        if self.page_fields is not None and "title" in self.page_fields:
+            return self.page_fields["title"]
         title = self.driver.find_element(by=By.XPATH, 
             value="//span[@class='book-title']").text
 
         return title
 
+    @timed_stage("get_ISBN")
     def get_ISBN(self) -> int:
         """Scrapes ISBN (International Standard Book Number), a unique product identifier
         used by publishers and booksellers. The ISBN identifies the specific title,
@@ -167,38 +403,48 @@ class WaterstonesScraper:
         int
             ISBN number.
         """
+        if self.page_fields is not None:
+            return int(self.page_url[-13:])
         isbn = self.driver.current_url[-13:]
 
         return int(isbn)
     
+    @timed_stage("get_price")
     def get_price(self) -> float:
-        """Scrapes price in GBP.
+        """Scrapes price in GBP, from the page snapshot if there is one.
 
         Returns
         -------
         float
             Item price.
         """
-        price = self.driver.find_element(by=By.XPATH,
-            value="//b[@itemprop='price']").text
+        if self.page_fields is not None and "price" in self.page_fields:
+            price = self.page_fields["price"]
+        else:
+            price = self.driver.find_element(by=By.XPATH,
+                value="//b[@itemprop='price']").text
         price = price.strip('£')
 
         return float(price)
     
+    @timed_stage("get_image_link")
     def get_image_link(self) -> str:
-        """Scrapes links for book images.
+        """Scrapes links for book images, from the page snapshot if there is one.
 
         Returns
         -------
         str
             Source of image link.
         """
+        if self.page_fields is not None and "image" in self.page_fields:
+            return self.page_fields["image"]
         img = self.driver.find_element(by=By.XPATH,
             value="//img[@itemprop='image']")
         img_src = img.get_attribute("src")
 
         return img_src
     
+    @timed_stage("download_img")
     def download_img(self, img_url: str, file_path: str):
         """Downloads image to current directory.
 
@@ -209,7 +455,17 @@ class WaterstonesScraper:
         file_path : str
             File path of location where the image is to be saved.
         """
-        img_data = requests.get(img_url).content
+        timeout = self.fetch_policy.timeout
+        if self.http_cache is not None:
+            response = self.fetch_policy.call("download_img", img_url,
+                self.http_cache.get, requests, img_url, timeout=timeout)
+        else:
+            response = self.fetch_policy.call("download_img", img_url,
+                requests.get, img_url, timeout=timeout)
+        response.raise_for_status()
+        img_data = response.content
         with open(file_path, "wb") as handler:
             handler.write(img_data)
-#%%
\ No newline at end of file
+        if self.metrics is not None:
+            self.metrics.add_bytes("download_img", len(img_data))
+#%%
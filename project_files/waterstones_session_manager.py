@@ -0,0 +1,152 @@
+#%%
+from contextlib import contextmanager
+from selenium.common.exceptions import WebDriverException
+import queue
+import threading
+#%%
+class DriverSessionPool:
+    """Pool of warm scrapers shared across search queries, so Chrome is
+    started and the cookie banner dismissed once per scraper rather than once
+    per query. Each browser is only started by the first search which misses
+    the results cache, so queries served from the cache never launch one.
+    Scrapers are health-checked and reset when acquired, restarted if their
+    browser has crashed, and all quit when the pool closes. Safe to use from
+    several threads.
+
+    Parameters
+    ----------
+    scraper_factory : callable
+        Called with scraper_kwargs to create a new scraper, e.g. the
+        QueryWaterstones class.
+    size : int
+        Maximum number of scrapers, and so of browsers, in the pool.
+    **scraper_kwargs
+        Keyword arguments passed to scraper_factory.
+
+    Attributes
+    ----------
+    self.scrapers : list
+                Every live scraper created by the pool.
+    self.restarts : int
+                Number of scrapers replaced because their browser had crashed.
+    """
+    def __init__(self, scraper_factory, size=1, **scraper_kwargs) -> None:
+        self.scraper_factory = scraper_factory
+        self.size = size
+        self.scraper_kwargs = scraper_kwargs
+        self.scrapers = []
+        self.restarts = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._starting = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start_scraper(self):
+        scraper = self.scraper_factory(**self.scraper_kwargs)
+        with self._lock:
+            self.scrapers.append(scraper)
+
+        return scraper
+
+    def _discard_scraper(self, scraper):
+        with self._lock:
+            if scraper in self.scrapers:
+                self.scrapers.remove(scraper)
+        try:
+            scraper.quit_browser()
+        except WebDriverException:
+            pass # the browser has already gone
+
+    @staticmethod
+    def is_alive(scraper) -> bool:
+        """Checks the scraper's browser still responds.
+
+        Parameters
+        ----------
+        scraper : QueryWaterstones
+            Scraper to check.
+
+        Returns
+        -------
+        bool
+            False if the webdriver raises on a trivial command. A scraper whose
+            browser has not been started yet is alive.
+        """
+        if not getattr(scraper, "driver_started", True):
+            return True
+        try:
+            scraper.driver.current_url
+        except WebDriverException:
+            return False
+
+        return True
+
+    def _take_scraper(self):
+        if self._closed:
+            raise RuntimeError("DriverSessionPool is closed.")
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_start = len(self.scrapers) + self._starting < self.size
+                if can_start:
+                    self._starting += 1
+            if can_start:
+                try:
+                    return self._start_scraper()
+                finally:
+                    with self._lock:
+                        self._starting -= 1
+            try:
+                # wake up periodically in case a busy scraper was discarded
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                pass
+
+    @contextmanager
+    def acquire(self):
+        """Lends a warm scraper from the pool, ready for a new search.
+
+        Yields
+        ------
+        QueryWaterstones
+            Scraper with no state left from a previous query. Its search loads
+            the homepage, accepting cookies the first time, unless the query
+            is served from the results cache.
+        """
+        scraper = self._take_scraper()
+        if not self.is_alive(scraper):
+            self._discard_scraper(scraper)
+            self.restarts += 1
+            scraper = self._start_scraper()
+        scraper.reset_query_state()
+        broken = False
+        try:
+            yield scraper
+        except WebDriverException:
+            # the browser may be in an unknown state, so do not reuse it
+            broken = True
+            raise
+        finally:
+            if broken or self._closed:
+                self._discard_scraper(scraper)
+            else:
+                self._idle.put(scraper)
+
+    def close(self):
+        """Quits every scraper in the pool.
+        """
+        self._closed = True
+        with self._lock:
+            scrapers = list(self.scrapers)
+        for scraper in scrapers:
+            self._discard_scraper(scraper)
+#%%
@@ -0,0 +1,150 @@
+#%%
+import pandas as pd
+import sqlite3
+import time
+#%%
+class SQLiteBookStore:
+    """Optional storage backend which upserts scraped books into one local SQLite
+    database instead of a .csv file per query, so questions spanning authors
+    become indexed queries. The books table is keyed on ISBN and indexed on
+    author, language, and price, and every upsert is logged with its query and
+    timestamp in the scrape_history table.
+
+    Parameters
+    ----------
+    path : str
+        Path of the database file, created if missing.
+    batch_size : int
+        Number of rows inserted per transaction.
+    """
+    def __init__(self, path: str, batch_size=1000) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS books (
+                isbn INTEGER PRIMARY KEY,
+                author TEXT,
+                title TEXT,
+                language TEXT,
+                price REAL,
+                image_link TEXT,
+                scraped_at TEXT,
+                query TEXT
+            );
+            CREATE INDEX IF NOT EXISTS books_author ON books (author);
+            CREATE INDEX IF NOT EXISTS books_language_price ON books (language, price);
+            CREATE INDEX IF NOT EXISTS books_price ON books (price);
+            CREATE TABLE IF NOT EXISTS scrape_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                isbn INTEGER NOT NULL,
+                query TEXT,
+                price REAL,
+                scraped_at TEXT,
+                stored_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scrape_history_isbn ON scrape_history (isbn);
+            """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def upsert_DataFrame(self, df: pd.DataFrame, query=None) -> int:
+        """Inserts or updates one row per book, in batched transactions.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            DataFrame with the columns of language_filtered_DataFrame.
+        query : str
+            Search query the books were scraped for.
+
+        Returns
+        -------
+        int
+            Number of rows upserted.
+        """
+        stored_at = time.time()
+        rows = [(int(isbn), author, title, None if pd.isna(language) else str(language),
+            float(price), image_link, timestamp, query)
+            for isbn, timestamp, author, title, language, price, image_link in zip(
+            df["ID"], df["Timestamp"], df["Author"], df["Title"], df["Language"],
+            df["Price (£)"], df["Image_link"])]
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            with self.connection:
+                self.connection.executemany("""
+                    INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (isbn) DO UPDATE SET
+                        author = excluded.author,
+                        title = excluded.title,
+                        language = COALESCE(excluded.language, books.language),
+                        price = excluded.price,
+                        image_link = excluded.image_link,
+                        scraped_at = excluded.scraped_at,
+                        query = excluded.query""", batch)
+                self.connection.executemany("""
+                    INSERT INTO scrape_history (isbn, query, price, scraped_at, stored_at)
+                    VALUES (?, ?, ?, ?, ?)""",
+                    [(row[0], query, row[4], row[6], stored_at) for row in batch])
+
+        return len(rows)
+
+    def find_books(self, author=None, language=None, max_price=None) -> pd.DataFrame:
+        """Looks up books using the indexes of the books table.
+
+        Parameters
+        ----------
+        author : str
+            Only books by this author.
+        language : str
+            Only books in this language.
+        max_price : float
+            Only books costing at most this much, in GBP.
+
+        Returns
+        -------
+        pd.DataFrame
+            Matching books, cheapest first.
+        """
+        conditions = []
+        parameters = []
+        if author is not None:
+            conditions.append("author = ?")
+            parameters.append(author)
+        if language is not None:
+            conditions.append("language = ?")
+            parameters.append(language)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            parameters.append(max_price)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        return pd.read_sql_query(f"SELECT * FROM books {where} ORDER BY price",
+            self.connection, params=parameters)
+
+    def price_history(self, isbn: int) -> pd.DataFrame:
+        """Lists every stored scrape of one book.
+
+        Parameters
+        ----------
+        isbn : int
+            ISBN of the book.
+
+        Returns
+        -------
+        pd.DataFrame
+            Scrape history of the book, oldest first.
+        """
+        return pd.read_sql_query("""SELECT query, price, scraped_at, stored_at
+            FROM scrape_history WHERE isbn = ? ORDER BY id""", self.connection, params=[isbn])
+
+    def close(self):
+        """Closes the database connection.
+        """
+        self.connection.close()
+#%%
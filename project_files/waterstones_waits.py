@@ -0,0 +1,112 @@
+#%%
+import time
+#%%
+class number_of_elements_greater_than:
+    """Expected condition for WebDriverWait which is met once more than count
+    elements match locator.
+
+    Parameters
+    ----------
+    locator : tuple
+        (By, value) locator of the elements to count.
+    count : int
+        Number of elements which must be exceeded.
+    """
+    def __init__(self, locator: tuple, count: int) -> None:
+        self.locator = locator
+        self.count = count
+
+    def __call__(self, driver):
+        elements = driver.find_elements(*self.locator)
+        if len(elements) > self.count:
+            return elements
+
+        return False
+#%%
+class AdaptiveWaiter:
+    """Wait layer built on WebDriverWait which returns as soon as an expected
+    condition is met instead of sleeping for a fixed time, and records how long
+    each wait actually took.
+
+    Parameters
+    ----------
+    driver : webdriver.Chrome
+        Webdriver to wait on.
+    timeout : float
+        Default maximum wait in seconds.
+    poll_frequency : float
+        Seconds between checks of the condition.
+
+    Attributes
+    ----------
+    self.wait_times : list
+                One dict per wait with its name, duration in seconds, and whether
+                the condition was met before the timeout.
+    """
+    def __init__(self, driver, timeout=10, poll_frequency=0.1) -> None:
+        self.driver = driver
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+        self.wait_times = []
+
+    def until(self, condition, name: str, timeout=None):
+        """Waits until condition is met.
+
+        Parameters
+        ----------
+        condition : callable
+            Expected condition, called with the webdriver.
+        name : str
+            Name under which the wait time is recorded.
+        timeout : float
+            Maximum wait in seconds. Defaults to self.timeout.
+
+        Returns
+        -------
+        object
+            Truthy value returned by the condition.
+
+        Raises
+        ------
+        TimeoutException
+            If the condition is not met before the timeout.
+        """
+        # imported when first needed, as it loads the whole remote webdriver
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        met = False
+        try:
+            result = WebDriverWait(self.driver, timeout,
+                poll_frequency=self.poll_frequency).until(condition)
+            met = True
+        finally:
+            self.wait_times.append({
+                "name" : name,
+                "seconds" : time.perf_counter() - start,
+                "met" : met,
+            })
+
+        return result
+
+    def summary(self) -> dict:
+        """Totals the recorded waits by name.
+
+        Returns
+        -------
+        dict
+            For each wait name, the number of waits, number of timeouts, and
+            total and maximum seconds waited.
+        """
+        summary = {}
+        for wait in self.wait_times:
+            totals = summary.setdefault(wait["name"],
+                {"count" : 0, "timeouts" : 0, "total_seconds" : 0.0, "max_seconds" : 0.0})
+            totals["count"] += 1
+            totals["timeouts"] += not wait["met"]
+            totals["total_seconds"] += wait["seconds"]
+            totals["max_seconds"] = max(totals["max_seconds"], wait["seconds"])
+
+        return summary
+#%%
@@ -0,0 +1,247 @@
+#%%
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import queue
+import threading
+import time
+#%%
+class StreamClosed(Exception):
+    """Raised in a task of BookPageWorkerPool.imap_streams when the caller has
+    stopped iterating, so the task stops producing results.
+    """
+#%%
+class HostRateLimiter:
+    """Spaces out requests to the same host so that no host receives more than
+    a given number of requests per second. Safe to share between threads.
+
+    Parameters
+    ----------
+    requests_per_second : float
+        Maximum request rate per host. None (default) disables rate limiting.
+    """
+    def __init__(self, requests_per_second=None) -> None:
+        self.min_interval = 1 / requests_per_second if requests_per_second else 0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str) -> float:
+        """Blocks until a request to the host of url is allowed.
+
+        Parameters
+        ----------
+        url : str
+            URL about to be requested.
+
+        Returns
+        -------
+        float
+            Time spent waiting in seconds.
+        """
+        if not self.min_interval:
+            return 0
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+        return max(delay, 0)
+#%%
+class BookPageWorkerPool:
+    """Pool of worker threads which split a list of book links between them.
+    Each worker owns one scraper (a webdriver or an HTTP session) created by
+    scraper_factory, so scrapers are never shared between threads.
+
+    Parameters
+    ----------
+    scraper_factory : callable
+        Called with no arguments to create the scraper for each worker.
+    n_workers : int
+        Number of workers, and so of scrapers, in the pool.
+    max_per_host : int
+        Maximum number of requests in flight to the same host. None (default)
+        allows one per worker.
+    requests_per_second : float
+        Maximum request rate per host. None (default) disables rate limiting.
+
+    Attributes
+    ----------
+    self.scrapers : list
+                Scrapers created so far, one per worker thread.
+    """
+    def __init__(self, scraper_factory, n_workers=4, max_per_host=None,
+            requests_per_second=None) -> None:
+        self.scraper_factory = scraper_factory
+        self.n_workers = n_workers
+        self.max_per_host = max_per_host or n_workers
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.scrapers = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._host_semaphores = {}
+        self._executor = ThreadPoolExecutor(max_workers=n_workers,
+            thread_name_prefix="book-worker")
+
+    def _get_scraper(self):
+        scraper = getattr(self._local, "scraper", None)
+        if scraper is None:
+            scraper = self.scraper_factory()
+            self._local.scraper = scraper
+            with self._lock:
+                self.scrapers.append(scraper)
+
+        return scraper
+
+    def _get_host_semaphore(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+
+            return self._host_semaphores[host]
+
+    def _run_task(self, task, book_link: str):
+        scraper = self._get_scraper()
+        with self._get_host_semaphore(book_link):
+            self.rate_limiter.wait(book_link)
+            return task(scraper, book_link)
+
+    def map(self, task, book_links: list) -> list:
+        """Runs task(scraper, book_link) for every link across the workers.
+
+        Parameters
+        ----------
+        task : callable
+            Function called with a worker's scraper and one book link.
+        book_links : list
+            Links to be split between the workers.
+
+        Returns
+        -------
+        list
+            Results of task, in the same order as book_links.
+        """
+        futures = [self._executor.submit(self._run_task, task, book_link)
+            for book_link in book_links]
+
+        return [future.result() for future in futures]
+
+    def imap(self, task, book_links, window=None):
+        """Lazily runs task(scraper, book_link) for every link across the
+        workers, keeping at most window tasks submitted ahead of the caller, so
+        memory stays bounded however many links there are. Links are only
+        taken from book_links as the window frees up, and tasks not yet started
+        are cancelled if the caller stops iterating.
+
+        Parameters
+        ----------
+        task : callable
+            Function called with a worker's scraper and one book link.
+        book_links : iterable
+            Links to be split between the workers.
+        window : int
+            Maximum number of tasks submitted but not yet yielded. Defaults to
+            twice the number of workers.
+
+        Yields
+        ------
+        tuple
+            Each book link and the result of its task, in the same order as
+            book_links.
+        """
+        window = window or 2 * self.n_workers
+        pending = deque()
+        try:
+            for book_link in book_links:
+                pending.append((book_link, self._executor.submit(self._run_task, task, book_link)))
+                if len(pending) >= window:
+                    book_link, future = pending.popleft()
+                    yield book_link, future.result()
+            while pending:
+                book_link, future = pending.popleft()
+                yield book_link, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def imap_streams(self, task, links, window=None, buffer_size=64):
+        """Like imap, for tasks which each produce many results, such as every
+        book of a language-filter page. task(scraper, link, put) calls put with
+        each result as soon as it is ready, and the results are yielded in the
+        order of links. Each task passes its results through a queue of at most
+        buffer_size items, so a task running ahead of the caller waits rather
+        than holding all of its results, and memory stays bounded. If the
+        caller stops iterating, put raises StreamClosed in the running tasks.
+
+        Parameters
+        ----------
+        task : callable
+            Function called with a worker's scraper, one link, and put.
+        links : iterable
+            Links to be split between the workers.
+        window : int
+            Maximum number of tasks submitted but not yet fully yielded.
+            Defaults to the number of workers.
+        buffer_size : int
+            Maximum number of results each task holds before they are yielded.
+
+        Yields
+        ------
+        tuple
+            Each link and one result of its task, in the order of links and
+            of the task's calls to put.
+        """
+        window = window or self.n_workers
+        stopped = threading.Event()
+        finished = object()
+
+        def run(link, results):
+            def put(result):
+                while not stopped.is_set():
+                    try:
+                        results.put(result, timeout=0.1)
+                        return
+                    except queue.Full:
+                        pass
+                raise StreamClosed()
+
+            try:
+                self._run_task(lambda scraper, link: task(scraper, link, put), link)
+            finally:
+                if not stopped.is_set():
+                    put(finished)
+
+        def drain(link, results, future):
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                yield link, result
+            future.result() # raises any error of the task
+
+        pending = deque()
+        try:
+            for link in links:
+                results = queue.Queue(maxsize=buffer_size)
+                pending.append((link, results, self._executor.submit(run, link, results)))
+                if len(pending) >= window:
+                    yield from drain(*pending.popleft())
+            while pending:
+                yield from drain(*pending.popleft())
+        finally:
+            stopped.set()
+            for _, _, future in pending:
+                future.cancel()
+
+    def close(self):
+        """Waits for running tasks, then quits every scraper in the pool.
+        """
+        self._executor.shutdown(wait=True)
+        for scraper in self.scrapers:
+            scraper.quit_browser()
+        self.scrapers = []
+#%%
@@ -0,0 +1,58 @@
+#%%
+from unittest import TestCase
+from waterstones_batch_runner import GlobalRateLimiter, read_author_list, run_batch
+import io
+import os
+import tempfile
+import time
+import unittest
+#%%
+def flaky_scrape(author):
+    """Fails the first attempt of "flaky author" and always fails "bad author",
+    using a marker file to remember attempts across worker processes.
+    """
+    if author == "bad author":
+        raise RuntimeError("no results")
+    if author == "flaky author":
+        marker = os.path.join(os.environ["BATCH_TEST_DIR"], "flaky")
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            raise RuntimeError("chrome crashed")
+    return {"rows" : len(author)}
+#%%
+class BatchRunnerTestCase(TestCase):
+    """Test class to test the batch runner without a browser.
+    """
+    def test_read_author_list(self):
+        """Tests blank lines, comments, and duplicates are dropped.
+        """
+        handler = io.StringIO("jose saramago\n\n# comment\nisabel allende # chile\njose saramago\n")
+        self.assertEqual(read_author_list(handler), ["jose saramago", "isabel allende"])
+
+    def test_run_batch_with_retries(self):
+        """Tests every author runs in the pool, a transient failure is retried,
+        and a permanent failure is reported in the summary.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["BATCH_TEST_DIR"] = tmp
+            authors = ["jose saramago", "flaky author", "bad author"]
+            summary = run_batch(authors, processes=2, retries=1, backoff=0.01,
+                scrape_function=flaky_scrape)
+        self.assertEqual(summary["succeeded"], 2)
+        self.assertEqual(summary["failed"], ["bad author"])
+        self.assertEqual([result["author"] for result in summary["per_author"]], authors)
+        flaky = summary["per_author"][1]
+        self.assertEqual((flaky["status"], flaky["attempts"], flaky["rows"]), ("ok", 2, 12))
+        self.assertEqual(summary["per_author"][2]["attempts"], 2)
+
+    def test_global_rate_limiter(self):
+        """Tests requests are spaced by the global interval.
+        """
+        limiter = GlobalRateLimiter(requests_per_second=50)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 50 - 0.005)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,143 @@
+#%%
+from unittest import TestCase
+from waterstones_benchmark import (BASELINE_PATH, baseline_key, compare_reports,
+    compare_to_baseline, main, run_benchmark)
+from waterstones_fixture_server import FixtureServer
+from waterstones_http_scraper import WaterstonesHTTPScraper
+import copy
+import json
+import os
+import requests
+import tempfile
+import unittest
+#%%
+class FixtureServerTestCase(TestCase):
+    """Test class to test the FixtureServer replays the recorded catalogue.
+    """
+    def setUp(self) -> None:
+        self.server = FixtureServer()
+        self.server.start()
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+        return super().tearDown()
+
+    def test_product_page(self):
+        """Tests a product page parses to its recorded book and its cover is served.
+        """
+        book = self.server.catalogue["books"][0]
+        scraper = WaterstonesHTTPScraper()
+        scraper.load_book_page(self.server.book_link(book))
+        self.assertEqual(scraper.get_ISBN(), book["isbn"])
+        self.assertEqual(scraper.get_title(), book["title"])
+        self.assertEqual(scraper.get_price(), book["price"])
+        response = scraper.session.get(scraper.get_image_link())
+        scraper.quit_browser()
+        self.assertEqual(response.headers["Content-Type"], "image/jpeg")
+        self.assertEqual(self.server.requests["image"], 1)
+
+    def test_language_page(self):
+        """Tests a language-filtered page links only its first page of results
+        and names its language where get_language_name looks for it.
+        """
+        language = self.server.languages()[0]
+        html = requests.get(self.server.language_link(self.server.catalogue["query"], language)).text
+        self.assertIn(f"<span>{language}</span>", html)
+        self.assertEqual(html.count('class="book-preview"'), self.server.catalogue["results_per_page"])
+        self.assertEqual(requests.get(f"{self.server.base_url}/missing").status_code, 404)
+#%%
+class BenchmarkTestCase(TestCase):
+    """Test class to test the browser-free benchmark and its baseline comparison.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.report = run_benchmark(profile="http", n_workers=2)
+
+        return super().setUpClass()
+
+    def test_report(self):
+        """Tests every recorded book is scraped correctly and each page and
+        image is fetched once.
+        """
+        self.assertEqual(self.report["mismatches"], [])
+        self.assertEqual(self.report["rows"], 116)
+        self.assertEqual(self.report["pages"], 116)
+        self.assertEqual(self.report["images"], 116)
+        self.assertGreater(self.report["peak_rss_mb"], 0)
+        self.assertEqual(self.report["scrape_requests"], {"page" : 116})
+        self.assertGreater(self.report["scrape_bytes"], 0)
+        self.assertIn("load_book_page", self.report["stages"])
+
+    def test_compare_to_baseline(self):
+        """Tests a report matches itself and a slower report is a regression.
+        """
+        self.assertEqual(compare_to_baseline(self.report, self.report), [])
+        slower = copy.deepcopy(self.report)
+        slower["pages_per_second"] /= 2
+        slower["stages"]["load_book_page"] = self.report["stages"]["load_book_page"] * 2 + 1
+        regressions = compare_to_baseline(slower, self.report)
+        self.assertEqual(len(regressions), 2)
+
+    def test_compare_reports(self):
+        """Tests the comparison of two profiles gives the ratio of each metric.
+        """
+        lean = copy.deepcopy(self.report)
+        lean["scrape_bytes"] = self.report["scrape_bytes"] / 4
+        comparison = compare_reports(self.report, lean)
+        self.assertAlmostEqual(comparison["scrape_bytes"]["ratio"], 0.25)
+        self.assertAlmostEqual(comparison["stage load_book_page"]["ratio"], 1.0)
+
+    def test_missing_baseline(self):
+        """Tests a run without a stored baseline fails until one is stored.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_path = os.path.join(tmp, "baseline.json")
+            argv = ["--profile", "http", "--baseline", baseline_path]
+            self.assertEqual(main(argv), 1)
+            self.assertEqual(main(argv + ["--update-baseline"]), 0)
+            with open(baseline_path, encoding="utf-8") as handler:
+                self.assertIn("http-http-1_workers-0.0s_latency", json.load(handler))
+
+    def test_default_baselines(self):
+        """Tests the stored baselines cover the browser-free default runs.
+        """
+        with open(BASELINE_PATH, encoding="utf-8") as handler:
+            baselines = json.load(handler)
+        defaults = [{"profile" : "http", "backend" : None, "detail_backend" : "http"},
+            {"profile" : "pipeline", "backend" : "http", "detail_backend" : "selenium"},
+            {"profile" : "pipeline", "backend" : "http", "detail_backend" : "http"}]
+        for report in defaults:
+            report.update(n_workers=1, latency=0.0)
+            self.assertIn(baseline_key(report), baselines)
+#%%
+class PipelineBenchmarkTestCase(TestCase):
+    """Test class to run the whole QueryWaterstones flow with the browser-free
+    http driver backend.
+    """
+    def test_http_backend(self):
+        """Tests searching, language filtering, and results pages work without
+        a browser, giving every recorded book in its language.
+        """
+        report = run_benchmark(profile="pipeline", backend="http", show_more_delay=0.0)
+        self.assertEqual(report["mismatches"], [])
+        self.assertEqual(report["rows"], 116)
+        self.assertEqual(report["backend"], "http")
+        self.assertIn("search", report["stages"])
+
+    def test_language_workers(self):
+        """Tests language filters scraped concurrently give every recorded book
+        once, each with its own language.
+        """
+        report = run_benchmark(profile="pipeline", backend="http", show_more_delay=0.0,
+            n_language_workers=3)
+        self.assertEqual(report["mismatches"], [])
+        self.assertEqual(report["rows"], 116)
+        self.assertEqual(report["n_language_workers"], 3)
+        # each worker loads the homepage once to accept cookies
+        self.assertLessEqual(report["pages"], 127 + 3)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,61 @@
+#%%
+from unittest import TestCase
+from waterstones_delta import IncrementalScrape
+import os
+import pandas as pd
+import tempfile
+import time
+import unittest
+#%%
+class IncrementalScrapeTestCase(TestCase):
+    """Test class to test the IncrementalScrape class.
+    """
+    def setUp(self) -> None:
+        """Writes a previous output in the format of save_df_as_csv, with one
+        fresh row and one row old enough to be refreshed.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "jose_saramago.csv")
+        pd.DataFrame({
+            "ID" : [9780099573586, 9782020403436],
+            "Timestamp" : [time.ctime(), time.ctime(time.time() - 3 * 24 * 60 * 60)],
+            "Author" : ["Jose Saramago", "Jose Saramago"],
+            "Title" : ["Blindness", "L'aveuglement"],
+            "Language" : ["English", "French"],
+            "Price (£)" : [10.99, 12.5],
+            "Image_link" : ["https://example.com/a.jpg", "https://example.com/b.jpg"],
+        }).to_csv(self.csv_path)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_plan_and_changelog(self):
+        """Tests known ISBNs are refreshed only when stale, and the changelog
+        lists added, removed, and repriced books.
+        """
+        delta = IncrementalScrape(self.csv_path, refresh_interval=24 * 60 * 60)
+        fresh = delta.previous_row("https://example.com/book/blindness/9780099573586")
+        stale = delta.previous_row("https://example.com/book/laveuglement/9782020403436")
+        self.assertIsNone(delta.previous_row("https://example.com/book/new/9788490628720"))
+        self.assertFalse(delta.is_due_for_refresh(fresh))
+        self.assertTrue(delta.is_due_for_refresh(stale))
+
+        delta.observe(dict(stale, **{"Price (£)" : 9.99}))
+        delta.observe({"ID" : 9788490628720, "Timestamp" : time.ctime(), "Author" : "Jose Saramago",
+            "Title" : "Ensaio", "Language" : "Portuguese", "Price (£)" : 8.0,
+            "Image_link" : "https://example.com/c.jpg"})
+        changelog_path = os.path.join(self.tmp.name, "changelog.csv")
+        self.assertEqual(delta.write_changelog(changelog_path), 3)
+        changelog = pd.read_csv(changelog_path)
+        changes = dict(zip(changelog["Change"], changelog["ID"]))
+        self.assertEqual(changes, {"added" : 9788490628720, "removed" : 9780099573586,
+            "repriced" : 9782020403436})
+        repriced = changelog[changelog["Change"] == "repriced"].iloc[0]
+        self.assertEqual((repriced["Old price (£)"], repriced["New price (£)"]), (12.5, 9.99))
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
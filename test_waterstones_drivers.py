@@ -0,0 +1,84 @@
+#%%
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.chrome.options import Options
+from unittest import TestCase
+from waterstones_drivers import (BrowserDriverFactory, DRIVER_BACKENDS, HTTPDriverFactory,
+    LEAN_PREFS, get_driver_factory, lean_chrome_options)
+from waterstones_fixture_server import FixtureServer
+from waterstones_scraper_class import WaterstonesScraper
+import tempfile
+import unittest
+#%%
+class LeanProfileTestCase(TestCase):
+    """Test class to test the Chrome options of the lean browser profile,
+    without starting Chrome.
+    """
+    def test_lean_chrome_options(self):
+        """Tests images are disabled, pages load eagerly, and extensions are off.
+        """
+        options = lean_chrome_options(Options())
+        self.assertEqual(options.page_load_strategy, "eager")
+        self.assertEqual(options.experimental_options["prefs"], LEAN_PREFS)
+        self.assertIn("--disable-extensions", options.arguments)
+        self.assertEqual(options.to_capabilities()["pageLoadStrategy"], "eager")
+#%%
+class DriverFactoryTestCase(TestCase):
+    """Test class to test choosing a driver backend by name, without starting
+    a browser.
+    """
+    def test_get_driver_factory(self):
+        """Tests names map to their factories, factories pass through, and
+        unknown names are refused.
+        """
+        self.assertIs(get_driver_factory("lean"), DRIVER_BACKENDS["lean"])
+        self.assertEqual(get_driver_factory("edge").browser, "edge")
+        factory = HTTPDriverFactory(pool_size=2)
+        self.assertIs(get_driver_factory(factory), factory)
+        with self.assertRaises(ValueError):
+            get_driver_factory("safari")
+
+    def test_browser_options(self):
+        """Tests headless options are only added to headless browsers, and
+        the lean profile's options only to lean ones.
+        """
+        self.assertIn("--headless", DRIVER_BACKENDS["headless"].options().arguments)
+        self.assertNotIn("--headless", DRIVER_BACKENDS["chrome"].options().arguments)
+        self.assertEqual(DRIVER_BACKENDS["lean"].options().page_load_strategy, "eager")
+        self.assertEqual(DRIVER_BACKENDS["headless"].options().page_load_strategy, "normal")
+
+    def test_profile_template(self):
+        """Tests browsers start from a copy of the profile template only when
+        the template exists.
+        """
+        with tempfile.TemporaryDirectory() as template:
+            factory = BrowserDriverFactory("chrome", profile_template=template)
+            self.assertEqual(factory.get_profile_template(), template)
+            self.assertIn(f"--user-data-dir={template}", factory.options(template).arguments)
+        self.assertIsNone(factory.get_profile_template())
+
+    def test_http_page_driver(self):
+        """Tests the http driver loads page sources and refuses element lookups.
+        """
+        with FixtureServer() as server:
+            driver = get_driver_factory("http").create()
+            try:
+                driver.get(f"{server.base_url}/")
+                self.assertEqual(driver.current_url, f"{server.base_url}/")
+                self.assertIn("<html", driver.page_source)
+                self.assertEqual(driver.find_elements("xpath", "//a"), [])
+                with self.assertRaises(NoSuchElementException):
+                    driver.find_element("xpath", "//a")
+            finally:
+                driver.quit()
+
+    def test_show_more_needs_browser(self):
+        """Tests clicking show more with the http backend fails with a clear
+        error, without starting a driver.
+        """
+        scraper = WaterstonesScraper(backend="http")
+        with self.assertRaisesRegex(RuntimeError, "needs a browser backend"):
+            scraper.display_all_results()
+        self.assertFalse(scraper.driver_started)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,133 @@
+#%%
+from http.server import BaseHTTPRequestHandler
+from unittest import TestCase
+from waterstones_fetch_policy import CircuitOpenError, FetchPolicy
+from waterstones_fixture_server import FixtureServer, LocalHTTPServer
+from waterstones_query import QueryWaterstones
+import requests
+import unittest
+#%%
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers /flaky/<n> with 503 for the first n requests and 200 after,
+    /missing with 404, and /down with 500.
+    """
+    def do_GET(self):
+        hits = self.server.fixtures.count(self.path)
+        if self.path.startswith("/flaky/"):
+            status = 503 if hits <= int(self.path.rsplit("/", 1)[1]) else 200
+        elif self.path == "/down":
+            status = 500
+        else:
+            status = 404
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+#%%
+class FetchPolicyTestCase(TestCase):
+    """Test class to test the FetchPolicy class against a local server which
+    fails on purpose.
+    """
+    def setUp(self) -> None:
+        self.server = LocalHTTPServer(FlakyHandler)
+        self.base_url = self.server.start()
+        self.policy = FetchPolicy(timeout=5, retries=3, backoff=0.0, failure_threshold=3)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+        return super().tearDown()
+
+    def get(self, path: str) -> requests.Response:
+        url = f"{self.base_url}{path}"
+
+        return self.policy.call("page", url, requests.get, url, timeout=self.policy.timeout)
+
+    def test_retries_overload(self):
+        """Tests 503 responses are retried until the page loads, halving the
+        concurrency limit, without counting a failure.
+        """
+        response = self.get("/flaky/2")
+        self.assertEqual(response.status_code, 200)
+        summary = self.policy.summary()
+        self.assertEqual((summary["requests"], summary["retries"], summary["overloaded"],
+            summary["failures"]), (3, 2, 2, 0))
+        self.assertLess(summary["concurrency_limit"], 8)
+
+    def test_fit_concurrency(self):
+        """Tests the concurrency maximum follows the number of workers, unless
+        it was fixed, and a limit lowered by overload stays lowered.
+        """
+        policy = FetchPolicy()
+        policy.fit_concurrency(4)
+        policy.fit_concurrency(20)
+        self.assertEqual((policy.concurrency.max_concurrency, policy.concurrency.limit), (20, 20))
+        policy.concurrency.on_overload()
+        policy.fit_concurrency(32)
+        self.assertEqual((policy.concurrency.max_concurrency, policy.concurrency.limit), (32, 10))
+        fixed = FetchPolicy(max_concurrency=4)
+        fixed.fit_concurrency(20)
+        self.assertEqual(fixed.concurrency.max_concurrency, 4)
+
+    def test_failure_counted(self):
+        """Tests a 404 is not retried, and a page which keeps failing is
+        returned after the last retry with its failure counted by stage.
+        """
+        self.assertEqual(self.get("/missing").status_code, 404)
+        self.assertEqual(self.server.requests["/missing"], 1)
+        policy = FetchPolicy(retries=1, backoff=0.0)
+        url = f"{self.base_url}/down"
+        self.assertEqual(policy.call("page", url, requests.get, url).status_code, 500)
+        self.assertEqual(policy.summary()["failures_by_stage"], {"page" : 1})
+
+    def test_circuit_breaker(self):
+        """Tests the circuit of a host opens after repeated failures, so
+        further requests fail fast without reaching the server.
+        """
+        with self.assertRaises(CircuitOpenError):
+            self.get("/down")
+        self.assertEqual(self.server.requests["/down"], 3)
+        with self.assertRaises(CircuitOpenError):
+            self.get("/flaky/0")
+        self.assertNotIn("/flaky/0", self.server.requests)
+        self.assertEqual(self.policy.summary()["circuit_open"], 2)
+
+    def test_connection_error(self):
+        """Tests a refused connection is retried and raised once every retry
+        has failed.
+        """
+        url = "http://127.0.0.1:9/"
+        policy = FetchPolicy(retries=2, backoff=0.0)
+        with self.assertRaises(requests.ConnectionError):
+            policy.call("page", url, requests.get, url, timeout=1)
+        self.assertEqual((policy.summary()["requests"], policy.summary()["failures"]), (3, 1))
+#%%
+class SharedFetchPolicyTestCase(TestCase):
+    """Test class to test the fetch policy shared by the workers of a query
+    counts every request of the run, with the browser-free http backend.
+    """
+    def test_language_workers_keep_counts(self):
+        """Tests creating language workers does not reset the shared counts,
+        so they match the requests the server handled.
+        """
+        for n_language_workers in [1, 3]:
+            with self.subTest(n_language_workers=n_language_workers), \
+                    FixtureServer(show_more_delay=0.0) as server:
+                driver = QueryWaterstones(backend="http", n_language_workers=n_language_workers)
+                driver.base_url = f"{server.base_url}/"
+                try:
+                    driver.search(server.catalogue["query"])
+                    driver.get_language_filter_page_links()
+                    driver.get_DataFrame_of_language_filtered_query_results()
+                finally:
+                    driver.quit_browser()
+                self.assertEqual(driver.fetch_policy.summary()["requests"],
+                    sum(server.requests.values()))
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
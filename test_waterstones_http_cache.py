@@ -0,0 +1,118 @@
+#%%
+from http.server import BaseHTTPRequestHandler
+from unittest import TestCase
+from waterstones_fixture_server import FixtureServer, LocalHTTPServer
+from waterstones_http_cache import HTTPResponseCache
+from waterstones_query import QueryWaterstones
+import requests
+import tempfile
+import time
+import unittest
+#%%
+class ETagHandler(BaseHTTPRequestHandler):
+    """Serves a fixed body per path with an ETag, answering 304 when the
+    client's If-None-Match matches, and counts full responses.
+    """
+
+    def do_GET(self):
+        body = (self.path * 100).encode("utf-8")
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.fixtures.count("full")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+#%%
+class HTTPResponseCacheTestCase(TestCase):
+    """Test class to test the HTTPResponseCache class against a local server.
+    """
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = LocalHTTPServer(ETagHandler)
+        self.base_url = self.server.start()
+        self.session = requests.Session()
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_hit_then_revalidate(self):
+        """Tests a fresh entry is served from disk and a stale one is revalidated
+        with a conditional request instead of downloaded again.
+        """
+        cache = HTTPResponseCache(self.tmp.name, ttl=0.2)
+        url = f"{self.base_url}/book/9780099573586"
+        first = cache.get(self.session, url)
+        second = cache.get(self.session, url)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(first.content, second.content)
+        time.sleep(0.25)
+        third = cache.get(self.session, url)
+        self.assertTrue(third.from_cache)
+        self.assertEqual(self.server.requests["full"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["revalidated"], 1)
+        cache.close()
+
+    def test_lru_eviction(self):
+        """Tests the least recently used entry is evicted once the size cap is
+        exceeded.
+        """
+        cache = HTTPResponseCache(self.tmp.name, max_bytes=2500)
+        urls = [f"{self.base_url}/{name}/page" for name in ("aaaa", "bbbb", "cccc")]
+        cache.get(self.session, urls[0]) # 1000 bytes each
+        cache.get(self.session, urls[1])
+        cache.get(self.session, urls[0]) # urls[1] is now least recently used
+        cache.get(self.session, urls[2])
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertTrue(cache.get(self.session, urls[0]).from_cache)
+        self.assertFalse(cache.get(self.session, urls[1]).from_cache)
+        cache.close()
+#%%
+class CachedQueryTestCase(TestCase):
+    """Test class to test every page of a query with the browser-free http
+    backend goes through the HTTPResponseCache of the query.
+    """
+    def test_repeated_query_served_from_cache(self):
+        """Tests a repeated query fetches its search, results, and book pages
+        from disk rather than from the server.
+        """
+        with tempfile.TemporaryDirectory() as tmp, FixtureServer(show_more_delay=0.0) as server:
+            cache = HTTPResponseCache(tmp)
+            numbers_of_books = []
+            requests_made = []
+            for _ in range(2):
+                server.reset_counts()
+                driver = QueryWaterstones(backend="http", detail_backend="http",
+                    http_cache=cache)
+                driver.base_url = f"{server.base_url}/"
+                try:
+                    driver.search(server.catalogue["query"])
+                    driver.get_language_filter_page_links()
+                    numbers_of_books.append(len(
+                        driver.get_DataFrame_of_language_filtered_query_results()))
+                finally:
+                    driver.quit_browser()
+                requests_made.append(sum(server.requests.values()))
+            cache.close()
+        self.assertEqual(numbers_of_books[0], numbers_of_books[1])
+        self.assertGreater(requests_made[0], 0)
+        self.assertEqual(requests_made[1], 0)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,90 @@
+#%%
+from http.server import BaseHTTPRequestHandler
+from selenium.common.exceptions import NoSuchElementException
+from unittest import TestCase
+from waterstones_fixture_server import LocalHTTPServer
+from waterstones_http_scraper import WaterstonesHTTPScraper
+import unittest
+#%%
+BOOK_PAGE = """<html><body>
+<div class="book-detail">
+    <span class="book-title">Blindness</span>
+    <span itemprop="author"><a href="/author/jose-saramago"><b>Jose
+        Saramago</b></a></span>
+    <b itemprop="price">£10.99</b>
+    <img itemprop="image" src="/images/9780099573586.jpg">
+</div>
+</body></html>"""
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the fixture product page for any path under /book/ and a 404
+    for everything else.
+    """
+    def do_GET(self):
+        if self.path.startswith("/book/"):
+            body = BOOK_PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+#%%
+class WaterstonesHTTPScraperTestCase(TestCase):
+    """Test class to test the WaterstonesHTTPScraper class against a local
+    fixture HTTP server.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Starts the fixture server in a background thread.
+        """
+        cls.server = LocalHTTPServer(FixtureHandler)
+        cls.base_url = cls.server.start()
+
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stops the fixture server.
+        """
+        cls.server.stop()
+
+        return super().tearDownClass()
+
+    def setUp(self) -> None:
+        """Loads the fixture product page with a fresh scraper.
+        """
+        self.scraper = WaterstonesHTTPScraper()
+        self.scraper.load_book_page(f"{self.base_url}/book/blindness/9780099573586")
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.scraper.quit_browser()
+
+        return super().tearDown()
+
+    def test_getters(self):
+        """Tests every getter returns the same value and type as the Selenium
+        getters would.
+        """
+        self.assertEqual(self.scraper.get_ISBN(), 9780099573586)
+        self.assertEqual(self.scraper.get_author(), "Jose Saramago")
+        self.assertEqual(self.scraper.get_title(), "Blindness")
+        self.assertEqual(self.scraper.get_price(), 10.99)
+        self.assertEqual(self.scraper.get_image_link(),
+            f"{self.base_url}/images/9780099573586.jpg")
+
+    def test_missing_field(self):
+        """Tests a missing field raises the same exception as Selenium.
+        """
+        self.scraper.page_fields = {}
+        with self.assertRaises(NoSuchElementException):
+            self.scraper.get_author()
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
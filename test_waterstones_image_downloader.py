@@ -0,0 +1,110 @@
+#%%
+from functools import partial
+from http.server import SimpleHTTPRequestHandler
+from unittest import TestCase
+from waterstones_fetch_policy import FetchPolicy
+from waterstones_fixture_server import LocalHTTPServer
+from waterstones_http_cache import HTTPResponseCache
+from waterstones_image_downloader import AsyncImageDownloader
+import os
+import tempfile
+import unittest
+#%%
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serves static files, answers /busy.jpg with 503 Service Unavailable, and
+    drops the connection part way through /truncated.jpg.
+    """
+    def do_GET(self):
+        if self.path == "/busy.jpg":
+            self.send_error(503)
+            return
+        if self.path == "/truncated.jpg":
+            self.send_response(200)
+            self.send_header("Content-Length", "100000")
+            self.end_headers()
+            self.wfile.write(b"x" * 10_000)
+            self.close_connection = True
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+#%%
+class AsyncImageDownloaderTestCase(TestCase):
+    """Test class to test the AsyncImageDownloader class against a local static
+    file server.
+    """
+    def setUp(self) -> None:
+        """Writes fixture images to a temporary directory and serves it.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static_dir = os.path.join(self.tmp.name, "static")
+        self.out_dir = os.path.join(self.tmp.name, "images")
+        os.mkdir(self.static_dir)
+        os.mkdir(self.out_dir)
+        self.images = {f"{9780000000000 + i}.jpg" : os.urandom(100_000 + i) for i in range(10)}
+        for name, data in self.images.items():
+            with open(os.path.join(self.static_dir, name), "wb") as handler:
+                handler.write(data)
+        handler = partial(QuietHandler, directory=self.static_dir)
+        self.server = LocalHTTPServer(handler)
+        self.base_url = self.server.start()
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_download_all(self):
+        """Tests every image is saved intact and the statistics add up, with a
+        missing image reported as a failure rather than raised.
+        """
+        downloads = [(f"{self.base_url}/{name}", os.path.join(self.out_dir, name))
+            for name in self.images]
+        downloads.append((f"{self.base_url}/missing.jpg",
+            os.path.join(self.out_dir, "missing.jpg")))
+        downloader = AsyncImageDownloader(max_in_flight=4, chunk_size=4096)
+        stats = downloader.run(downloads)
+        downloader.close()
+        for name, data in self.images.items():
+            with open(os.path.join(self.out_dir, name), "rb") as handler:
+                self.assertEqual(handler.read(), data)
+        self.assertEqual(stats["images"], 10)
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["bytes"], sum(len(data) for data in self.images.values()))
+        self.assertGreater(stats["images_per_second"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "missing.jpg")))
+
+    def test_cached_overload(self):
+        """Tests a cover which keeps returning 503 through the HTTP cache is
+        retried and reported as a failure without stopping the other downloads.
+        """
+        cache = HTTPResponseCache(os.path.join(self.tmp.name, "cache"))
+        downloader = AsyncImageDownloader(cache=cache,
+            fetch_policy=FetchPolicy(retries=1, backoff=0.0))
+        name = next(iter(self.images))
+        stats = downloader.run([(f"{self.base_url}/busy.jpg", os.path.join(self.out_dir, "busy.jpg")),
+            (f"{self.base_url}/{name}", os.path.join(self.out_dir, name))])
+        downloader.close()
+        cache.close()
+        self.assertEqual((stats["images"], stats["failures"]), (1, 1))
+        self.assertEqual(downloader.fetch_policy.summary()["overloaded"], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "busy.jpg")))
+
+    def test_interrupted_stream(self):
+        """Tests an image whose connection drops part way through is reported as
+        a failure and leaves no partial file behind.
+        """
+        downloader = AsyncImageDownloader(chunk_size=4096,
+            fetch_policy=FetchPolicy(retries=0, backoff=0.0))
+        stats = downloader.run([(f"{self.base_url}/truncated.jpg",
+            os.path.join(self.out_dir, "truncated.jpg"))])
+        downloader.close()
+        self.assertEqual((stats["images"], stats["failures"]), (0, 1))
+        self.assertEqual(os.listdir(self.out_dir), [])
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,62 @@
+#%%
+from PIL import Image
+from unittest import TestCase
+from waterstones_image_processing import CoverImageProcessor
+import os
+import tempfile
+import unittest
+#%%
+class CoverImageProcessorTestCase(TestCase):
+    """Test class to test the CoverImageProcessor class on generated covers.
+    """
+    def setUp(self) -> None:
+        """Saves two identical covers, one different cover, and one corrupt
+        download to an images folder.
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.images_path = os.path.join(self.tmp.name, "images")
+        os.mkdir(self.images_path)
+        self.images = {}
+        for isbn, colour in ((9780000000001, "red"), (9780000000002, "red"), (9780000000003, "blue")):
+            file_path = os.path.join(self.images_path, f"{isbn}.jpg")
+            Image.new("RGB", (300, 460), colour).save(file_path, "JPEG")
+            self.images[isbn] = file_path
+        self.images[9780000000004] = os.path.join(self.images_path, "9780000000004.jpg")
+        with open(self.images[9780000000004], "wb") as handler:
+            handler.write(b"<html>Not found</html>")
+        self.processor = CoverImageProcessor(os.path.join(self.tmp.name, "covers"), processes=2)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_process(self):
+        """Tests identical covers share one archived copy and thumbnail, the
+        corrupt download is removed, and the manifest maps ISBN to hash to paths.
+        """
+        stats = self.processor.process(self.images)
+        self.assertEqual((stats["images"], stats["valid"], stats["invalid"], stats["duplicates"]),
+            (4, 3, 1, 1))
+        self.assertFalse(os.path.exists(self.images[9780000000004]))
+        isbns = self.processor.manifest["isbns"]
+        self.assertEqual(isbns["9780000000001"], isbns["9780000000002"])
+        self.assertNotEqual(isbns["9780000000001"], isbns["9780000000003"])
+        image = self.processor.manifest["images"][isbns["9780000000001"]]
+        self.assertEqual(sorted(image["paths"]), [self.images[9780000000001], self.images[9780000000002]])
+        self.assertTrue(os.path.samefile(image["object"], self.images[9780000000002]))
+        with Image.open(image["thumbnail"]) as thumbnail:
+            self.assertLessEqual(thumbnail.size, (160, 240))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "covers", "thumbnails"))), 2)
+
+    def test_reprocess_skips_done_images(self):
+        """Tests a second run with a reloaded manifest only processes new images.
+        """
+        self.processor.process(self.images)
+        processor = CoverImageProcessor(os.path.join(self.tmp.name, "covers"), processes=2)
+        self.assertEqual(processor.process(self.images)["images"], 0)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,115 @@
+#%%
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from waterstones_fixture_server import FixtureServer
+from waterstones_isbn_index import BloomFilter, SeenISBNIndex
+from waterstones_query import QueryWaterstones
+import os
+import tempfile
+import threading
+import time
+import unittest
+#%%
+class SeenISBNIndexTestCase(TestCase):
+    """Test class to test the SeenISBNIndex and BloomFilter classes.
+    """
+    def test_claim_once_and_reuse(self):
+        """Tests an ISBN is claimed once and its data reused afterwards.
+        """
+        index = SeenISBNIndex()
+        self.assertTrue(index.claim(9780099573586))
+        index.remember(9780099573586, {"ID" : 9780099573586, "Timestamp" : time.ctime(),
+            "Author" : "Jose Saramago", "Title" : "Blindness", "Language" : None,
+            "Price (£)" : 10.99, "Image_link" : "https://example.com/a.jpg"})
+        self.assertFalse(index.claim(9780099573586))
+        self.assertEqual(index.lookup(9780099573586)["ID"], 9780099573586)
+        self.assertEqual(index.duplicates, 1)
+        self.assertIsNone(index.claim_image("9780099573586", "a/images/9780099573586.jpg"))
+        self.assertEqual(index.claim_image("9780099573586", "b/images/9780099573586.jpg"),
+            "a/images/9780099573586.jpg")
+
+    def test_lookup_waits_for_claim(self):
+        """Tests a lookup of an ISBN claimed by another thread waits for its
+        data, and one whose claim is released returns None and can be claimed.
+        """
+        index = SeenISBNIndex()
+        self.assertTrue(index.claim(9780099573586))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            lookup = executor.submit(index.lookup, 9780099573586)
+            time.sleep(0.05)
+            self.assertFalse(lookup.done())
+            index.remember(9780099573586, {"ID" : 9780099573586, "Timestamp" : time.ctime(),
+                "Author" : "Jose Saramago", "Title" : "Blindness", "Language" : None,
+                "Price (£)" : 10.99, "Image_link" : "https://example.com/a.jpg"})
+            self.assertEqual(lookup.result(timeout=5)["Title"], "Blindness")
+        self.assertTrue(index.claim(9782020403436))
+        threading.Timer(0.05, index.release, (9782020403436,)).start()
+        self.assertIsNone(index.lookup(9782020403436, timeout=5))
+        self.assertTrue(index.claim(9782020403436))
+
+    def test_shared_by_language_workers(self):
+        """Tests language workers sharing the index keep every row when the
+        same books appear under several language links at once.
+        """
+        with FixtureServer(show_more_delay=0.0) as server:
+            query = server.catalogue["query"]
+            language_link = server.language_link(query, server.languages()[0])
+            row_counts = []
+            for n_language_workers in (1, 3):
+                driver = QueryWaterstones(backend="http", isbn_index=SeenISBNIndex(),
+                    n_language_workers=n_language_workers)
+                driver.base_url = f"{server.base_url}/"
+                try:
+                    driver.load_and_accept_cookies()
+                    driver.search(query)
+                    driver.list_of_language_page_links = [language_link] * 3
+                    row_counts.append(len(driver.get_DataFrame_of_language_filtered_query_results()))
+                finally:
+                    driver.quit_browser()
+        self.assertEqual(row_counts[0], row_counts[1])
+        self.assertEqual(row_counts[0], 3 * sum(book["language"] == server.languages()[0]
+            for book in server.catalogue["books"]))
+
+    def test_keep_records_off(self):
+        """Tests an index which keeps only ISBNs still claims each once but
+        holds no book data.
+        """
+        index = SeenISBNIndex(keep_records=False)
+        self.assertTrue(index.claim(9780099573586))
+        index.remember(9780099573586, {"ID" : 9780099573586, "Timestamp" : time.ctime(),
+            "Author" : "Jose Saramago", "Title" : "Blindness", "Language" : None,
+            "Price (£)" : 10.99, "Image_link" : "https://example.com/a.jpg"})
+        self.assertFalse(index.claim(9780099573586))
+        self.assertIsNone(index.lookup(9780099573586))
+        self.assertEqual(index.records, {})
+
+    def test_persisted_between_runs(self):
+        """Tests ISBNs saved by one run are seen, without data, by the next, as
+        a set and as a Bloom filter.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            for use_bloom_filter in (False, True):
+                path = os.path.join(tmp, f"seen_{use_bloom_filter}")
+                index = SeenISBNIndex(path, use_bloom_filter=use_bloom_filter,
+                    expected_items=1000)
+                index.claim(9780099573586)
+                index.save()
+                next_run = SeenISBNIndex(path, use_bloom_filter=use_bloom_filter)
+                self.assertFalse(next_run.claim(9780099573586))
+                self.assertIsNone(next_run.lookup(9780099573586))
+                self.assertTrue(next_run.claim(9782020403436))
+
+    def test_bloom_filter_error_rate(self):
+        """Tests the Bloom filter has no false negatives and a false positive
+        rate close to the target.
+        """
+        bloom_filter = BloomFilter(expected_items=10_000, error_rate=0.01)
+        added = range(9780000000000, 9780000010000)
+        for isbn in added:
+            bloom_filter.add(isbn)
+        self.assertTrue(all(isbn in bloom_filter for isbn in added))
+        false_positives = sum(isbn in bloom_filter for isbn in range(9790000000000, 9790000010000))
+        self.assertLess(false_positives, 300)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
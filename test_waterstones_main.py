@@ -0,0 +1,62 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import FixtureServer
+from waterstones_main import HEAVY_MODULES, profile_startup
+from waterstones_query import QueryWaterstones
+import os
+import subprocess
+import sys
+import unittest
+#%%
+PROJECT_FILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_files")
+#%%
+class StartupTestCase(TestCase):
+    """Test class to test the startup-optimised entry point and the lazy
+    driver, with the browser-free http backend.
+    """
+    def test_lazy_imports(self):
+        """Tests importing the entry point imports none of the heavy modules.
+        """
+        output = subprocess.run([sys.executable, "-c", "import sys, waterstones_main; "
+            "print(sorted(name for name in ('pandas', 'requests', 'selenium') if name in sys.modules))"],
+            cwd=PROJECT_FILES_PATH, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_query_defers_pandas_and_webdriver(self):
+        """Tests importing the query module and creating a query leaves pandas,
+        numpy, and the remote webdriver to be imported when first used.
+        """
+        output = subprocess.run([sys.executable, "-c", "import sys, waterstones_query; "
+            "waterstones_query.QueryWaterstones(backend='http'); "
+            "print(sorted(name for name in ('numpy', 'pandas', 'selenium.webdriver.remote.webdriver') "
+            "if name in sys.modules))"],
+            cwd=PROJECT_FILES_PATH, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_driver_starts_on_first_navigation(self):
+        """Tests a query only starts its driver when it first loads a page.
+        """
+        with FixtureServer() as server:
+            scraper = QueryWaterstones(backend="http")
+            try:
+                self.assertFalse(scraper.driver_started)
+                scraper.base_url = f"{server.base_url}/"
+                scraper.load_page()
+                self.assertTrue(scraper.driver_started)
+                self.assertIsNotNone(scraper.launch_seconds)
+            finally:
+                scraper.quit_browser()
+            self.assertFalse(scraper.driver_started)
+
+    def test_profile_startup(self):
+        """Tests the startup profile times every heavy import, the launch,
+        and the first page load.
+        """
+        with FixtureServer() as server:
+            report = profile_startup("http", f"{server.base_url}/")
+        self.assertEqual(list(report["import_seconds"]), HEAVY_MODULES)
+        self.assertGreaterEqual(report["launch_seconds"], 0)
+        self.assertGreater(report["first_page_seconds"], 0)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
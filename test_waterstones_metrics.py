@@ -0,0 +1,60 @@
+#%%
+from unittest import TestCase
+from waterstones_metrics import StageMetrics, timed_stage
+import json
+import os
+import tempfile
+import unittest
+#%%
+class FakeScraper:
+    """Scraper with one instrumented method.
+    """
+    def __init__(self, metrics) -> None:
+        self.metrics = metrics
+
+    @timed_stage("get_price")
+    def get_price(self, price):
+        if price is None:
+            raise ValueError("no price")
+        self.metrics.add_bytes("get_price", 10)
+        return price
+#%%
+class StageMetricsTestCase(TestCase):
+    """Test class to test the StageMetrics class and timed_stage decorator.
+    """
+    def test_percentiles(self):
+        """Tests nearest-rank percentiles over 100 recorded calls.
+        """
+        metrics = StageMetrics()
+        for milliseconds in range(1, 101):
+            metrics.record("display_all_results", milliseconds / 1000)
+        stats = metrics.summary()["display_all_results"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50_seconds"], 0.05)
+        self.assertAlmostEqual(stats["p95_seconds"], 0.095)
+        self.assertAlmostEqual(stats["p99_seconds"], 0.099)
+        self.assertAlmostEqual(stats["max_seconds"], 0.1)
+
+    def test_decorated_method_and_reports(self):
+        """Tests decorated calls, errors, and bytes reach the JSON and
+        Prometheus reports.
+        """
+        metrics = StageMetrics()
+        scraper = FakeScraper(metrics)
+        self.assertEqual(scraper.get_price(10.99), 10.99)
+        with self.assertRaises(ValueError):
+            scraper.get_price(None)
+        with tempfile.TemporaryDirectory() as tmp:
+            report = metrics.write_json(os.path.join(tmp, "metrics.json"))
+            with open(os.path.join(tmp, "metrics.json")) as handler:
+                self.assertEqual(json.load(handler)["stages"], report["stages"])
+            metrics.write_prometheus(os.path.join(tmp, "metrics.prom"))
+            with open(os.path.join(tmp, "metrics.prom")) as handler:
+                prometheus = handler.read()
+        stats = report["stages"]["get_price"]
+        self.assertEqual((stats["count"], stats["errors"], stats["bytes"]), (2, 1, 10))
+        self.assertIn('waterstones_scraper_stage_seconds_count{stage="get_price"} 2', prometheus)
+        self.assertIn('waterstones_scraper_stage_errors_total{stage="get_price"} 1', prometheus)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
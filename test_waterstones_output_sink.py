@@ -0,0 +1,165 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import FixtureServer, make_book_dict
+from waterstones_output_sink import RunCheckpoint, StreamingBookSink
+from waterstones_query import QueryWaterstones
+from waterstones_records import COLUMNS
+import importlib.util
+import itertools
+import json
+import os
+import pandas as pd
+import tempfile
+import unittest
+#%%
+class StreamingBookSinkTestCase(TestCase):
+    """Test class to test the StreamingBookSink and RunCheckpoint classes.
+    """
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "jose_saramago")
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_rows_on_disk_before_close(self):
+        """Tests each row is readable as soon as it is written, a resuming
+        sink appends without repeating the header, and a new sink replaces
+        the earlier output.
+        """
+        sink = StreamingBookSink(self.directory, "jose_saramago", formats=("jsonl",))
+        sink.write(make_book_dict(9780099573586))
+        df = pd.read_csv(sink.csv_path)
+        self.assertEqual(list(df.columns), COLUMNS)
+        self.assertEqual(list(df["ID"]), [9780099573586])
+        sink.close()
+        with StreamingBookSink(self.directory, "jose_saramago", formats=("jsonl",),
+                resume=True) as sink:
+            sink.write(make_book_dict(9782020403436))
+        df = pd.read_csv(sink.csv_path)
+        self.assertEqual(list(df["ID"]), [9780099573586, 9782020403436])
+        with open(os.path.join(self.directory, "jose_saramago.jsonl")) as handler:
+            rows = [json.loads(line) for line in handler]
+        self.assertEqual([row["ID"] for row in rows], [9780099573586, 9782020403436])
+        with StreamingBookSink(self.directory, "jose_saramago", formats=("jsonl",)) as sink:
+            sink.write(make_book_dict(9788490628720))
+        self.assertEqual(list(pd.read_csv(sink.csv_path)["ID"]), [9788490628720])
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is not None, "pyarrow is installed")
+    def test_parquet_without_pyarrow(self):
+        """Tests choosing Parquet output without pyarrow fails with a clear
+        message before the output of an earlier run is replaced.
+        """
+        with StreamingBookSink(self.directory, "jose_saramago") as sink:
+            sink.write(make_book_dict(9780099573586))
+        with self.assertRaisesRegex(ImportError, "Parquet output needs pyarrow"):
+            StreamingBookSink(self.directory, "jose_saramago", formats=("parquet",))
+        self.assertEqual(list(pd.read_csv(sink.csv_path)["ID"]), [9780099573586])
+
+    def test_checkpoint_survives_restart(self):
+        """Tests completed links are reloaded by a new checkpoint.
+        """
+        os.makedirs(self.directory)
+        path = os.path.join(self.directory, "jose_saramago.checkpoint")
+        checkpoint = RunCheckpoint(path)
+        checkpoint.mark_language_done("https://example.com/language/portuguese")
+        checkpoint.mark_book_done("https://example.com/book/9780099573586")
+        checkpoint.mark_book_done("https://example.com/book/9780099573586")
+        checkpoint.close()
+        restarted = RunCheckpoint(path)
+        self.assertEqual(restarted.language_links_done,
+            {"https://example.com/language/portuguese"})
+        self.assertEqual(restarted.book_links_done,
+            {"https://example.com/book/9780099573586"})
+        restarted.close()
+        with open(path) as handler:
+            self.assertEqual(len(handler.readlines()), 2)
+#%%
+class QueryCheckpointTestCase(TestCase):
+    """Test class to test QueryWaterstones resumes only interrupted runs, with
+    the browser-free http backend.
+    """
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FixtureServer(show_more_delay=0.0)
+        self.server.start()
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def run_query(self, number_of_books=None, **kwargs) -> tuple:
+        """Streams the books of the fixture query to the output sink, stopping
+        after number_of_books as if interrupted, and returns the number of
+        books written, whether the checkpoint was kept, and the IDs in the
+        CSV output. Other keyword arguments are passed to QueryWaterstones.
+        """
+        driver = QueryWaterstones(backend="http", **kwargs)
+        driver.base_url = f"{self.server.base_url}/"
+        driver.raw_data_path = self.tmp.name
+        try:
+            driver.load_and_accept_cookies()
+            driver.search(self.server.catalogue["query"])
+            sink = driver.open_output_sink()
+            checkpoint_path = driver.checkpoint.path
+            driver.get_language_filter_page_links()
+            books = driver.iter_language_filtered_books()
+            for _ in itertools.islice(books, number_of_books):
+                pass
+            books.close()
+            driver.save_df_as_csv()
+        finally:
+            driver.quit_browser()
+
+        csv_ids = list(pd.read_csv(sink.csv_path)["ID"])
+
+        return sink.rows_written, os.path.exists(checkpoint_path), csv_ids
+
+    def test_rerun_after_completion(self):
+        """Tests a finished run deletes its checkpoint, so running the same
+        query again scrapes every book again and replaces the CSV output.
+        """
+        books = len(self.server.catalogue["books"])
+        for _ in range(2):
+            rows_written, kept, csv_ids = self.run_query()
+            self.assertEqual((rows_written, kept), (books, False))
+            self.assertEqual(len(csv_ids), books)
+            self.assertEqual(len(set(csv_ids)), books)
+
+    def test_resume_after_interruption(self):
+        """Tests an interrupted run keeps its checkpoint, and the restarted
+        run only scrapes the books not written yet.
+        """
+        books = len(self.server.catalogue["books"])
+        self.assertEqual(self.run_query(number_of_books=10)[:2], (10, True))
+        rows_written, kept, csv_ids = self.run_query()
+        self.assertEqual((rows_written, kept), (books - 10, False))
+        self.assertEqual(len(csv_ids), books)
+        self.assertEqual(len(set(csv_ids)), books)
+
+    def test_resume_after_language_cap(self):
+        """Tests languages cut off by max_books_per_language are not marked
+        done, so the restarted run scrapes their remaining books.
+        """
+        books = len(self.server.catalogue["books"])
+        for n_language_workers in [1, 2]:
+            with self.subTest(n_language_workers=n_language_workers):
+                capped, kept, _ = self.run_query(max_books_per_language=5,
+                    n_language_workers=n_language_workers)
+                self.assertLess(capped, books)
+                self.assertTrue(kept)
+                rows_written, kept, csv_ids = self.run_query(
+                    n_language_workers=n_language_workers)
+                self.assertEqual((rows_written, kept), (books - capped, False))
+                self.assertEqual(sorted(set(csv_ids)), sorted(csv_ids))
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
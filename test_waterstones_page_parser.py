@@ -0,0 +1,88 @@
+#%%
+from unittest import TestCase
+from waterstones_page_parser import (find_text_by_path, parse_book_links, parse_book_page,
+    parse_language_links, parse_search_form, search_form_url)
+import unittest
+#%%
+RESULTS_PAGE = """<html><body>
+<div class="search-results-list">
+    <div class="book-preview">
+        <div class="image-wrap"><a href="/book/blindness/jose-saramago/9780099573586"><img src="/c.jpg"></a></div>
+        <div class="info-wrap"><a href="/book/blindness/jose-saramago/9780099573586">Blindness</a></div>
+    </div>
+    <div class="book-preview"><a href="https://www.waterstones.com/book/seeing/jose-saramago/9780099485070">Seeing</a></div>
+    <div class="book-preview"><span>No link</span></div>
+</div>
+<div class="search-results-list"><div><a href="/book/other/9780000000000">Other</a></div></div>
+</body></html>"""
+#%%
+class PageParserTestCase(TestCase):
+    """Test class to test the single-pass page parsers.
+    """
+    def test_parse_book_links(self):
+        """Tests one link is read per result card, in order, from the first
+        results list only, with relative links resolved.
+        """
+        links = parse_book_links(RESULTS_PAGE, "https://www.waterstones.com/books/search/term/jose+saramago")
+        self.assertEqual(links, [
+            "https://www.waterstones.com/book/blindness/jose-saramago/9780099573586",
+            "https://www.waterstones.com/book/seeing/jose-saramago/9780099485070",
+        ])
+
+    def test_parse_book_page(self):
+        """Tests every field of a product page is read in one pass.
+        """
+        fields = parse_book_page("""<span class="book-title">Cain</span>
+            <span itemprop="author"><b>Jose Saramago</b></span><b itemprop="price">£9.99</b>
+            <img itemprop="image" src="/images/9780099552192.jpg">""", "https://www.waterstones.com/book/cain")
+        self.assertEqual(fields, {"title" : "Cain", "author" : "Jose Saramago", "price" : "£9.99",
+            "image" : "https://www.waterstones.com/images/9780099552192.jpg"})
+
+    def test_find_text_by_path(self):
+        """Tests the text of the element at an absolute XPath is read, counting
+        only siblings of the same tag and skipping void elements.
+        """
+        html = """<html><body><div><span>a</span></div><div><br><span>b</span>
+            <span> of <b>3</b> </span></div></body></html>"""
+        self.assertEqual(find_text_by_path(html, "/html/body/div[2]/span[2]"), "of 3")
+        self.assertEqual(find_text_by_path(html, "/html/body/div/span"), "a")
+        self.assertIsNone(find_text_by_path(html, "/html/body/div[3]"))
+
+    def test_parse_language_links(self):
+        """Tests only the links after the LANGUAGE filter header are read.
+        """
+        html = """<div class="filter-header slide-trigger js-filter-trigger">FORMAT</div>
+            <div class="filter-body"><a href="/format/paperback">Paperback</a></div>
+            <div class="filter-header slide-trigger js-filter-trigger"><div>LANGUAGE</div></div>
+            <div class="filter-body"><div><a href="/language/english">English</a></div>
+            <a href="/language/french">French</a></div><a href="/other">Other</a>"""
+        self.assertEqual(parse_language_links(html, "https://www.waterstones.com/books"), [
+            "https://www.waterstones.com/language/english",
+            "https://www.waterstones.com/language/french",
+        ])
+        self.assertEqual(parse_language_links(RESULTS_PAGE), [])
+
+    def test_parse_search_form(self):
+        """Tests the action and input name of the search bar's form are read.
+        """
+        html = """<form action="/newsletter"><input class="input" name="email"></form>
+            <form action="/books/search"><input class="input input-search" name="term"></form>"""
+        self.assertEqual(parse_search_form(html, "https://www.waterstones.com/"),
+            ("https://www.waterstones.com/books/search", "term"))
+        self.assertEqual(parse_search_form("<p></p>"), (None, None))
+
+    def test_search_form_url(self):
+        """Tests the search terms are encoded into the form action, alongside
+        any query string it already has, and a nameless input is refused.
+        """
+        self.assertEqual(search_form_url("https://www.waterstones.com/books/search", "term",
+            "Gabriel García Márquez"),
+            "https://www.waterstones.com/books/search?term=Gabriel+Garc%C3%ADa+M%C3%A1rquez")
+        self.assertEqual(search_form_url("https://www.waterstones.com/books/search?sort=new&term=old#top",
+            "term", "Saramago & co"),
+            "https://www.waterstones.com/books/search?sort=new&term=Saramago+%26+co")
+        with self.assertRaises(ValueError):
+            search_form_url("https://www.waterstones.com/books/search", None, "Saramago")
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,59 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import FixtureServer
+from waterstones_metrics import StageMetrics
+from waterstones_page_parser import parse_book_links
+from waterstones_pagination import PaginatedResultsFetcher, PaginationError, page_url
+import requests
+import unittest
+#%%
+class PaginationTestCase(TestCase):
+    """Test class to test the PaginatedResultsFetcher class against the
+    recorded fixture catalogue.
+    """
+    def setUp(self) -> None:
+        self.server = FixtureServer()
+        self.server.start()
+        self.metrics = StageMetrics()
+        self.fetcher = PaginatedResultsFetcher(n_workers=4, metrics=self.metrics)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.fetcher.close()
+        self.server.stop()
+
+        return super().tearDown()
+
+    def test_page_url(self):
+        """Tests page numbers replace any existing page number and keep the query.
+        """
+        self.assertEqual(page_url("https://www.waterstones.com/books/search/term/a/language/english", 3),
+            "https://www.waterstones.com/books/search/term/a/language/english/page/3")
+        self.assertEqual(page_url("https://www.waterstones.com/books/search/term/a/page/2/?sort=price", 5),
+            "https://www.waterstones.com/books/search/term/a/page/5?sort=price")
+
+    def test_fetch_links(self):
+        """Tests every book of a language is collected once, in page order, when
+        the first page's links are already known.
+        """
+        query = self.server.catalogue["query"]
+        language = self.server.languages()[0]
+        expected = [self.server.book_link(book) for book in self.server.catalogue["books"]
+            if book["language"] == language]
+        language_link = self.server.language_link(query, language)
+        first_page_links = parse_book_links(requests.get(language_link).text, language_link)
+        number_of_pages = -(-len(expected) // self.server.catalogue["results_per_page"])
+        links = self.fetcher.fetch_links(language_link, number_of_pages, first_page_links + first_page_links[:1])
+        self.assertEqual(links, expected)
+        self.assertEqual(self.metrics.summary()["fetch_results_page"]["count"], number_of_pages - 1)
+
+    def test_empty_page(self):
+        """Tests a page past the end of the results raises PaginationError.
+        """
+        language_link = self.server.language_link(self.server.catalogue["query"], "German")
+        with self.assertRaises(PaginationError):
+            self.fetcher.fetch_links(language_link, 2)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -13,7 +13,8 @@ class WaterstonesQueryTestCase(TestCase):
         """Initiates an instance of the QueryWaterstones class before any 
         tests are run, loads the watersones.com homepage and accepts cookies.
         """
-        cls.test_driver = QueryWaterstones()
+        # the expected data is the first book of each language
+        cls.test_driver = QueryWaterstones(max_books_per_language=1)
         cls.test_driver.load_and_accept_cookies()
 
         return super().setUpClass()
@@ -29,6 +30,7 @@ class WaterstonesQueryTestCase(TestCase):
     def setUp(self) -> None:
         """Generates a test driver object for each test.
         """
+        self.test_driver.reset_query_state()
         self.test_driver.search("jose saramago")
         self.test_driver.get_language_filter_page_links()
         self.test_df = self.test_driver.get_DataFrame_of_language_filtered_query_results()
@@ -48,7 +50,7 @@ class WaterstonesQueryTestCase(TestCase):
         """
         expected = pd.Series([9780099573586, 9782020403436, 9788490628720,
                         9788807721694, 9783442742868, 9789896602291
-                        ]).astype(str).rename("ID")
+                        ], dtype="int64").rename("ID")
         actual = self.test_df["ID"]
         assert_series_equal(expected, actual)
     
@@ -58,7 +60,7 @@ class WaterstonesQueryTestCase(TestCase):
         web driver object.
         """
         expected = pd.Series(["Jose Saramago" for i in range(6)]).astype(str).rename("Author")
-        actual = self.test_df["Author"]
+        actual = self.test_df["Author"].astype(str) # categorical column
         assert_series_equal(expected, actual)
 #%%
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import make_book_dict
+from waterstones_records import COLUMNS, BookRecord, BookRecordAccumulator, Language
+import io
+import pandas as pd
+import unittest
+#%%
+class BookRecordAccumulatorTestCase(TestCase):
+    """Test class to test the BookRecordAccumulator class.
+    """
+    def test_typed_columns(self):
+        """Tests the DataFrame has the expected columns, order, and dtypes.
+        """
+        records = BookRecordAccumulator()
+        records.extend([make_book_dict(9780099573586), make_book_dict(9782020403436)],
+            language="Portuguese")
+        records.append(make_book_dict(9788490628720, author="Isabel Allende", price=8.5))
+        df = records.to_DataFrame()
+        self.assertEqual(list(df.columns), COLUMNS)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(df["ID"].dtype, "int64")
+        self.assertEqual(df["Price (£)"].dtype, "float64")
+        self.assertEqual(df["Author"].dtype, "category")
+        self.assertEqual(df["Language"].dtype, "category")
+        self.assertEqual(list(df["ID"]), [9780099573586, 9782020403436, 9788490628720])
+        self.assertEqual(list(df["Author"].cat.categories), ["Jose Saramago", "Isabel Allende"])
+        self.assertEqual(df["Language"].tolist()[:2], ["Portuguese", "Portuguese"])
+        self.assertTrue(df["Language"].isna()[2])
+
+    def test_book_records(self):
+        """Tests records keep their types, share interned authors, and round
+        trip through the accumulator.
+        """
+        first = BookRecord.from_dict(make_book_dict(9780099573586), language="English")
+        second = BookRecord.from_dict(make_book_dict(9782020403436, author="".join(["Jose ", "Saramago"])))
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.author, second.author)
+        self.assertIs(first.language, Language.ENGLISH)
+        self.assertIsNone(second.language)
+        self.assertEqual(Language.parse("Klingon"), "Klingon")
+        self.assertEqual(first.to_dict(), dict(make_book_dict(9780099573586), Language="English"))
+        records = BookRecordAccumulator.from_records([first, second])
+        self.assertEqual(list(records.records()), [first, second])
+        self.assertEqual(records.to_DataFrame()["Language"].tolist()[0], "English")
+
+    def test_missing_values_from_csv(self):
+        """Tests empty author, timestamp, and language cells read back from a
+        .csv file as NaN become None rather than failing to be interned.
+        """
+        csv_file = io.StringIO()
+        pd.DataFrame([make_book_dict(9780099573586, author=None),
+            dict(make_book_dict(9782020403436), Timestamp=None)], columns=COLUMNS).to_csv(
+            csv_file, index=False)
+        csv_file.seek(0)
+        book_dicts = pd.read_csv(csv_file).to_dict("records")
+        first, second = (BookRecord.from_dict(book_dict) for book_dict in book_dicts)
+        self.assertIsNone(first.author)
+        self.assertIsNone(second.timestamp)
+        self.assertIsNone(first.language)
+        records = BookRecordAccumulator()
+        records.extend(book_dicts)
+        df = records.to_DataFrame()
+        self.assertEqual(df["Author"].isna().tolist(), [True, False])
+        self.assertEqual(df["Language"].isna().tolist(), [True, True])
+
+    def test_empty(self):
+        """Tests an empty accumulator still gives the full set of columns.
+        """
+        df = BookRecordAccumulator().to_DataFrame()
+        self.assertEqual(list(df.columns), COLUMNS)
+        self.assertEqual(len(df), 0)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
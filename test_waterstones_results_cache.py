@@ -0,0 +1,97 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import FixtureServer
+from waterstones_query import QueryWaterstones
+from waterstones_results_cache import QueryResultsCache, normalize_query
+from waterstones_session_manager import DriverSessionPool
+import os
+import tempfile
+import unittest
+#%%
+class QueryResultsCacheTestCase(TestCase):
+    """Test class to test the QueryResultsCache class and its use by
+    QueryWaterstones with the browser-free http backend.
+    """
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = QueryResultsCache(os.path.join(self.directory.name, "results.sqlite3"))
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.directory.cleanup()
+
+        return super().tearDown()
+
+    def test_normalize_query(self):
+        """Tests queries differing only in case or spacing are the same.
+        """
+        self.assertEqual(normalize_query(" Jose  SARAMAGO\t"), "jose_saramago")
+        self.assertEqual(normalize_query("jose saramago"), normalize_query("Jose Saramago"))
+
+    def test_ttl(self):
+        """Tests stored results are returned until they are older than the ttl.
+        """
+        languages = {"/language/english" : {"language_name" : "English", "book_links" : ["/book/1"]}}
+        self.cache.put("Jose Saramago", ["/language/english"], languages)
+        self.assertEqual(self.cache.get("jose  saramago"),
+            {"language_links" : ["/language/english"], "languages" : languages})
+        self.cache.ttl = 0
+        self.assertIsNone(self.cache.get("jose saramago"))
+        self.assertIsNone(self.cache.get("antonio tabucchi"))
+        self.assertEqual((self.cache.stats["hits"], self.cache.stats["expired"],
+            self.cache.stats["misses"]), (1, 1, 1))
+
+    def scrape(self, server: FixtureServer, query: str, load_homepage=True):
+        driver = QueryWaterstones(backend="http", results_cache=self.cache)
+        driver.base_url = f"{server.base_url}/"
+        try:
+            if load_homepage:
+                driver.load_and_accept_cookies()
+            driver.search(query)
+            driver.get_language_filter_page_links()
+            return driver.get_DataFrame_of_language_filtered_query_results(), driver
+        finally:
+            driver.quit_browser()
+
+    def test_repeat_query_skips_search(self):
+        """Tests a repeated query only loads book pages and gives the same rows.
+        """
+        with FixtureServer(show_more_delay=0.0) as server:
+            query = server.catalogue["query"]
+            first_df, first = self.scrape(server, query)
+            self.assertIsNone(first.cached_results)
+            books = len(server.catalogue["books"])
+            self.assertGreater(server.requests["page"], books)
+            server.reset_counts()
+            second_df, second = self.scrape(server, f"  {query.upper()} ",
+                load_homepage=False)
+            self.assertIsNotNone(second.cached_results)
+            self.assertEqual(server.requests["page"], books)
+        self.assertEqual(len(second_df), books)
+        self.assertEqual(list(second_df["ID"]), list(first_df["ID"]))
+        self.assertEqual(list(second_df["Language"]), list(first_df["Language"]))
+
+    def test_pooled_cache_hit_skips_driver(self):
+        """Tests a pooled scraper loads the homepage itself when its search
+        misses the cache, and never starts its driver when the search hits it.
+        """
+        with FixtureServer(show_more_delay=0.0) as server:
+            query = server.catalogue["query"]
+            started = []
+            rows = []
+            for _ in range(2):
+                with DriverSessionPool(QueryWaterstones, backend="http", detail_backend="http",
+                        results_cache=self.cache) as pool:
+                    with pool.acquire() as driver:
+                        driver.base_url = f"{server.base_url}/"
+                        driver.search(query)
+                        driver.get_language_filter_page_links()
+                        rows.append(len(driver.get_DataFrame_of_language_filtered_query_results()))
+                        started.append(driver.driver_started)
+        self.assertEqual(started, [True, False])
+        self.assertEqual(rows, [len(server.catalogue["books"])] * 2)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
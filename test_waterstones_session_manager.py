@@ -0,0 +1,88 @@
+#%%
+from selenium.common.exceptions import WebDriverException
+from unittest import TestCase
+from waterstones_session_manager import DriverSessionPool
+import unittest
+#%%
+class FakeDriver:
+    def __init__(self) -> None:
+        self.crashed = False
+
+    @property
+    def current_url(self):
+        if self.crashed:
+            raise WebDriverException("chrome not reachable")
+        return "https://www.waterstones.com/"
+#%%
+class FakeQuery:
+    """Stands in for QueryWaterstones, counting how often the browser
+    is started and pages are loaded.
+    """
+    started = 0
+
+    def __init__(self) -> None:
+        FakeQuery.started += 1
+        self.driver = FakeDriver()
+        self.page_loads = 0
+        self.quit = False
+        self.query = None
+
+    def load_and_accept_cookies(self):
+        self.page_loads += 1
+
+    def load_page(self):
+        self.page_loads += 1
+
+    def reset_query_state(self):
+        self.query = None
+
+    def quit_browser(self):
+        self.quit = True
+#%%
+class DriverSessionPoolTestCase(TestCase):
+    """Test class to test the DriverSessionPool class.
+    """
+    def setUp(self) -> None:
+        FakeQuery.started = 0
+
+        return super().setUp()
+
+    def test_scraper_reused_and_reset(self):
+        """Tests one warm scraper serves consecutive queries with its state
+        reset, leaving page loads to its searches.
+        """
+        with DriverSessionPool(FakeQuery, size=1) as pool:
+            with pool.acquire() as first:
+                first.query = "jose_saramago"
+            with pool.acquire() as second:
+                self.assertIs(first, second)
+                self.assertIsNone(second.query)
+        self.assertEqual(FakeQuery.started, 1)
+        self.assertEqual(first.page_loads, 0)
+        self.assertTrue(first.quit)
+
+    def test_crashed_scraper_restarted(self):
+        """Tests a scraper whose browser has crashed is quit and replaced.
+        """
+        with DriverSessionPool(FakeQuery, size=1) as pool:
+            with pool.acquire() as first:
+                first.driver.crashed = True
+            with pool.acquire() as second:
+                self.assertIsNot(first, second)
+            self.assertEqual(pool.restarts, 1)
+        self.assertTrue(first.quit)
+        self.assertTrue(second.quit)
+
+    def test_webdriver_error_discards_scraper(self):
+        """Tests a scraper is not reused after a WebDriverException in a query.
+        """
+        pool = DriverSessionPool(FakeQuery, size=1)
+        with self.assertRaises(WebDriverException):
+            with pool.acquire() as scraper:
+                raise WebDriverException("tab crashed")
+        self.assertTrue(scraper.quit)
+        self.assertEqual(pool.scrapers, [])
+        pool.close()
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
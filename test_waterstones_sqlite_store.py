@@ -0,0 +1,46 @@
+#%%
+from unittest import TestCase
+from waterstones_fixture_server import make_book_dict
+from waterstones_records import BookRecordAccumulator
+from waterstones_sqlite_store import SQLiteBookStore
+import os
+import tempfile
+import unittest
+#%%
+class SQLiteBookStoreTestCase(TestCase):
+    """Test class to test the SQLiteBookStore class.
+    """
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteBookStore(os.path.join(self.tmp.name, "books.sqlite3"), batch_size=2)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+
+        return super().tearDown()
+
+    def test_upsert_and_find(self):
+        """Tests rows from several queries are upserted by ISBN, history is
+        kept, and filtered lookups return the right books.
+        """
+        records = BookRecordAccumulator()
+        records.extend([make_book_dict(9789896602291, "Portuguese", 9.5),
+            make_book_dict(9788490628720, "Spanish", 7.0),
+            make_book_dict(9789722120982, "Portuguese", 15.0)])
+        self.assertEqual(self.store.upsert_DataFrame(records.to_DataFrame(), "jose_saramago"), 3)
+        records = BookRecordAccumulator()
+        records.extend([make_book_dict(9789896602291, "Portuguese", 8.0),
+            make_book_dict(9789722036979, "Portuguese", 6.0, author="Isabel Allende")])
+        self.store.upsert_DataFrame(records.to_DataFrame(), "isabel_allende")
+
+        cheap_portuguese = self.store.find_books(language="Portuguese", max_price=10)
+        self.assertEqual(list(cheap_portuguese["isbn"]), [9789722036979, 9789896602291])
+        self.assertEqual(list(cheap_portuguese["price"]), [6.0, 8.0])
+        self.assertEqual(len(self.store.find_books(author="Jose Saramago")), 3)
+        self.assertEqual(list(self.store.price_history(9789896602291)["price"]), [9.5, 8.0])
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,45 @@
+#%%
+from selenium.common.exceptions import TimeoutException
+from unittest import TestCase
+from waterstones_waits import AdaptiveWaiter, number_of_elements_greater_than
+import unittest
+#%%
+class FakeDriver:
+    """Stands in for a webdriver whose result list grows by one element on
+    every call to find_elements.
+    """
+    def __init__(self) -> None:
+        self.elements = []
+
+    def find_elements(self, by, value):
+        self.elements.append(object())
+        return list(self.elements)
+#%%
+class AdaptiveWaiterTestCase(TestCase):
+    """Test class to test the AdaptiveWaiter class.
+    """
+    def test_returns_when_condition_met(self):
+        """Tests the wait returns as soon as enough elements are present and
+        records the wait.
+        """
+        waiter = AdaptiveWaiter(FakeDriver(), timeout=5, poll_frequency=0.01)
+        elements = waiter.until(number_of_elements_greater_than(("xpath", "//div"), 3),
+            "results")
+        self.assertEqual(len(elements), 4)
+        self.assertEqual(len(waiter.wait_times), 1)
+        self.assertTrue(waiter.wait_times[0]["met"])
+        self.assertLess(waiter.wait_times[0]["seconds"], 1)
+
+    def test_timeout_is_recorded(self):
+        """Tests a wait that times out raises TimeoutException and is counted
+        in the summary.
+        """
+        waiter = AdaptiveWaiter(FakeDriver(), timeout=0.05, poll_frequency=0.01)
+        with self.assertRaises(TimeoutException):
+            waiter.until(lambda driver: False, "never")
+        summary = waiter.summary()
+        self.assertEqual(summary["never"]["count"], 1)
+        self.assertEqual(summary["never"]["timeouts"], 1)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)
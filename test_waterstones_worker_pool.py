@@ -0,0 +1,120 @@
+#%%
+from unittest import TestCase
+from waterstones_worker_pool import BookPageWorkerPool, HostRateLimiter, StreamClosed
+import random
+import time
+import unittest
+#%%
+class FakeScraper:
+    """Stands in for a webdriver or HTTP scraper and records when it is quit.
+    """
+    def __init__(self) -> None:
+        self.quit = False
+
+    def quit_browser(self):
+        self.quit = True
+#%%
+class BookPageWorkerPoolTestCase(TestCase):
+    """Test class to test the BookPageWorkerPool and HostRateLimiter classes.
+    """
+    def test_results_keep_input_order(self):
+        """Tests results come back in the order of the links, whichever worker
+        finished first.
+        """
+        def task(scraper, book_link):
+            time.sleep(random.random() / 100)
+            return book_link
+
+        book_links = [f"http://example.com/book/{i}" for i in range(20)]
+        pool = BookPageWorkerPool(FakeScraper, n_workers=4)
+        self.assertEqual(pool.map(task, book_links), book_links)
+        scrapers = list(pool.scrapers)
+        pool.close()
+        self.assertLessEqual(len(scrapers), 4)
+        self.assertTrue(all(scraper.quit for scraper in scrapers))
+
+    def test_imap_bounds_work_in_flight(self):
+        """Tests imap yields results in order while taking links from the input
+        only as the window frees up, and cancels queued work when closed early.
+        """
+        taken = []
+
+        def book_links():
+            for i in range(50):
+                taken.append(i)
+                yield f"http://example.com/book/{i}"
+
+        def task(scraper, book_link):
+            time.sleep(random.random() / 200)
+            return book_link
+
+        pool = BookPageWorkerPool(FakeScraper, n_workers=2)
+        results = pool.imap(task, book_links(), window=4)
+        first = [next(results) for _ in range(3)]
+        self.assertEqual(first, [(f"http://example.com/book/{i}",) * 2 for i in range(3)])
+        self.assertLessEqual(len(taken), 3 + 4)
+        results.close()
+        pool.close()
+        self.assertLess(len(taken), 50)
+
+    def test_imap_streams_bounds_buffered_results(self):
+        """Tests imap_streams yields each link's results in order, holds no more
+        than buffer_size results per running task, and stops the tasks when the
+        caller stops iterating.
+        """
+        put_counts = {}
+        closed = []
+
+        def task(scraper, link, put):
+            try:
+                for i in range(100):
+                    put((link, i))
+                    put_counts[link] = i + 1
+            except StreamClosed:
+                closed.append(link)
+                raise
+
+        links = [f"http://example.com/language/{i}" for i in range(3)]
+        pool = BookPageWorkerPool(FakeScraper, n_workers=3)
+        results = list(pool.imap_streams(task, links[:2], buffer_size=5))
+        self.assertEqual(results, [(link, (link, i)) for link in links[:2] for i in range(100)])
+
+        results = pool.imap_streams(task, links, buffer_size=5)
+        first = [next(results) for _ in range(3)]
+        self.assertEqual(first, [(links[0], (links[0], i)) for i in range(3)])
+        time.sleep(0.05)
+        self.assertLessEqual(max(put_counts[link] for link in links[1:]), 5)
+        results.close()
+        pool.close()
+        self.assertTrue(closed)
+
+    def test_max_per_host(self):
+        """Tests no more than max_per_host tasks run at once against one host.
+        """
+        in_flight = []
+        peak = []
+
+        def task(scraper, book_link):
+            in_flight.append(book_link)
+            peak.append(len(in_flight))
+            time.sleep(0.01)
+            in_flight.remove(book_link)
+
+        pool = BookPageWorkerPool(FakeScraper, n_workers=6, max_per_host=2)
+        pool.map(task, [f"http://example.com/{i}" for i in range(12)])
+        pool.close()
+        self.assertLessEqual(max(peak), 2)
+
+    def test_rate_limiter_spaces_requests(self):
+        """Tests requests to one host are spaced out while other hosts are not
+        delayed.
+        """
+        limiter = HostRateLimiter(requests_per_second=50)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait("http://example.com/a")
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 50)
+        self.assertEqual(limiter.wait("http://other.com/a"), 0)
+#%%
+if __name__ == "__main__":
+    unittest.main(argv=[''], exit=False)